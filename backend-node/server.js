@@ -29,6 +29,15 @@ app.use(cors({
 }));
 
 const PYTHON_SERVICE_URL = 'http://localhost:5001';
+// Batas waktu request ke service Python. Analisis panjang sebaiknya memakai mode job (?async=1 -> 202 + /api/jobs/:id)
+const PYTHON_TIMEOUT_MS = parseInt(process.env.PYTHON_TIMEOUT_MS || '120000', 10);
+const python = axios.create({ baseURL: PYTHON_SERVICE_URL, timeout: PYTHON_TIMEOUT_MS });
+
+// Helper: teruskan query string asli (?async=1, ?stream=1, dst.) ke service Python
+function withQuery(req, pythonEndpoint) {
+    const idx = req.originalUrl.indexOf('?');
+    return idx === -1 ? pythonEndpoint : `${pythonEndpoint}${req.originalUrl.slice(idx)}`;
+}
 const storage = multer.memoryStorage();
 const upload = multer({ storage: storage });
 
@@ -50,16 +59,48 @@ app.post('/api/login', bodyParser.json(), (req, res) => {
 async function forwardJsonToPython(req, res, pythonEndpoint) {
     console.log(`[Node Gateway - JSON] Menerima request ke ${req.originalUrl} dari Origin: ${req.headers.origin}`);
     try {
-        const response = await axios.post(`${PYTHON_SERVICE_URL}${pythonEndpoint}`, req.body);
-        res.json(response.data);
+        const response = await python.post(withQuery(req, pythonEndpoint), req.body);
+        if (response.headers['server-timing']) res.set('Server-Timing', response.headers['server-timing']); // Opt-in ?server_timing=1
+        res.status(response.status).json(response.data);
     } catch (error) {
         console.error(`[Node Gateway - JSON Error] Gagal meneruskan ke ${pythonEndpoint}:`);
-        if (error.response) { console.error(`  Status: ${error.response.status}`); console.error(`  Data:`, error.response.data); res.status(error.response.status).json(error.response.data); }
+        if (error.response) {
+            console.error(`  Status: ${error.response.status}`); console.error(`  Data:`, error.response.data);
+            if (error.response.headers['retry-after']) res.set('Retry-After', error.response.headers['retry-after']); // 503 admission control Python
+            res.status(error.response.status).json(error.response.data);
+        }
+        else if (error.code === 'ECONNABORTED') { console.error(`  Timeout (${PYTHON_TIMEOUT_MS} ms): ${pythonEndpoint}`); res.status(504).json({ message: 'Service Python melewati batas waktu', error: error.message }); }
+        else if (error.request) { console.error(`  Request Error: No response from ${PYTHON_SERVICE_URL}${pythonEndpoint}`); res.status(503).json({ message: 'Service Python tidak merespons', error: error.message }); }
+        else { console.error('  Axios Config Error:', error.message); res.status(500).json({ message: 'Kesalahan internal saat meneruskan request', error: error.message }); }
+    }
+}
+
+// Helper Biner: respons file dari Python (PDF/ZIP) diteruskan apa adanya beserta Content-Type & Content-Disposition
+async function forwardJsonForFile(req, res, pythonEndpoint) {
+    console.log(`[Node Gateway - FILE OUT] Menerima request ke ${req.originalUrl} dari Origin: ${req.headers.origin}`);
+    try {
+        const response = await python.post(withQuery(req, pythonEndpoint), req.body, { responseType: 'arraybuffer' });
+        for (const header of ['content-type', 'content-disposition', 'x-export-failed', 'server-timing']) { if (response.headers[header]) res.set(header, response.headers[header]); }
+        res.status(response.status).send(Buffer.from(response.data));
+    } catch (error) {
+        console.error(`[Node Gateway - FILE OUT Error] Gagal meneruskan ke ${pythonEndpoint}:`);
+        if (error.response) {
+            console.error(`  Status: ${error.response.status}`);
+            if (error.response.headers['retry-after']) res.set('Retry-After', error.response.headers['retry-after']);
+            res.status(error.response.status).type(error.response.headers['content-type'] || 'application/json').send(Buffer.from(error.response.data));
+        }
+        else if (error.code === 'ECONNABORTED') { console.error(`  Timeout (${PYTHON_TIMEOUT_MS} ms): ${pythonEndpoint}`); res.status(504).json({ message: 'Service Python melewati batas waktu', error: error.message }); }
         else if (error.request) { console.error(`  Request Error: No response from ${PYTHON_SERVICE_URL}${pythonEndpoint}`); res.status(503).json({ message: 'Service Python tidak merespons', error: error.message }); }
         else { console.error('  Axios Config Error:', error.message); res.status(500).json({ message: 'Kesalahan internal saat meneruskan request', error: error.message }); }
     }
 }
 
+// Helper Streaming: true jika klien meminta respons SSE (?stream=1 / field 'stream')
+function wantsStream(req) {
+    const flag = req.query.stream ?? (req.body ? req.body.stream : undefined);
+    return ['1', 'true', 'yes', 'sse'].includes(String(flag).toLowerCase());
+}
+
 // Helper File/FormData
 async function forwardFileToPython(req, res, pythonEndpoint) {
     console.log(`[Node Gateway - FILE/FORM] Request ke ${req.originalUrl} from ${req.headers.origin}`);
@@ -67,12 +108,15 @@ async function forwardFileToPython(req, res, pythonEndpoint) {
         const form = new FormData();
         let answerTextFromBody = ''; // Tampung answer_text
 
-        // 1. Handle file jika ada
-        if (req.file) {
-            console.log(`[Node Gateway - FILE/FORM] Attaching file: ${req.file.originalname} (field: ${req.file.fieldname})`);
-            const fileStream = new stream.PassThrough();
-            fileStream.end(req.file.buffer);
-            form.append(req.file.fieldname, fileStream, { filename: req.file.originalname });
+        // 1. Handle file jika ada (upload.single -> req.file, upload.array -> req.files)
+        const files = req.files || (req.file ? [req.file] : []);
+        if (files.length) {
+            for (const file of files) {
+                console.log(`[Node Gateway - FILE/FORM] Attaching file: ${file.originalname} (field: ${file.fieldname})`);
+                const fileStream = new stream.PassThrough();
+                fileStream.end(file.buffer);
+                form.append(file.fieldname, fileStream, { filename: file.originalname });
+            }
         } else {
             console.log(`[Node Gateway - FILE/FORM] No file attached.`);
         }
@@ -86,62 +130,161 @@ async function forwardFileToPython(req, res, pythonEndpoint) {
             }
         }
         console.log(`[Node Gateway - FILE/FORM] Forwarding FormData to ${PYTHON_SERVICE_URL}${pythonEndpoint}`);
-        const response = await axios.post(`${PYTHON_SERVICE_URL}${pythonEndpoint}`, form, {
-            headers: { ...form.getHeaders() }
+        // 3. Mode streaming (SSE) opt-in: ?stream=1 atau field 'stream' -> teruskan byte demi byte, jangan di-buffer
+        if (wantsStream(req)) {
+            // Query asli tetap diteruskan (?hedge=1, ?no_cache=1, ?server_timing=1, ...); stream=1 ditambahkan bila hanya dikirim sebagai field form
+            const url = withQuery(req, pythonEndpoint);
+            const streamUrl = req.query.stream !== undefined ? url : `${url}${url.includes('?') ? '&' : '?'}stream=1`;
+            const response = await python.post(streamUrl, form, {
+                headers: { ...form.getHeaders() }, responseType: 'stream', timeout: 0, maxBodyLength: Infinity // Stream boleh lama; byte pertama sudah cepat
+            });
+            res.status(response.status);
+            res.set({ 'Content-Type': response.headers['content-type'] || 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no' });
+            res.flushHeaders();
+            response.data.pipe(res);
+            res.on('close', () => response.data.destroy()); // Klien putus -> hentikan stream dari Python (req sudah selesai dibaca multer, jadi dengarkan res)
+            return;
+        }
+        const response = await python.post(withQuery(req, pythonEndpoint), form, {
+            headers: { ...form.getHeaders() }, maxBodyLength: Infinity // Batas ukuran ditegakkan Python (MAX_UPLOAD_MB / SKP_BATCH_MAX_MB), bukan default 10 MB axios
         });
-        res.json(response.data);
+        if (response.headers.location) res.set('Location', response.headers.location); // Path /api/jobs/:id sama di gateway
+        if (response.headers['server-timing']) res.set('Server-Timing', response.headers['server-timing']);
+        res.status(response.status).json(response.data);
     } catch (error) {
         console.error(`[Node Gateway - FILE/FORM Error] Gagal meneruskan ke ${pythonEndpoint}:`);
-        if (error.response) { console.error(`  Status: ${error.response.status}`); console.error(`  Data:`, error.response.data); res.status(error.response.status).json(error.response.data); }
+        if (error.response && error.response.headers['retry-after']) res.set('Retry-After', error.response.headers['retry-after']); // 503 admission control Python
+        if (error.response && error.response.data && typeof error.response.data.pipe === 'function') { console.error(`  Status: ${error.response.status} (stream)`); res.status(error.response.status).type('application/json'); error.response.data.pipe(res); }
+        else if (error.response) { console.error(`  Status: ${error.response.status}`); console.error(`  Data:`, error.response.data); res.status(error.response.status).json(error.response.data); }
+        else if (error.code === 'ECONNABORTED') { console.error(`  Timeout (${PYTHON_TIMEOUT_MS} ms): ${pythonEndpoint}`); res.status(504).json({ message: 'Service Python melewati batas waktu (File)', error: error.message }); }
         else if (error.request) { console.error(`  Request Error: No response from ${PYTHON_SERVICE_URL}${pythonEndpoint}`); res.status(503).json({ message: 'Service Python tidak merespons (File)', error: error.message }); }
         else { console.error('  Axios Config Error:', error.message); res.status(500).json({ message: 'Kesalahan internal saat meneruskan request (File)', error: error.message }); }
     }
 }
 
+// Helper Stream Mentah: body request (CSV/NDJSON/multipart besar) dialirkan langsung ke Python tanpa di-buffer di gateway
+async function pipeRequestToPython(req, res, pythonEndpoint) {
+    console.log(`[Node Gateway - STREAM] Request ke ${req.originalUrl} from ${req.headers.origin}`);
+    try {
+        const headers = { 'content-type': req.headers['content-type'] || 'application/octet-stream' };
+        if (req.headers['content-length']) headers['content-length'] = req.headers['content-length'];
+        const response = await python.post(withQuery(req, pythonEndpoint), req, { headers, maxBodyLength: Infinity, maxContentLength: Infinity, timeout: 0 });
+        res.status(response.status).json(response.data);
+    } catch (error) {
+        console.error(`[Node Gateway - STREAM Error] Gagal meneruskan ke ${pythonEndpoint}:`);
+        if (error.response) { console.error(`  Status: ${error.response.status}`); console.error(`  Data:`, error.response.data); res.status(error.response.status).json(error.response.data); }
+        else if (error.request) { console.error(`  Request Error: No response from ${PYTHON_SERVICE_URL}${pythonEndpoint}`); res.status(503).json({ message: 'Service Python tidak merespons', error: error.message }); }
+        else { console.error('  Axios Config Error:', error.message); res.status(500).json({ message: 'Kesalahan internal saat meneruskan request', error: error.message }); }
+    }
+}
+
 // --- ENDPOINTS ---
 
 // MODUL 1: LENTERA
 app.post('/api/lentera/generate-case', upload.single('file_cv'), (req, res) => forwardFileToPython(req, res, '/api/lentera/generate-case'));
 // Hapus definisi duplikat, pastikan HANYA ini untuk grade-final
 app.post('/api/lentera/grade-final', upload.single('file_answer'), (req, res) => forwardFileToPython(req, res, '/api/lentera/grade-final'));
-app.post('/api/lentera/export-pdf', bodyParser.json(), (req, res) => forwardJsonToPython(req, res, '/api/lentera/export-pdf'));
+app.post('/api/lentera/export-pdf', bodyParser.json({ limit: '5mb' }), (req, res) => forwardJsonForFile(req, res, '/api/lentera/export-pdf'));
 
 
 // MODUL 2: SELAYAR
 app.post('/api/selayar/osint-sentiment', bodyParser.json(), (req, res) => forwardJsonToPython(req, res, '/api/selayar/osint-sentiment'));
 app.post('/api/selayar/analyze-skp', upload.single('file_skp'), (req, res) => forwardFileToPython(req, res, '/api/selayar/analyze-skp'));
-app.post('/api/selayar/export-pdf', bodyParser.json(), (req, res) => forwardJsonToPython(req, res, '/api/selayar/export-pdf'));
+app.post('/api/selayar/analyze-skp-batch', upload.array('file_skp', 500), (req, res) => forwardFileToPython(req, res, '/api/selayar/analyze-skp-batch'));
+app.post('/api/selayar/export-pdf', bodyParser.json({ limit: '5mb' }), (req, res) => forwardJsonForFile(req, res, '/api/selayar/export-pdf'));
+app.post('/api/export-pdf-batch', bodyParser.json({ limit: '50mb' }), (req, res) => forwardJsonForFile(req, res, '/api/export-pdf-batch'));
 
 
 // MODUL 3: NAKHODA
 app.get('/api/nakhoda/get-graph', async (req, res) => {
     console.log(`[Node Gateway - GET] Request ke ${req.originalUrl} from ${req.headers.origin}`);
     try {
-        const response = await axios.get(`${PYTHON_SERVICE_URL}/api/nakhoda/get-graph`);
-        res.json(response.data);
-    } catch (error) { /* ... logging error GET ... */ }
+        const response = await python.get(withQuery(req, '/api/nakhoda/get-graph'));
+        res.status(response.status).json(response.data);
+    } catch (error) {
+        console.error(`[Node Gateway - GET Error] Gagal meneruskan ke /api/nakhoda/get-graph: ${error.message}`);
+        if (error.response) res.status(error.response.status).json(error.response.data); else res.status(503).json({ message: 'Service Python tidak merespons', error: error.message });
+    }
 });
-app.post('/api/nakhoda/load-custom-graph', bodyParser.json(), (req, res) => forwardJsonToPython(req, res, '/api/nakhoda/load-custom-graph'));
+app.post('/api/nakhoda/load-custom-graph', bodyParser.json({ limit: '20mb' }), (req, res) => forwardJsonToPython(req, res, '/api/nakhoda/load-custom-graph'));
 app.post('/api/nakhoda/simulate-move', bodyParser.json(), (req, res) => forwardJsonToPython(req, res, '/api/nakhoda/simulate-move'));
+app.get('/api/nakhoda/datasets', async (req, res) => {
+    try {
+        const response = await python.get('/api/nakhoda/datasets');
+        res.json(response.data);
+    } catch (error) {
+        console.error(`[Node Gateway - GET Error] ${req.originalUrl}:`, error.message);
+        if (error.response) res.status(error.response.status).json(error.response.data);
+        else res.status(503).json({ message: 'Service Python tidak merespons', error: error.message });
+    }
+});
+app.post('/api/nakhoda/datasets/:name/import', (req, res) => pipeRequestToPython(req, res, `/api/nakhoda/datasets/${encodeURIComponent(req.params.name)}/import`));
+app.delete('/api/nakhoda/datasets/:name', async (req, res) => {
+    try {
+        const response = await python.delete(`/api/nakhoda/datasets/${encodeURIComponent(req.params.name)}`);
+        res.json(response.data);
+    } catch (error) {
+        console.error(`[Node Gateway - DELETE Error] ${req.originalUrl}:`, error.message);
+        if (error.response) res.status(error.response.status).json(error.response.data);
+        else res.status(503).json({ message: 'Service Python tidak merespons', error: error.message });
+    }
+});
+app.post('/api/nakhoda/network-metrics', bodyParser.json({ limit: '20mb' }), (req, res) => forwardJsonToPython(req, res, '/api/nakhoda/network-metrics'));
+app.post('/api/nakhoda/graph-units', bodyParser.json({ limit: '20mb' }), (req, res) => forwardJsonToPython(req, res, '/api/nakhoda/graph-units'));
+app.post('/api/nakhoda/graph-drilldown', bodyParser.json({ limit: '20mb' }), (req, res) => forwardJsonToPython(req, res, '/api/nakhoda/graph-drilldown'));
+app.post('/api/nakhoda/simulate-moves-batch', bodyParser.json({ limit: '20mb' }), (req, res) => forwardJsonToPython(req, res, '/api/nakhoda/simulate-moves-batch'));
 
 
+// --- Endpoint Job Asesmen (mode asinkron) ---
+app.get('/api/jobs/:job_id', async (req, res) => {
+    try {
+        const response = await python.get(`/api/jobs/${encodeURIComponent(req.params.job_id)}`);
+        res.status(response.status).json(response.data);
+    } catch (error) {
+        console.error(`[Node Gateway - GET Error] Gagal meneruskan ke /api/jobs/${req.params.job_id}: ${error.message}`);
+        if (error.response) res.status(error.response.status).json(error.response.data); else res.status(503).json({ message: 'Service Python tidak merespons', error: error.message });
+    }
+});
+app.get('/api/jobs/:job_id/events', async (req, res) => {
+    try {
+        const response = await python.get(`/api/jobs/${encodeURIComponent(req.params.job_id)}/events`, { responseType: 'stream', timeout: 0 });
+        res.set({ 'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no' });
+        res.flushHeaders();
+        response.data.pipe(res);
+        req.on('close', () => response.data.destroy());
+    } catch (error) {
+        console.error(`[Node Gateway - SSE Error] Gagal meneruskan ke /api/jobs/${req.params.job_id}/events: ${error.message}`);
+        if (error.response) res.status(error.response.status).end(); else res.status(503).json({ message: 'Service Python tidak merespons', error: error.message });
+    }
+});
+app.post('/api/jobs/:job_id/cancel', bodyParser.json(), (req, res) => forwardJsonToPython(req, res, `/api/jobs/${encodeURIComponent(req.params.job_id)}/cancel`));
+app.post('/api/jobs/:job_id/retry', bodyParser.json(), (req, res) => forwardJsonToPython(req, res, `/api/jobs/${encodeURIComponent(req.params.job_id)}/retry`));
+
 // --- Endpoint History ---
 app.get('/api/history', async (req, res) => {
     console.log(`[Node Gateway - GET] Menerima request ke ${req.originalUrl} dari Origin: ${req.headers.origin}`);
     try {
-        const response = await axios.get(`${PYTHON_SERVICE_URL}/api/history`);
-        res.json(response.data);
-    } catch (error) { 
-        // ... (logging error GET sama seperti get-graph) ... 
-        console.error(`[Node Gateway - GET Error] Gagal meneruskan ke /api/history:`);
-        // ... (detail error) ...
+        const response = await python.get(withQuery(req, '/api/history')); // Teruskan cursor/filter/limit
+        res.status(response.status).json(response.data);
+    } catch (error) {
+        console.error(`[Node Gateway - GET Error] Gagal meneruskan ke /api/history: ${error.message}`);
+        if (error.response) res.status(error.response.status).json(error.response.data); else res.status(503).json({ message: 'Service Python tidak merespons', error: error.message });
+    }
+});
+app.get('/api/analytics', async (req, res) => {
+    try {
+        const response = await python.get(withQuery(req, '/api/analytics'));
+        res.status(response.status).json(response.data);
+    } catch (error) {
+        console.error(`[Node Gateway - GET Error] Gagal meneruskan ke /api/analytics: ${error.message}`);
+        if (error.response) res.status(error.response.status).json(error.response.data); else res.status(503).json({ message: 'Service Python tidak merespons', error: error.message });
     }
 });
 app.delete('/api/history/:log_id', async (req, res) => {
     const logId = req.params.log_id;
     console.log(`[Node Gateway - DELETE] Menerima request ke ${req.originalUrl} dari Origin: ${req.headers.origin}`);
     try {
-        const response = await axios.delete(`${PYTHON_SERVICE_URL}/api/history/${logId}`);
+        const response = await python.delete(`/api/history/${logId}`);
         res.json(response.data);
     } catch (error) {
         // ... (logging error detail, mirip POST JSON) ...
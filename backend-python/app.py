@@ -1,24 +1,93 @@
-from flask import Flask, jsonify, request, send_file 
+import time
+_IMPORT_STARTED = time.perf_counter() # Dasar import_ms di /api/startup/stats
+from flask import Flask, jsonify, request, send_file, Response, stream_with_context, g
 from flask_cors import CORS
-import networkx as nx
+import importlib
+import importlib.util
 import json
 import os
 import re 
+import bisect
+import math
+import heapq
+import functools
+import contextlib
+import inspect
+import contextvars
+import itertools
 import datetime 
 import uuid 
+import hashlib
+import base64
+import binascii
+import sqlite3
+import threading
+import queue
+import atexit
+import zipfile
+import multiprocessing
+import csv
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, as_completed, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from dotenv import load_dotenv
 import logging
 from logging.handlers import RotatingFileHandler
-import google.generativeai as genai
 import requests
-import fitz  # PyMuPDF
-import docx 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from werkzeug.utils import secure_filename
-from googleapiclient.discovery import build 
-import markdown 
-from xhtml2pdf import pisa 
-from io import BytesIO 
+from werkzeug.exceptions import RequestEntityTooLarge
+import httplib2
+from io import BytesIO, TextIOWrapper 
 from flask_sqlalchemy import SQLAlchemy 
+import sqlalchemy
+
+# --- Loader Lazy (dependensi berat & klien provider dimuat saat pertama dipakai, bukan saat import) ---
+LAZY_RESOURCES = {}; STARTUP_STATS = {"import_ms": None, "database_ms": None, "warm_up": None}
+
+class LazyResource:
+    """Proxy thread-safe: factory dijalankan sekali saat resource pertama kali dipakai (double-checked lock), lalu nama global 'bind' diganti objek aslinya
+    sehingga akses berikutnya tanpa overhead proxy. optional=True: kegagalan dicatat dan resource bernilai None (falsy), bukan exception."""
+    _UNSET = object()
+
+    def __init__(self, name, factory, optional=False, bind=None):
+        self._name, self._factory, self._optional, self._bind = name, factory, optional, bind
+        self._lock = threading.Lock(); self._value = LazyResource._UNSET; self._load_ms = self._error = None
+        LAZY_RESOURCES[name] = self
+
+    def get(self):
+        if self._value is LazyResource._UNSET:
+            with self._lock:
+                if self._value is LazyResource._UNSET:
+                    started = time.perf_counter()
+                    try: value = self._factory()
+                    except Exception as e:
+                        if not self._optional: raise # Tidak di-cache: percobaan berikutnya memuat ulang
+                        value, self._error = None, str(e); app.logger.error(f"{self._name} Fail: {str(e)}")
+                    self._load_ms = round((time.perf_counter() - started) * 1000, 1)
+                    if self._bind and globals().get(self._bind) is self: globals()[self._bind] = value # Tidak menimpa objek yang sudah dipasang manual
+                    self._value = value
+        return self._value
+
+    def __bool__(self): return self.get() is not None
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'): raise AttributeError(attr)
+        return getattr(self.get(), attr)
+
+    def stats(self):
+        return {"loaded": self._value is not LazyResource._UNSET and self._value is not None, "load_ms": self._load_ms, "error": self._error}
+
+def lazy_import(module_name, bind):
+    return LazyResource(module_name, lambda: importlib.import_module(module_name), bind=bind)
+
+nx = lazy_import('networkx', 'nx')
+HAS_SPARSE_BACKEND = all(importlib.util.find_spec(name) is not None for name in ('numpy', 'scipy')) # Opsional: backend graf sparse untuk organisasi besar
+np, sparse_graph, sparse_csgraph = (lazy_import('numpy', 'np'), lazy_import('scipy.sparse', 'sparse_graph'), lazy_import('scipy.sparse.csgraph', 'sparse_csgraph')) if HAS_SPARSE_BACKEND else (None, None, None)
+fitz = lazy_import('fitz', 'fitz') # PyMuPDF
+docx = lazy_import('docx', 'docx')
+pdf_render = lazy_import('pdf_render', 'pdf_render') # Markdown + xhtml2pdf; modul terpisah agar bisa dijalankan di process pool
 
 # --- Konfigurasi Awal ---
 load_dotenv(); app = Flask(__name__)
@@ -26,11 +95,111 @@ NETLIFY_APP_URL = "https://navigara.netlify.app" # GANTI
 NGROK_TUNNEL_URL = "https://nonerroneously-unvoluptuous-alena.ngrok-free.dev" # GANTI
 cors_origins = ["http://localhost:5173", NETLIFY_APP_URL, NGROK_TUNNEL_URL ]
 CORS(app, origins=cors_origins, supports_credentials=True) 
-UPLOAD_FOLDER = 'uploads'; os.makedirs(UPLOAD_FOLDER, exist_ok=True); app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///assessment_log.db'
+MAX_UPLOAD_MB = float(os.getenv('MAX_UPLOAD_MB', '16')); app.config['MAX_CONTENT_LENGTH'] = int(MAX_UPLOAD_MB * 1024 * 1024) # Upload dibaca di memori, jadi wajib dibatasi
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///assessment_log.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
+# --- Instrumentasi: histogram latensi per route, timer per tahap, counter ukuran prompt & error provider (format teks Prometheus) ---
+METRICS_BUCKETS = tuple(sorted(float(b) for b in os.getenv('METRICS_BUCKETS', '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60').split(','))) # Detik
+SERVER_TIMING = os.getenv('SERVER_TIMING', '0') == '1' # 1 = header Server-Timing di semua respons; selain itu opt-in per request (?server_timing=1 / header X-Server-Timing)
+_request_timings = contextvars.ContextVar('navigara_request_timings', default=None) # list [(tahap, detik)] milik request aktif
+
+def _prom_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items: return ""
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in items) + "}"
+
+class MetricsRegistry:
+    """Histogram (bucket + sum + count) dan counter berlabel di memori proses; render() menghasilkan format eksposisi teks Prometheus.
+    Per proses: dengan beberapa worker (gunicorn), scrape tiap worker atau jalankan satu worker per target."""
+    def __init__(self, buckets):
+        self.buckets = buckets; self.lock = threading.Lock()
+        self.meta = {}; self.histograms = {}; self.counters = {}
+
+    def describe(self, name, kind, help_text): self.meta[name] = (kind, help_text)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items()))); index = bisect.bisect_left(self.buckets, value) # Bucket pertama dengan le >= value
+        with self.lock:
+            series = self.histograms.get(key)
+            if series is None: series = self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1; series[1] += value; series[2] += 1
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock: self.counters[key] = self.counters.get(key, 0) + amount
+
+    def render(self):
+        with self.lock:
+            histograms = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self.histograms.items()); counters = sorted(self.counters.items())
+        lines = []
+        for name, (kind, help_text) in sorted(self.meta.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (metric, labels), (counts, total, count) in (histograms if kind == 'histogram' else []):
+                if metric != name: continue
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts): cumulative += n; lines.append(f"{name}_bucket{_prom_labels(labels, le=f'{bound:g}')} {cumulative}")
+                lines += [f"{name}_bucket{_prom_labels(labels, le='+Inf')} {count}", f"{name}_sum{_prom_labels(labels)} {total:.6f}", f"{name}_count{_prom_labels(labels)} {count}"]
+            lines += [f"{name}{_prom_labels(labels)} {value}" for (metric, labels), value in (counters if kind == 'counter' else []) if metric == name]
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry(METRICS_BUCKETS)
+metrics.describe('navigara_http_request_duration_seconds', 'histogram', "Latensi request per route, sampai body selesai dikirim (termasuk streaming).")
+metrics.describe('navigara_stage_duration_seconds', 'histogram', "Durasi tahap internal: extract, osint, llm_gemini, llm_byteplus, parse_score, analyze_graph, pdf.")
+metrics.describe('navigara_llm_prompt_chars_total', 'counter', "Total karakter prompt (termasuk system prompt) yang dikirim ke provider LLM.")
+metrics.describe('navigara_llm_response_chars_total', 'counter', "Total karakter respons yang diterima dari provider LLM.")
+metrics.describe('navigara_upstream_errors_total', 'counter', "Error panggilan provider upstream (gemini, byteplus, google_cse) per jenis.")
+
+def record_stage(stage, seconds):
+    metrics.observe('navigara_stage_duration_seconds', seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None: timings.append((stage, seconds))
+
+def instrument_stage(stage):
+    """Decorator: durasi fungsi (juga saat exception) dicatat sebagai tahap `stage` di histogram dan Server-Timing request aktif."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try: return fn(*args, **kwargs)
+            finally: record_stage(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def count_upstream_error(provider, error):
+    message = str(error).lower()
+    if isinstance(error, (TimeoutError, FuturesTimeoutError, requests.exceptions.Timeout)) or 'timeout' in type(error).__name__.lower() or 'deadline' in message: kind = 'timeout'
+    elif 'quota' in message or '429' in message: kind = 'quota'
+    elif isinstance(error, requests.exceptions.HTTPError): kind = 'http'
+    else: kind = 'error'
+    metrics.inc('navigara_upstream_errors_total', provider=provider, kind=kind)
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """Task dijalankan di salinan contextvars pemanggil, sehingga tahap yang berjalan di thread pool tetap tercatat di Server-Timing request asalnya."""
+    def submit(self, fn, /, *args, **kwargs): return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+def format_server_timing(timings, total):
+    """Tahap yang sama dijumlahkan (desc = jumlah panggilan); tahap paralel bisa berjumlah lebih dari total."""
+    stages = {}
+    for stage, seconds in timings: entry = stages.setdefault(stage, [0.0, 0]); entry[0] += seconds; entry[1] += 1
+    return ", ".join([f"{stage};dur={seconds * 1000:.1f}" + (f';desc="{n}x"' if n > 1 else "") for stage, (seconds, n) in stages.items()] + [f"total;dur={total * 1000:.1f}"])
+
+@app.before_request
+def _start_request_metrics():
+    g.metrics_started = time.perf_counter(); _request_timings.set([])
+
+@app.after_request
+def _finish_request_metrics(response):
+    started = g.get('metrics_started')
+    if started is None: return response
+    labels = {"route": request.url_rule.rule if request.url_rule else 'unmatched', "method": request.method, "status": str(response.status_code)} # Template route, bukan path (kardinalitas rendah)
+    if SERVER_TIMING or request.args.get('server_timing') == '1' or 'X-Server-Timing' in request.headers:
+        response.headers['Server-Timing'] = format_server_timing(_request_timings.get() or [], time.perf_counter() - started)
+    response.call_on_close(lambda: metrics.observe('navigara_http_request_duration_seconds', time.perf_counter() - started, **labels))
+    return response
+
 # --- Model Database Log ---
 class AssessmentLog(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -38,7 +207,117 @@ class AssessmentLog(db.Model):
     module = db.Column(db.String(50)); candidate_name = db.Column(db.String(200)); jabatan_or_program = db.Column(db.String(200))
     skor_potensi = db.Column(db.Integer, nullable=True); skor_kinerja = db.Column(db.Integer, nullable=True)
     recommendation = db.Column(db.String(100), nullable=True); sentiment = db.Column(db.String(100), nullable=True)
-with app.app_context(): db.create_all()
+
+# --- Model Database Job Asesmen (mode asinkron) ---
+class AssessmentJob(db.Model):
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = db.Column(db.String(50)); status = db.Column(db.String(20), default='queued', index=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow); started_at = db.Column(db.DateTime, nullable=True); finished_at = db.Column(db.DateTime, nullable=True)
+    attempts = db.Column(db.Integer, default=0)
+    params = db.Column(db.Text) # JSON field form
+    input_filename = db.Column(db.String(255), nullable=True); input_file = db.Column(db.LargeBinary, nullable=True) # Disimpan untuk retry, dihapus setelah sukses
+    result = db.Column(db.Text, nullable=True); error = db.Column(db.Text, nullable=True)
+    progress_done = db.Column(db.Integer, default=0); progress_total = db.Column(db.Integer, default=1)
+
+# --- Model Rollup Analitik (agregat harian AssessmentLog, dipelihara trigger SQLite) ---
+class AssessmentRollup(db.Model):
+    """Satu baris per (hari, modul, jabatan/program, rekomendasi, sentimen); NULL disimpan sebagai '' agar UPSERT bisa mencocokkan kunci."""
+    bucket_day = db.Column(db.String(10), primary_key=True); module = db.Column(db.String(50), primary_key=True)
+    jabatan_or_program = db.Column(db.String(200), primary_key=True)
+    recommendation = db.Column(db.String(100), primary_key=True); sentiment = db.Column(db.String(100), primary_key=True)
+    n = db.Column(db.Integer, default=0)
+    n_potensi = db.Column(db.Integer, default=0); sum_potensi = db.Column(db.Integer, default=0)
+    n_kinerja = db.Column(db.Integer, default=0); sum_kinerja = db.Column(db.Integer, default=0)
+
+ROLLUP_KEY_SQL = "coalesce(date({row}.timestamp), ''), coalesce({row}.module, ''), coalesce({row}.jabatan_or_program, ''), coalesce({row}.recommendation, ''), coalesce({row}.sentiment, '')"
+ROLLUP_ADD_SQL = """INSERT INTO assessment_rollup (bucket_day, module, jabatan_or_program, recommendation, sentiment, n, n_potensi, sum_potensi, n_kinerja, sum_kinerja)
+        VALUES ({key}, 1, NEW.skor_potensi IS NOT NULL, coalesce(NEW.skor_potensi, 0), NEW.skor_kinerja IS NOT NULL, coalesce(NEW.skor_kinerja, 0))
+        ON CONFLICT (bucket_day, module, jabatan_or_program, recommendation, sentiment) DO UPDATE SET n = n + 1,
+        n_potensi = n_potensi + excluded.n_potensi, sum_potensi = sum_potensi + excluded.sum_potensi, n_kinerja = n_kinerja + excluded.n_kinerja, sum_kinerja = sum_kinerja + excluded.sum_kinerja;""".format(key=ROLLUP_KEY_SQL.format(row='NEW'))
+ROLLUP_REMOVE_SQL = """UPDATE assessment_rollup SET n = n - 1, n_potensi = n_potensi - (OLD.skor_potensi IS NOT NULL), sum_potensi = sum_potensi - coalesce(OLD.skor_potensi, 0),
+        n_kinerja = n_kinerja - (OLD.skor_kinerja IS NOT NULL), sum_kinerja = sum_kinerja - coalesce(OLD.skor_kinerja, 0)
+        WHERE (bucket_day, module, jabatan_or_program, recommendation, sentiment) = ({key});
+        DELETE FROM assessment_rollup WHERE n <= 0;""".format(key=ROLLUP_KEY_SQL.format(row='OLD'))
+
+def ensure_assessment_rollup():
+    """Trigger insert/update/delete di assessment_log memperbarui rollup secara inkremental (ikut transaksi penulisan log, termasuk add_all massal). Backfill sekali bila rollup masih kosong."""
+    for name, event, body in (('trg_assessment_rollup_ins', 'AFTER INSERT', ROLLUP_ADD_SQL), ('trg_assessment_rollup_del', 'AFTER DELETE', ROLLUP_REMOVE_SQL),
+                              ('trg_assessment_rollup_upd', 'AFTER UPDATE', ROLLUP_REMOVE_SQL + "\n        " + ROLLUP_ADD_SQL)):
+        db.session.execute(db.text(f"CREATE TRIGGER IF NOT EXISTS {name} {event} ON assessment_log BEGIN\n        {body}\n    END"))
+    if not db.session.query(AssessmentRollup.bucket_day).first() and db.session.query(AssessmentLog.id).first():
+        db.session.execute(db.text(f"""INSERT INTO assessment_rollup SELECT {ROLLUP_KEY_SQL.format(row='l')}, count(*), count(l.skor_potensi), coalesce(sum(l.skor_potensi), 0),
+            count(l.skor_kinerja), coalesce(sum(l.skor_kinerja), 0) FROM assessment_log l GROUP BY 1, 2, 3, 4, 5"""))
+        app.logger.info("Rollup analitik di-backfill dari assessment_log.")
+    db.session.commit()
+
+def ensure_sqlite_columns(table, columns):
+    """create_all() tidak menambah kolom ke tabel lama; tambahkan kolom baru (ALTER TABLE ADD COLUMN) bila belum ada."""
+    existing = {row[1] for row in db.session.execute(db.text(f"PRAGMA table_info({table})"))}
+    for name, ddl in columns.items():
+        if name not in existing: db.session.execute(db.text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+    db.session.commit()
+
+# --- Model Database Graf Organisasi (Nakhoda) ---
+class OrgDataset(db.Model):
+    """Satu baris per dataset graf; 'version' naik setiap isi dataset berubah (dasar invalidasi cache graf di memori, juga antar proses)."""
+    name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, default=1); updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+class OrgEmployee(db.Model):
+    seq = db.Column(db.Integer, primary_key=True) # Urutan impor = urutan node di graf
+    dataset = db.Column(db.String(100), nullable=False); employee_id = db.Column(db.String(100), nullable=False)
+    nama = db.Column(db.String(200), nullable=True); unit = db.Column(db.String(200), nullable=True); jabatan = db.Column(db.String(200), nullable=True)
+    skor_potensi = db.Column(db.Float, nullable=True); skor_kinerja = db.Column(db.Float, nullable=True)
+    __table_args__ = (db.UniqueConstraint('dataset', 'employee_id', name='uq_org_employee_dataset_id'), db.Index('ix_org_employee_dataset_unit', 'dataset', 'unit'))
+
+class OrgCollaboration(db.Model):
+    seq = db.Column(db.Integer, primary_key=True)
+    dataset = db.Column(db.String(100), nullable=False); source = db.Column(db.String(100), nullable=False); target = db.Column(db.String(100), nullable=False)
+    project = db.Column(db.String(200), nullable=True)
+    __table_args__ = (db.Index('ix_org_collaboration_dataset_source', 'dataset', 'source'), db.Index('ix_org_collaboration_dataset_target', 'dataset', 'target'))
+
+ORG_STAGING_PREFIX = '~import-' # Dataset sementara selama impor streaming
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+@sqlalchemy.event.listens_for(sqlalchemy.engine.Engine, "connect")
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL: pembaca tidak memblokir penulis; synchronous=NORMAL cukup aman di WAL (tanpa fsync tiap commit); busy_timeout menunggu lock alih-alih 'database is locked'."""
+    if not isinstance(dbapi_connection, sqlite3.Connection): return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL"); cursor.execute("PRAGMA synchronous=NORMAL"); cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+_database_ready = threading.Event(); _database_lock = threading.Lock()
+
+def ensure_database():
+    """Skema, index, trigger rollup, pembersihan staging impor dan recovery job; sekali per proses (request pertama, warm-up, atau dipanggil eksplisit), bukan saat import."""
+    if _database_ready.is_set(): return
+    with _database_lock:
+        if _database_ready.is_set(): return
+        started = time.perf_counter()
+        with app.app_context(): _initialize_database()
+        _database_ready.set(); recover_assessment_jobs()
+        STARTUP_STATS["database_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+@app.before_request
+def _ensure_database_before_request(): ensure_database()
+
+def _initialize_database():
+    db.create_all()
+    ensure_sqlite_columns('assessment_job', {'progress_done': 'INTEGER DEFAULT 0', 'progress_total': 'INTEGER DEFAULT 1'})
+    # Index untuk /api/history (keyset timestamp/id + filter); dibuat juga di tabel lama yang sudah ada
+    for index_ddl in ("CREATE INDEX IF NOT EXISTS ix_assessment_log_ts_id ON assessment_log (timestamp, id)",
+                      "CREATE INDEX IF NOT EXISTS ix_assessment_log_module_ts_id ON assessment_log (module, timestamp, id)",
+                      "CREATE INDEX IF NOT EXISTS ix_assessment_log_name_ts_id ON assessment_log (candidate_name COLLATE NOCASE, timestamp, id)",
+                      "CREATE INDEX IF NOT EXISTS ix_assessment_log_potensi ON assessment_log (skor_potensi)",
+                      "CREATE INDEX IF NOT EXISTS ix_assessment_log_kinerja ON assessment_log (skor_kinerja)"):
+        db.session.execute(db.text(index_ddl))
+    db.session.commit()
+    ensure_assessment_rollup()
+    for table in ('org_employee', 'org_collaboration'): # Sisa impor yang terputus (proses mati di tengah impor)
+        db.session.execute(db.text(f"DELETE FROM {table} WHERE dataset LIKE :prefix"), {"prefix": ORG_STAGING_PREFIX + '%'})
+    db.session.commit()
 
 # --- Konfigurasi Logging ---
 log_formatter = logging.Formatter('%(asctime)s %(levelname)s:%(name)s:%(funcName)s(%(lineno)d): %(message)s')
@@ -48,110 +327,979 @@ console_handler = logging.StreamHandler(); console_handler.setFormatter(log_form
 logging.basicConfig(level=logging.INFO, handlers=[file_handler, console_handler])
 app.logger.info("Server NAVIGARA (Python) v3.8 Enhanced SKP Prompt Dimulai...")
 
+# --- Penulis Log Asesmen (antrean + thread background, commit berkelompok) ---
+LOG_WRITER_BATCH = int(os.getenv('LOG_WRITER_BATCH', '200')); LOG_WRITER_FLUSH_INTERVAL = float(os.getenv('LOG_WRITER_FLUSH_INTERVAL', '0.5'))
+LOG_WRITER_MAX_QUEUE = int(os.getenv('LOG_WRITER_MAX_QUEUE', '10000'))
+
+class AssessmentLogWriter:
+    """Endpoint hanya memasukkan field log ke antrean; satu thread menulis per kelompok (satu transaksi per batch), jadi latensi request tidak termasuk commit SQLite."""
+    _STOP = object()
+
+    def __init__(self, batch_size, flush_interval, max_queue):
+        self.batch_size, self.flush_interval = batch_size, flush_interval
+        self.queue = queue.Queue(maxsize=max_queue); self.lock = threading.Lock(); self.thread = None; self.stopped = False
+        self.enqueued = self.written = self.batches = self.failed = self.sync_writes = 0
+
+    def start(self):
+        with self.lock:
+            if self.thread is None and not self.stopped:
+                self.thread = threading.Thread(target=self._run, name='assessment-log-writer', daemon=True); self.thread.start()
+
+    def submit(self, **fields):
+        """Antrekan satu baris AssessmentLog; mengembalikan id-nya. Bila antrean penuh / writer sudah berhenti, tulis langsung (tidak ada log yang hilang)."""
+        fields.setdefault('id', str(uuid.uuid4())); fields.setdefault('timestamp', datetime.datetime.utcnow())
+        self.start()
+        try:
+            if self.stopped: raise queue.Full
+            self.queue.put_nowait(fields)
+            with self.lock: self.enqueued += 1
+        except queue.Full:
+            with self.lock: self.sync_writes += 1
+            self._write([fields])
+        return fields['id']
+
+    def _write(self, batch):
+        with app.app_context():
+            try:
+                db.session.add_all([AssessmentLog(**fields) for fields in batch]); db.session.commit()
+                with self.lock: self.written += len(batch); self.batches += 1
+            except Exception as e:
+                db.session.rollback()
+                with self.lock: self.failed += len(batch)
+                app.logger.error(f"Gagal menulis {len(batch)} log asesmen: {str(e)}")
+            finally: db.session.remove()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            batch, stop = ([] if item is self._STOP else [item]), item is self._STOP
+            deadline = time.monotonic() + self.flush_interval
+            while not stop and len(batch) < self.batch_size: # Kumpulkan sampai batch penuh atau interval habis
+                try: item = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty: break
+                if item is self._STOP: stop = True
+                else: batch.append(item)
+            if batch: self._write(batch)
+            for _ in range(len(batch) + (1 if stop else 0)): self.queue.task_done()
+            if stop: return
+
+    def flush(self):
+        """Tunggu sampai semua log yang sudah diantrekan tertulis."""
+        if self.thread is not None: self.queue.join()
+
+    def shutdown(self, timeout=10):
+        """Berhenti menerima antrean, tulis sisa log, lalu checkpoint WAL agar data ada di file database utama."""
+        with self.lock:
+            if self.stopped: return
+            self.stopped = True; thread = self.thread
+        if thread is not None: self.queue.put(self._STOP); thread.join(timeout)
+        with app.app_context():
+            try: db.session.execute(db.text("PRAGMA wal_checkpoint(TRUNCATE)")); db.session.commit()
+            except Exception as e: app.logger.warning(f"Checkpoint WAL gagal saat shutdown: {str(e)}")
+        app.logger.info(f"Penulis log asesmen berhenti. Tertulis: {self.written}, gagal: {self.failed}.")
+
+    def stats(self):
+        with self.lock:
+            return {"queued": self.queue.qsize(), "enqueued": self.enqueued, "written": self.written, "batches": self.batches, "failed": self.failed, "sync_writes": self.sync_writes,
+                    "batch_size": self.batch_size, "flush_interval_seconds": self.flush_interval}
+
+assessment_log_writer = AssessmentLogWriter(LOG_WRITER_BATCH, LOG_WRITER_FLUSH_INTERVAL, LOG_WRITER_MAX_QUEUE)
+atexit.register(assessment_log_writer.shutdown)
+
 # --- Konfigurasi Klien API ---
 GEMINI_KEY = os.getenv('GEMINI_API_KEY'); BYTEPLUS_KEY = os.getenv('BYTEPLUS_API_KEY'); GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY'); GOOGLE_CSE_ID = os.getenv('GOOGLE_CSE_ID')
-GEMINI_MODEL_NAME = "gemini-2.5-flash"; BYTEPLUS_MODEL_NAME = "seed-1-6-250615"; BYTEPLUS_API_ENDPOINT = "https://ark.ap-southeast.bytepluses.com/api/v3/chat/completions"
-gemini_model = None; google_search_service = None 
-if GEMINI_KEY:
-    try: genai.configure(api_key=GEMINI_KEY); gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME); app.logger.info(f"Gemini OK: {GEMINI_MODEL_NAME}")
-    except Exception as e: app.logger.error(f"Gemini Fail: {str(e)}")
-else: app.logger.warning("GEMINI_API_KEY missing.")
-if GOOGLE_API_KEY and GOOGLE_CSE_ID:
-    try: google_search_service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY); app.logger.info("Google Search OK.")
-    except Exception as e: app.logger.error(f"Google Search Fail: {str(e)}")
-else: app.logger.warning("GOOGLE keys missing. OSINT dibatasi.")
+GEMINI_MODEL_NAME = "gemini-2.5-flash"; BYTEPLUS_MODEL_NAME = "seed-1-6-250615"; BYTEPLUS_API_ENDPOINT = os.getenv('BYTEPLUS_API_ENDPOINT', "https://ark.ap-southeast.bytepluses.com/api/v3/chat/completions")
+GEMINI_API_ENDPOINT = os.getenv('GEMINI_API_ENDPOINT'); GOOGLE_CSE_ENDPOINT = os.getenv('GOOGLE_CSE_ENDPOINT') # Kosong = endpoint Google asli; diisi untuk server stub (bench/stub_providers.py)
+
+def _init_gemini():
+    if not GEMINI_KEY: return None
+    import google.generativeai as genai
+    if GEMINI_API_ENDPOINT: genai.configure(api_key=GEMINI_KEY, transport='rest', client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+    else: genai.configure(api_key=GEMINI_KEY)
+    model = genai.GenerativeModel(GEMINI_MODEL_NAME); app.logger.info(f"Gemini OK: {GEMINI_MODEL_NAME}")
+    return model
+
+def _init_google_search():
+    if not (GOOGLE_API_KEY and GOOGLE_CSE_ID): return None
+    from googleapiclient.discovery import build
+    service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY, client_options={"api_endpoint": GOOGLE_CSE_ENDPOINT} if GOOGLE_CSE_ENDPOINT else None); app.logger.info("Google Search OK.")
+    return service
+
+gemini_model = LazyResource('Gemini', _init_gemini, optional=True, bind='gemini_model') # Dikonfigurasi saat panggilan LLM pertama
+google_search_service = LazyResource('Google Search', _init_google_search, optional=True, bind='google_search_service')
+if not GEMINI_KEY: app.logger.warning("GEMINI_API_KEY missing.")
+if not (GOOGLE_API_KEY and GOOGLE_CSE_ID): app.logger.warning("GOOGLE keys missing. OSINT dibatasi.")
 if not BYTEPLUS_KEY: app.logger.warning("BYTEPLUS_API_KEY missing.")
 
-# --- Helper: Ekstraksi Teks File ---
-def extract_text_from_file(file_path):
+# --- Helper: Ekstraksi Teks File (di memori, dengan anggaran karakter + cache SHA-256) ---
+CV_TEXT_BUDGET = 1500; SKP_TEXT_BUDGET = 8000 # Hanya sebanyak ini yang dipakai prompt tunggal; SKP lebih panjang dianalisis map-reduce (SKP_FULL_TEXT_BUDGET)
+EXTRACT_CACHE_MAX_CHARS = int(float(os.getenv('EXTRACT_CACHE_MAX_MB', '32')) * 1024 * 1024); EXTRACT_CACHE_DIR = os.getenv('EXTRACT_CACHE_DIR') # Kosong = tanpa persistensi disk
+
+class ExtractionCache:
+    """Cache hasil ekstraksi per SHA-256 isi file: teks + metadata halaman.
+    LRU di memori dibatasi total karakter; opsional disalin ke EXTRACT_CACHE_DIR (satu file JSON per dokumen).
+    Entri hasil baca parsial (anggaran) hanya melayani request dengan anggaran yang sama atau lebih kecil."""
+    def __init__(self, max_chars, cache_dir=None):
+        self.max_chars, self.cache_dir = max_chars, cache_dir
+        self.lock = threading.Lock(); self.entries = OrderedDict(); self.total_chars = 0
+        self.hits = self.disk_hits = self.misses = 0
+        if cache_dir: os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _usable(entry, max_chars): return entry["complete"] or (max_chars is not None and len(entry["text"]) > max_chars)
+
+    def get(self, key, max_chars):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and self._usable(entry, max_chars): self.entries.move_to_end(key); self.hits += 1; return entry
+        entry = self._load_disk(key)
+        if entry and self._usable(entry, max_chars):
+            with self.lock: self._insert(key, entry); self.disk_hits += 1
+            return entry
+        with self.lock: self.misses += 1
+        return None
+
+    def put(self, key, entry):
+        with self.lock:
+            current = self.entries.get(key)
+            if current and (current["complete"] or len(current["text"]) >= len(entry["text"])): return # Jangan ganti dengan hasil yang lebih pendek
+            self._insert(key, entry)
+        self._save_disk(key, entry)
+
+    def _insert(self, key, entry):
+        if len(entry["text"]) > self.max_chars: return
+        old = self.entries.pop(key, None)
+        if old: self.total_chars -= len(old["text"])
+        self.entries[key] = entry; self.total_chars += len(entry["text"])
+        while self.total_chars > self.max_chars: _, evicted = self.entries.popitem(last=False); self.total_chars -= len(evicted["text"])
+
+    def _disk_path(self, key): return os.path.join(self.cache_dir, f"{key}.json")
+    def _load_disk(self, key):
+        if not self.cache_dir: return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f: return json.load(f)
+        except (OSError, ValueError): return None
+    def _save_disk(self, key, entry):
+        if not self.cache_dir: return
+        try:
+            tmp_path = f"{self._disk_path(key)}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e: app.logger.error(f"Gagal simpan cache ekstraksi ke disk: {str(e)}")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {"entries": len(self.entries), "chars": self.total_chars, "max_chars": self.max_chars, "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0, "persistent": bool(self.cache_dir)}
+
+extraction_cache = ExtractionCache(EXTRACT_CACHE_MAX_CHARS, EXTRACT_CACHE_DIR)
+
+def _join_within_budget(parts, sep, max_chars):
+    """Gabungkan potongan teks (halaman/paragraf) dan berhenti membaca begitu anggaran karakter TERLAMPAUI
+    (sehingga len(hasil) > max_chars berarti dokumen memang lebih panjang dari anggaran). Mengembalikan (teks, jumlah_potongan_dibaca)."""
+    collected = []; total = 0
+    for part in parts:
+        collected.append(part); total += len(part) + len(sep)
+        if max_chars is not None and total > max_chars: break
+    return sep.join(collected), len(collected)
+
+def _parse_document(data, ext, max_chars):
+    """Parsing dokumen -> dict teks + metadata halaman, atau None jika format tidak didukung."""
+    if ext == 'pdf':
+        with fitz.open(stream=data, filetype='pdf') as doc:
+            text, pages_read = _join_within_budget((page.get_text() for page in doc), "", max_chars)
+            return {"text": text, "pages": doc.page_count, "pages_read": pages_read, "complete": pages_read == doc.page_count}
+    if ext == 'txt':
+        return {"text": data.decode('utf-8'), "pages": None, "pages_read": None, "complete": True}
+    if ext in ('docx', 'doc'):
+        if ext == 'doc': app.logger.warning(".doc might not be fully supported.")
+        try: doc = docx.Document(BytesIO(data))
+        except Exception:
+            if ext == 'doc': return None
+            raise
+        paragraphs = doc.paragraphs; text, read = _join_within_budget((para.text for para in paragraphs), "\n", max_chars)
+        return {"text": text, "pages": None, "pages_read": None, "complete": read == len(paragraphs)}
+    return None
+
+@instrument_stage('extract')
+def extract_document(data, filename, max_chars=None):
+    """Ekstrak teks dari isi file (bytes) tanpa menulis ke disk, lewat cache SHA-256.
+    Mengembalikan dict {text, pages, pages_read, complete, sha256, cached} atau None bila gagal. max_chars=None berarti baca seluruh dokumen."""
     try:
-        ext = file_path.lower().split('.')[-1]
-        text_content = None 
-        if ext == 'pdf':
-            doc = fitz.open(file_path); text_content = "".join(page.get_text() for page in doc); doc.close()
-        elif ext == 'txt':
-            with open(file_path, 'r', encoding='utf-8') as f: text_content = f.read()
-        elif ext == 'docx':
-            doc = docx.Document(file_path); text_content = "\n".join([para.text for para in doc.paragraphs])
-        elif ext == 'doc': 
-             app.logger.warning(".doc might not be fully supported.")
-             try: doc = docx.Document(file_path); text_content = "\n".join([para.text for para in doc.paragraphs])
-             except: text_content = None 
-        if text_content: app.logger.info(f"Ekstraksi teks dari {os.path.basename(file_path)} berhasil.")
-        return text_content
-    except Exception as e: app.logger.error(f"Error fatal ekstrak file {file_path}: {str(e)}"); return None
-
-# --- Helper: Fungsi Panggilan AI ---
+        ext = filename.lower().split('.')[-1]
+        sha256 = hashlib.sha256(data).hexdigest(); key = f"{sha256}.{ext}" # Ekstensi ikut key: bytes sama bisa diparsing berbeda
+        entry = extraction_cache.get(key, max_chars)
+        if entry:
+            app.logger.info(f"Ekstraksi teks dari {filename}: cache HIT ({sha256[:12]}).")
+            return {**entry, "sha256": sha256, "cached": True}
+        entry = _parse_document(data, ext, max_chars)
+        if not entry or not entry["text"]: return None
+        extraction_cache.put(key, entry)
+        app.logger.info(f"Ekstraksi teks dari {filename} berhasil ({len(entry['text'])} chars).")
+        return {**entry, "sha256": sha256, "cached": False}
+    except Exception as e: app.logger.error(f"Error fatal ekstrak file {filename}: {str(e)}"); return None
+
+def extraction_cache_status(result):
+    return None if result is None else ('hit' if result["cached"] else 'miss')
+
+def extract_upload(file_storage, max_chars=None):
+    """Baca upload (FileStorage) langsung dari stream request; ukuran sudah dibatasi MAX_CONTENT_LENGTH."""
+    return extract_document(file_storage.read(), secure_filename(file_storage.filename), max_chars)
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    subject = "file" if request.mimetype == 'multipart/form-data' else "body request" # Rute JSON (ekspor batch, graf Nakhoda) bukan upload file
+    return jsonify({"error": f"Ukuran {subject} melebihi batas {(request.max_content_length or 0) / (1024 * 1024):g} MB."}), 413
+
+# --- Helper: Pipeline Konkuren (thread pool + batas waktu per tahap) ---
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', '8'))
+OSINT_STAGE_TIMEOUT = float(os.getenv('OSINT_STAGE_TIMEOUT', '5')); EXTRACT_STAGE_TIMEOUT = float(os.getenv('EXTRACT_STAGE_TIMEOUT', '20'))
+pipeline_executor = ContextThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix='pipeline')
+
+def await_stage(future, timeout, stage):
+    """Tunggu hasil satu tahap pipeline. Mengembalikan (hasil, status) dengan status 'ok' / 'timeout' / 'error'."""
+    try: return future.result(timeout=max(0.0, timeout)), 'ok'
+    except FuturesTimeoutError: app.logger.warning(f"Pipeline: tahap {stage} melewati batas waktu ({timeout:.1f}s), dilanjutkan tanpa hasilnya."); return None, 'timeout'
+    except Exception as e: app.logger.error(f"Pipeline: tahap {stage} gagal: {str(e)}"); return None, 'error'
+
+# --- Helper: Admission Control Provider (batas konkurensi, token bucket, antrean prioritas berbatas + deadline) ---
+ADMISSION_PRIORITIES = {'interactive': 0, 'batch': 1, 'background': 2} # Angka kecil = dilayani lebih dulu
+ADMISSION_WAIT = {'interactive': float(os.getenv('ADMISSION_WAIT_INTERACTIVE', '10')), 'batch': float(os.getenv('ADMISSION_WAIT_BATCH', '300')),
+                  'background': float(os.getenv('ADMISSION_WAIT_BACKGROUND', '30'))} # Detik maksimal menunggu giliran sebelum ditolak
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '32')); ADMISSION_BATCH_QUEUE_SHARE = float(os.getenv('ADMISSION_BATCH_QUEUE_SHARE', '0.5')) # Sisa antrean dicadangkan untuk request interaktif
+ADMISSION_LIMITS = {provider: (int(os.getenv(f'ADMISSION_{provider.upper()}_CONCURRENCY', concurrency)), float(os.getenv(f'ADMISSION_{provider.upper()}_RPS', rps)), int(os.getenv(f'ADMISSION_{provider.upper()}_BURST', burst)))
+                    for provider, (concurrency, rps, burst) in {'gemini': ('8', '4', '8'), 'byteplus': ('8', '8', '16'), 'google_cse': ('4', '2', '5')}.items()} # RPS 0 = tanpa token bucket
+_admission_priority = contextvars.ContextVar('navigara_admission_priority', default='interactive')
+metrics.describe('navigara_admission_total', 'counter', "Keputusan admission control per provider & prioritas: admitted (langsung / antre) atau rejected (queue_full / deadline).")
+
+class ProviderBusy(Exception):
+    """Admission control menolak panggilan provider (antrean penuh / batas waktu antre lewat); dijawab 503 + Retry-After."""
+    def __init__(self, provider, reason, retry_after):
+        super().__init__(f"Provider {provider} sedang penuh ({'antrean penuh' if reason == 'queue_full' else 'batas waktu antre terlewati'}), coba lagi dalam {retry_after} detik.")
+        self.provider, self.reason, self.retry_after = provider, reason, retry_after
+
+@app.errorhandler(ProviderBusy)
+def provider_busy(e):
+    return jsonify({"error": str(e), "provider": e.provider}), 503, {"Retry-After": str(e.retry_after)}
+
+@contextlib.contextmanager
+def admission_priority(priority):
+    """Prioritas admission untuk semua panggilan provider di dalam blok; ikut terbawa ke ContextThreadPoolExecutor."""
+    token = _admission_priority.set(priority)
+    try: yield
+    finally: _admission_priority.reset(token)
+
+class ProviderLimiter:
+    """Gerbang satu provider: maksimal `concurrency` panggilan berjalan dan laju dibatasi token bucket (rps, burst).
+    Sisanya antre menurut (prioritas, urutan datang) sampai deadline masing-masing; antrean berbatas, batch/background hanya boleh mengisi sebagian."""
+    def __init__(self, name, concurrency, rps, burst, max_queue):
+        self.name, self.concurrency, self.rps, self.burst, self.max_queue = name, max(1, concurrency), rps, max(1, burst), max_queue
+        self.cond = threading.Condition(); self.active = 0; self.tokens = float(self.burst); self.refilled_at = time.monotonic()
+        self.waiters = []; self.sequence = itertools.count(); self.hold_ewma = 1.0 # Rata-rata (EWMA) lama satu panggilan memegang slot, untuk Retry-After
+        self.admitted = self.queued = self.rejected = 0
+
+    def _refill(self, now):
+        if self.rps > 0: self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rps)
+        self.refilled_at = now
+
+    def _ready(self): return self.active < self.concurrency and (self.rps <= 0 or self.tokens >= 1)
+
+    def _take(self, priority, queued):
+        self.active += 1; self.admitted += 1
+        if self.rps > 0: self.tokens -= 1
+        metrics.inc('navigara_admission_total', provider=self.name, priority=priority, outcome='queued' if queued else 'admitted')
+
+    def _queue_limit(self, priority): return self.max_queue if priority == 'interactive' else int(self.max_queue * ADMISSION_BATCH_QUEUE_SHARE)
+
+    def _reject(self, reason, priority):
+        """Retry-After = estimasi detik sampai antrean saat ini habis (dari lama panggilan per slot dan laju token), 1-60."""
+        self.rejected += 1; metrics.inc('navigara_admission_total', provider=self.name, priority=priority, outcome=reason)
+        ahead = len(self.waiters) + 1; estimate = max(ahead * self.hold_ewma / self.concurrency, ahead / self.rps if self.rps > 0 else 0.0)
+        app.logger.warning(f"Admission {self.name}: ditolak ({reason}, prioritas {priority}, {self.active} berjalan, {len(self.waiters)} antre).")
+        return ProviderBusy(self.name, reason, max(1, min(60, math.ceil(estimate))))
+
+    def check(self, priority=None):
+        """Tolak lebih awal tanpa reservasi slot bila antrean untuk prioritas ini sudah penuh (dipakai sebelum respons streaming dimulai)."""
+        priority = priority or _admission_priority.get()
+        with self.cond:
+            if len(self.waiters) >= self._queue_limit(priority): raise self._reject('queue_full', priority)
+
+    def acquire(self, priority=None):
+        """Ambil satu slot; mengembalikan lama antre (detik). ProviderBusy bila antrean penuh atau deadline prioritas ini terlewati."""
+        priority = priority or _admission_priority.get(); started = time.monotonic()
+        deadline = started + ADMISSION_WAIT.get(priority, ADMISSION_WAIT['interactive'])
+        with self.cond:
+            self._refill(started)
+            if not self.waiters and self._ready(): self._take(priority, False); return 0.0
+            if len(self.waiters) >= self._queue_limit(priority): raise self._reject('queue_full', priority)
+            entry = (ADMISSION_PRIORITIES.get(priority, 0), next(self.sequence)); heapq.heappush(self.waiters, entry); self.queued += 1
+            try:
+                while True:
+                    now = time.monotonic(); self._refill(now)
+                    if self.waiters[0] == entry and self._ready():
+                        heapq.heappop(self.waiters); self._take(priority, True); self.cond.notify_all() # Kepala antrean berikutnya mungkin juga bisa jalan
+                        return now - started
+                    if now >= deadline: raise self._reject('deadline', priority)
+                    wait = deadline - now
+                    if self.waiters[0] == entry and self.active < self.concurrency: wait = min(wait, (1 - self.tokens) / self.rps) # Tinggal menunggu token
+                    self.cond.wait(wait)
+            except BaseException:
+                if entry in self.waiters: self.waiters.remove(entry); heapq.heapify(self.waiters); self.cond.notify_all()
+                raise
+
+    def release(self, held):
+        with self.cond: self.active -= 1; self.hold_ewma = 0.8 * self.hold_ewma + 0.2 * held; self.cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self):
+        waited = self.acquire()
+        if waited: record_stage(f"queue_{self.name}", waited) # Lama antre terlihat di Server-Timing, terpisah dari durasi upstream
+        started = time.monotonic()
+        try: yield
+        finally: self.release(time.monotonic() - started)
+
+    def stats(self):
+        with self.cond:
+            self._refill(time.monotonic())
+            return {"active": self.active, "waiting": len(self.waiters), "concurrency": self.concurrency, "rps": self.rps, "burst": self.burst,
+                    "tokens": round(self.tokens, 2) if self.rps > 0 else None, "max_queue": self.max_queue, "avg_hold_s": round(self.hold_ewma, 3),
+                    "admitted": self.admitted, "queued": self.queued, "rejected": self.rejected}
+
+admission_limiters = {name: ProviderLimiter(name, concurrency, rps, burst, ADMISSION_MAX_QUEUE) for name, (concurrency, rps, burst) in ADMISSION_LIMITS.items()}
+
+def admission_controlled(provider):
+    """Decorator: panggilan upstream (fungsi biasa atau generator streaming) baru berjalan setelah mendapat slot admission provider."""
+    limiter = admission_limiters[provider]
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def stream_wrapper(*args, **kwargs):
+                with limiter.slot(): yield from fn(*args, **kwargs) # Slot dipegang sampai stream selesai / ditutup
+            return stream_wrapper
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with limiter.slot(): return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# --- Helper: Fungsi Panggilan AI (Klien Bersama, Pool Koneksi & Streaming) ---
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '60')); LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', '16'))
+llm_executor = ContextThreadPoolExecutor(max_workers=LLM_POOL_SIZE, thread_name_prefix='llm')
+_byteplus_session = None; _byteplus_session_lock = threading.Lock()
+
+def get_byteplus_session():
+    """Session HTTP bersama (keep-alive + connection pool) untuk semua panggilan Byteplus."""
+    global _byteplus_session
+    if _byteplus_session is None:
+        with _byteplus_session_lock:
+            if _byteplus_session is None:
+                session = requests.Session()
+                # Retry hanya untuk gagal koneksi; POST yang sudah terkirim tidak diulang (hindari biaya ganda).
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=LLM_POOL_SIZE, max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.3))
+                session.mount('https://', adapter); session.mount('http://', adapter)
+                _byteplus_session = session
+    return _byteplus_session
+
+def _byteplus_request(prompt, system_prompt, stream=False):
+    headers = {"Authorization": f"Bearer {BYTEPLUS_KEY}", "Content-Type": "application/json"}
+    payload = {"model": BYTEPLUS_MODEL_NAME, "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": prompt}]}
+    if stream: payload["stream"] = True
+    return get_byteplus_session().post(BYTEPLUS_API_ENDPOINT, headers=headers, json=payload, timeout=(LLM_CONNECT_TIMEOUT, LLM_TIMEOUT), stream=stream)
+
+@admission_controlled('gemini')
+@instrument_stage('llm_gemini')
 def call_gemini_api(prompt):
     if not gemini_model: return "Error: Klien API Gemini tidak terkonfigurasi."
-    app.logger.info(f"Calling Gemini API ({len(prompt)} chars)")
-    try: response = gemini_model.generate_content(prompt); return response.text
-    except Exception as e: app.logger.error(f"Error API Gemini: {str(e)}"); return f"Error API Gemini: {str(e)}"
+    app.logger.info(f"Calling Gemini API ({len(prompt)} chars)"); metrics.inc('navigara_llm_prompt_chars_total', len(prompt), provider='gemini')
+    try: text = gemini_model.generate_content(prompt, request_options={"timeout": LLM_TIMEOUT}).text; metrics.inc('navigara_llm_response_chars_total', len(text), provider='gemini'); return text
+    except Exception as e: count_upstream_error('gemini', e); app.logger.error(f"Error API Gemini: {str(e)}"); return f"Error API Gemini: {str(e)}"
+@admission_controlled('byteplus')
+@instrument_stage('llm_byteplus')
 def call_byteplus_api(prompt, system_prompt="Anda asisten AI."):
     if not BYTEPLUS_KEY: return "Error: Klien API Byteplus tidak terkonfigurasi."
-    app.logger.info(f"Calling Byteplus API ({len(prompt)} chars)")
-    headers = {"Authorization": f"Bearer {BYTEPLUS_KEY}", "Content-Type": "application/json"}
-    payload = {"model": BYTEPLUS_MODEL_NAME, "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": prompt}]}
+    app.logger.info(f"Calling Byteplus API ({len(prompt)} chars)"); metrics.inc('navigara_llm_prompt_chars_total', len(prompt) + len(system_prompt), provider='byteplus')
     try:
-        response = requests.post(BYTEPLUS_API_ENDPOINT, headers=headers, json=payload, timeout=60)
+        response = _byteplus_request(prompt, system_prompt)
         response.raise_for_status()
-        return response.json()['choices'][0]['message']['content']
-    except requests.exceptions.ReadTimeout: return "Error: API Byteplus Timeout (60s)."
-    except Exception as e: app.logger.error(f"Error API Byteplus: {str(e)}"); return f"Error API Byteplus: {str(e)}"
+        text = response.json()['choices'][0]['message']['content']; metrics.inc('navigara_llm_response_chars_total', len(text), provider='byteplus')
+        return text
+    except requests.exceptions.ReadTimeout as e: count_upstream_error('byteplus', e); return f"Error: API Byteplus Timeout ({LLM_TIMEOUT:g}s)."
+    except Exception as e: count_upstream_error('byteplus', e); app.logger.error(f"Error API Byteplus: {str(e)}"); return f"Error API Byteplus: {str(e)}"
 
-# --- Helper: OSINT Engine ---
-def run_osint_analysis(query):
-    app.logger.info(f"OSINT Engine: Google Search '{query}'")
+@admission_controlled('gemini')
+def stream_gemini_api(prompt):
+    """Generator potongan teks dari Gemini (stream=True). Error dikirim sebagai potongan teks 'Error API Gemini: ...'."""
+    if not gemini_model: yield "Error: Klien API Gemini tidak terkonfigurasi."; return
+    app.logger.info(f"Streaming Gemini API ({len(prompt)} chars)"); metrics.inc('navigara_llm_prompt_chars_total', len(prompt), provider='gemini')
+    try:
+        for chunk in gemini_model.generate_content(prompt, stream=True, request_options={"timeout": LLM_TIMEOUT}):
+            try: text = chunk.text
+            except ValueError: continue # Chunk tanpa teks (mis. finish_reason / safety)
+            if text: yield text
+    except Exception as e: count_upstream_error('gemini', e); app.logger.error(f"Error API Gemini (stream): {str(e)}"); yield f"Error API Gemini: {str(e)}"
+@admission_controlled('byteplus')
+def stream_byteplus_api(prompt, system_prompt="Anda asisten AI."):
+    """Generator potongan teks dari Byteplus (chat completions SSE, 'data: {...}' per baris)."""
+    if not BYTEPLUS_KEY: yield "Error: Klien API Byteplus tidak terkonfigurasi."; return
+    app.logger.info(f"Streaming Byteplus API ({len(prompt)} chars)"); metrics.inc('navigara_llm_prompt_chars_total', len(prompt) + len(system_prompt), provider='byteplus')
+    try:
+        with _byteplus_request(prompt, system_prompt, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'): continue
+                data = line[5:].strip()
+                if data == '[DONE]': break
+                choices = json.loads(data).get('choices') or []
+                delta = choices[0].get('delta', {}).get('content') if choices else None
+                if delta: yield delta
+    except requests.exceptions.ReadTimeout as e: count_upstream_error('byteplus', e); yield f"Error: API Byteplus Timeout ({LLM_TIMEOUT:g}s)."
+    except Exception as e: count_upstream_error('byteplus', e); app.logger.error(f"Error API Byteplus (stream): {str(e)}"); yield f"Error API Byteplus: {str(e)}"
+
+def call_ai(provider, prompt, system_prompt="Anda asisten AI."):
+    """Dispatcher provider lewat llm_router: 'gemini' -> Gemini, selain itu -> Byteplus sebagai pilihan utama; failover/hedging/circuit breaker di ProviderRouter."""
+    return llm_router.call(provider, prompt, system_prompt)[0]
+def stream_ai(provider, prompt, system_prompt="Anda asisten AI.", outcome=None):
+    """outcome (dict, opsional) diisi saat stream selesai: 'provider' yang benar-benar menjawab dan 'ok' (False bila stream berakhir dengan error)."""
+    llm_router.check_admission(provider) # Antrean penuh -> 503 sebelum respons SSE dimulai
+    return llm_router.stream(provider, prompt, system_prompt, outcome)
+def _raw_call_ai(provider, prompt, system_prompt):
+    if provider == 'gemini': return call_gemini_api(prompt)
+    return call_byteplus_api(prompt, system_prompt)
+def _raw_stream_ai(provider, prompt, system_prompt):
+    if provider == 'gemini': return _instrument_stream('gemini', stream_gemini_api(prompt))
+    return _instrument_stream('byteplus', stream_byteplus_api(prompt, system_prompt))
+def _instrument_stream(provider, chunks):
+    """Durasi stream (sampai potongan terakhir) sebagai tahap llm_<provider>, plus jumlah karakter respons."""
+    started = time.perf_counter(); size = 0
+    try:
+        for chunk in chunks: size += len(chunk); yield chunk
+    finally: record_stage(f"llm_{provider}", time.perf_counter() - started); metrics.inc('navigara_llm_response_chars_total', size, provider=provider)
+def submit_ai(provider, prompt, system_prompt="Anda asisten AI."):
+    """Jalankan call_ai di pool thread LLM; mengembalikan Future agar pemanggil bisa mengerjakan hal lain."""
+    return llm_executor.submit(call_ai, provider, prompt, system_prompt)
+
+def is_ai_error(text):
+    """True untuk hasil kosong atau string error ('Error: ...', 'Error API Gemini: ...', dst.)."""
+    return not text or text.lstrip().startswith("Error")
+
+# --- Helper: Router Provider LLM (statistik rolling, circuit breaker, failover & hedging Gemini <-> Byteplus) ---
+LLM_PROVIDERS = ('gemini', 'byteplus')
+LLM_ROUTER_WINDOW = int(os.getenv('LLM_ROUTER_WINDOW', '50')); LLM_ROUTER_WINDOW_SECONDS = float(os.getenv('LLM_ROUTER_WINDOW_SECONDS', '300')) # Sampel terakhir yang dihitung
+LLM_ROUTER_MIN_SAMPLES = int(os.getenv('LLM_ROUTER_MIN_SAMPLES', '5')); LLM_ROUTER_ERROR_RATE = float(os.getenv('LLM_ROUTER_ERROR_RATE', '0.5'))
+LLM_ROUTER_FAILURE_STREAK = int(os.getenv('LLM_ROUTER_FAILURE_STREAK', '3')); LLM_ROUTER_OPEN_SECONDS = float(os.getenv('LLM_ROUTER_OPEN_SECONDS', '30'))
+LLM_ROUTER_FAILOVER = os.getenv('LLM_ROUTER_FAILOVER', '1') != '0'
+LLM_HEDGE = os.getenv('LLM_HEDGE', '0') == '1' # Per request: ?hedge=1 / ?hedge=0
+LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', '1')); LLM_HEDGE_DEFAULT_DELAY = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY', '15')) # Detik; default dipakai sebelum p95 punya cukup sampel
+llm_hedge_executor = ContextThreadPoolExecutor(max_workers=LLM_POOL_SIZE, thread_name_prefix='llm-hedge') # Terpisah dari llm_executor: call_ai sendiri bisa berjalan di sana
+_hedge_override = contextvars.ContextVar('navigara_llm_hedge', default=None)
+metrics.describe('navigara_llm_failovers_total', 'counter', "Panggilan LLM yang dialihkan ke provider lain setelah provider utama gagal / circuit terbuka.")
+metrics.describe('navigara_llm_hedges_total', 'counter', "Request hedge ke provider kedua (provider = provider kedua, winner = primary/hedge/none).")
+metrics.describe('navigara_llm_circuit_opens_total', 'counter', "Circuit breaker provider LLM yang terbuka.")
+
+@app.before_request
+def _read_hedge_flag():
+    flag = request.args.get('hedge') # Hanya query string: body multipart/stream tidak disentuh sebelum handler
+    _hedge_override.set(None if flag is None else flag.lower() in ('1', 'true', 'yes'))
+
+class ProviderHealth:
+    """Jendela rolling (latensi, sukses) satu provider + state circuit breaker: closed -> open (tolak) -> half_open (satu probe) -> closed/open."""
+    def __init__(self, name):
+        self.name = name; self.samples = deque(); self.state = 'closed'; self.opened_at = 0.0
+        self.failure_streak = 0; self.probe_in_flight = False; self.opens = 0
+
+    def trim(self, now):
+        while self.samples and (len(self.samples) > LLM_ROUTER_WINDOW or now - self.samples[0][0] > LLM_ROUTER_WINDOW_SECONDS): self.samples.popleft()
+
+    def error_rate(self):
+        return sum(1 for _, _, ok in self.samples if not ok) / len(self.samples) if self.samples else 0.0
+
+    def latency_percentile(self, q):
+        latencies = sorted(latency for _, latency, ok in self.samples if ok)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if len(latencies) >= LLM_ROUTER_MIN_SAMPLES else None
+
+class ProviderRouter:
+    """Memilih provider untuk tiap panggilan LLM: provider pilihan pengguna lebih dulu, lalu failover ke provider lain bila gagal atau circuit-nya terbuka.
+    Mode hedged: bila provider utama belum selesai setelah p95-nya, request kedua dikirim ke provider lain dan hasil sukses pertama yang dipakai."""
+    def __init__(self, providers):
+        self.lock = threading.Lock(); self.health = {name: ProviderHealth(name) for name in providers}
+
+    @staticmethod
+    def configured(provider):
+        return bool(gemini_model) if provider == 'gemini' else bool(BYTEPLUS_KEY)
+
+    def _available(self, health, now):
+        return health.state == 'closed' or (health.state == 'open' and now - health.opened_at >= LLM_ROUTER_OPEN_SECONDS) or (health.state == 'half_open' and not health.probe_in_flight)
+
+    def order(self, provider):
+        """Urutan percobaan: provider sehat dulu (pilihan pengguna di depan), provider dengan circuit terbuka tidak dicoba. [] = tidak ada yang bisa dipakai."""
+        preferred = 'gemini' if provider == 'gemini' else 'byteplus' # Samakan dengan dispatcher lama
+        candidates = [preferred] + ([p for p in self.health if p != preferred] if LLM_ROUTER_FAILOVER else [])
+        now = time.monotonic()
+        with self.lock: available = {p: self._available(self.health[p], now) for p in candidates}
+        return [p for p in candidates if available[p] and self.configured(p)]
+
+    def routable(self, provider):
+        return provider in LLM_PROVIDERS and any(self.configured(p) for p in ([provider] + [p for p in self.health if p != provider] if LLM_ROUTER_FAILOVER else [provider]))
+
+    def allow(self, provider):
+        """Dipanggil tepat sebelum percobaan; di state open yang sudah lewat masa tunggu, hanya satu probe (half_open) yang diizinkan."""
+        now = time.monotonic()
+        with self.lock:
+            health = self.health[provider]
+            if health.state == 'closed': return True
+            if health.state == 'open' and now - health.opened_at >= LLM_ROUTER_OPEN_SECONDS: health.state = 'half_open'
+            if health.state == 'half_open' and not health.probe_in_flight: health.probe_in_flight = True; return True
+            return False
+
+    def record(self, provider, latency, ok):
+        now = time.monotonic()
+        with self.lock:
+            health = self.health[provider]; health.samples.append((now, latency, ok)); health.trim(now)
+            health.failure_streak = 0 if ok else health.failure_streak + 1
+            if health.state == 'half_open':
+                health.probe_in_flight = False
+                if ok: health.state = 'closed'; health.samples.clear(); health.samples.append((now, latency, ok)); app.logger.info(f"LLM router: circuit {provider} tertutup kembali.")
+                else: self._open(health, now)
+            elif health.state == 'closed' and not ok and (health.failure_streak >= LLM_ROUTER_FAILURE_STREAK or
+                                                          (len(health.samples) >= LLM_ROUTER_MIN_SAMPLES and health.error_rate() >= LLM_ROUTER_ERROR_RATE)):
+                self._open(health, now)
+
+    def _open(self, health, now):
+        health.state, health.opened_at = 'open', now; health.opens += 1; metrics.inc('navigara_llm_circuit_opens_total', provider=health.name)
+        app.logger.warning(f"LLM router: circuit {health.name} TERBUKA (error rate {health.error_rate():.0%}, {health.failure_streak} gagal beruntun) selama {LLM_ROUTER_OPEN_SECONDS:g}s.")
+
+    def _release_probe(self, provider):
+        """Percobaan ditolak admission control sebelum menyentuh upstream: bukan sinyal kesehatan, probe half_open dikembalikan."""
+        with self.lock:
+            if self.health[provider].state == 'half_open': self.health[provider].probe_in_flight = False
+
+    def check_admission(self, provider):
+        """ProviderBusy bila antrean admission semua provider kandidat sudah penuh."""
+        rejections = []
+        for name in self.order(provider):
+            try: admission_limiters[name].check(); return
+            except ProviderBusy as e: rejections.append(e)
+        if rejections: raise min(rejections, key=lambda e: e.retry_after)
+
+    def hedge_delay(self, provider):
+        with self.lock: p95 = self.health[provider].latency_percentile(0.95)
+        return min(max(p95 if p95 is not None else LLM_HEDGE_DEFAULT_DELAY, LLM_HEDGE_MIN_DELAY), LLM_TIMEOUT)
+
+    def _attempt(self, provider, prompt, system_prompt):
+        started = time.perf_counter()
+        try: text = _raw_call_ai(provider, prompt, system_prompt)
+        except ProviderBusy: self._release_probe(provider); raise
+        except Exception as e: text = f"Error API {provider}: {str(e)}"
+        self.record(provider, time.perf_counter() - started, not is_ai_error(text))
+        return text
+
+    @staticmethod
+    def _unavailable(provider):
+        return f"Error: Provider LLM tidak tersedia (circuit breaker {provider} terbuka atau tidak terkonfigurasi)."
+
+    def call(self, provider, prompt, system_prompt):
+        """Mengembalikan (teks, provider_yang_menjawab); provider None bila tidak ada yang bisa dicoba."""
+        order = self.order(provider)
+        if not order: return self._unavailable(provider), None
+        hedge = _hedge_override.get()
+        if (LLM_HEDGE if hedge is None else hedge) and len(order) > 1 and self.allow(order[0]): return self._call_hedged(order[0], order[1], prompt, system_prompt)
+        text = busy = previous = answered = None
+        for name in order:
+            if not self.allow(name): continue
+            if previous: metrics.inc('navigara_llm_failovers_total', from_provider=previous, to_provider=name); app.logger.warning(f"LLM router: failover {previous} -> {name}")
+            previous = name
+            try: text = self._attempt(name, prompt, system_prompt)
+            except ProviderBusy as e: busy = e; continue # Provider penuh -> coba provider lain; semua penuh -> 503
+            answered = name
+            if not is_ai_error(text): return text, name
+        if text is None and busy: raise busy
+        return (text, answered) if text is not None else (self._unavailable(provider), None)
+
+    def _call_hedged(self, primary, backup, prompt, system_prompt):
+        """allow(primary) sudah dipanggil. Request yang kalah tetap berjalan sampai selesai (HTTP tidak bisa dibatalkan) dan hasilnya tetap masuk statistik."""
+        delay = self.hedge_delay(primary); first = llm_hedge_executor.submit(self._attempt, primary, prompt, system_prompt); busy = None
+        try: text = first.result(timeout=delay)
+        except FuturesTimeoutError: text = None
+        except ProviderBusy as e: text, busy = None, e
+        if text is not None or busy: # Selesai sebelum batas hedge: sukses, atau gagal / ditolak cepat -> failover biasa
+            if text is not None and not is_ai_error(text): return text, primary
+            if not self.allow(backup):
+                if busy: raise busy
+                return text, primary
+            metrics.inc('navigara_llm_failovers_total', from_provider=primary, to_provider=backup); app.logger.warning(f"LLM router: failover {primary} -> {backup}")
+            return self._attempt(backup, prompt, system_prompt), backup
+        if not self.allow(backup): return first.result(), primary
+        app.logger.info(f"LLM router: {primary} belum selesai setelah {delay:.1f}s, hedge ke {backup}")
+        second = llm_hedge_executor.submit(self._attempt, backup, prompt, system_prompt); futures = {first: ('primary', primary), second: ('hedge', backup)}
+        answered = None
+        for future in as_completed(futures):
+            try: text = future.result()
+            except ProviderBusy as e: busy = e; continue
+            answered = futures[future][1]
+            if not is_ai_error(text): metrics.inc('navigara_llm_hedges_total', provider=backup, winner=futures[future][0]); return text, answered
+        metrics.inc('navigara_llm_hedges_total', provider=backup, winner='none')
+        if answered is None: raise busy
+        return text, answered
+
+    def stream(self, provider, prompt, system_prompt, outcome=None):
+        """Failover hanya sebelum potongan pertama terkirim (error di potongan pertama -> provider berikutnya); stream tidak di-hedge.
+        Fungsi stream_* mengirim error sebagai potongan terakhir, jadi stream yang gagal di tengah jalan dinilai dari potongan terakhirnya."""
+        outcome = {} if outcome is None else outcome; outcome.update(provider=None, ok=False)
+        order = self.order(provider)
+        if not order: yield self._unavailable(provider); return
+        tried = busy = None
+        for index, name in enumerate(order):
+            if not self.allow(name): continue
+            if tried: metrics.inc('navigara_llm_failovers_total', from_provider=tried, to_provider=name); app.logger.warning(f"LLM router: failover stream {tried} -> {name}")
+            started = time.perf_counter(); chunks = _raw_stream_ai(name, prompt, system_prompt); ok = False
+            try:
+                try: first = next(chunks, "")
+                except ProviderBusy as e: busy, tried = e, name; self._release_probe(name); continue
+                if is_ai_error(first) and index < len(order) - 1: self.record(name, time.perf_counter() - started, False); tried = name; continue
+                ok = not is_ai_error(first); last = first
+                if first: yield first
+                for chunk in chunks:
+                    if chunk: last = chunk
+                    yield chunk
+                ok = not is_ai_error(last)
+            finally:
+                if tried != name: self.record(name, time.perf_counter() - started, ok); outcome.update(provider=name, ok=ok)
+            return
+        if busy: raise busy # Jadi event 'error' di respons SSE
+        yield self._unavailable(provider)
+
+    def stats(self):
+        now = time.monotonic()
+        with self.lock:
+            providers = {}
+            for name, health in self.health.items():
+                health.trim(now); p50, p95 = health.latency_percentile(0.5), health.latency_percentile(0.95)
+                providers[name] = {"configured": bool(BYTEPLUS_KEY) if name == 'byteplus' else None, "state": health.state, "samples": len(health.samples), "error_rate": round(health.error_rate(), 4),
+                                   "p50_ms": round(p50 * 1000, 1) if p50 is not None else None, "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                                   "failure_streak": health.failure_streak, "opens": health.opens,
+                                   "reopen_in_s": round(max(0.0, LLM_ROUTER_OPEN_SECONDS - (now - health.opened_at)), 1) if health.state == 'open' else None}
+        providers['gemini']["configured"] = self.configured('gemini') # Di luar lock: bisa memicu init klien lazy
+        return {"providers": providers, "failover": LLM_ROUTER_FAILOVER, "hedge": LLM_HEDGE, "hedge_delay_s": {name: round(self.hedge_delay(name), 2) for name in self.health}}
+
+llm_router = ProviderRouter(LLM_PROVIDERS)
+
+# --- Helper: Cache Respons LLM (SQLite, content-addressed) ---
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') != '0'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join(app.instance_path, 'llm_cache.db'))
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', str(7 * 24 * 3600))) # detik
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '5000')); LLM_CACHE_MAX_BYTES = int(float(os.getenv('LLM_CACHE_MAX_MB', '64')) * 1024 * 1024)
+
+class LLMResponseCache:
+    """Cache respons LLM di SQLite. Key = sha256(provider, model, system prompt, prompt ternormalisasi).
+    TTL per entri, eviksi LRU (last_access) saat melewati batas jumlah entri / ukuran total, plus counter hit/miss."""
+    def __init__(self, path, ttl, max_entries, max_bytes):
+        self.path, self.ttl, self.max_entries, self.max_bytes = path, ttl, max_entries, max_bytes
+        self.lock = threading.Lock(); self._conn = None
+        self.hits = self.misses = self.stores = self.evictions = 0
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, provider TEXT, model TEXT, response TEXT NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)")
+        return self._conn
+
+    @staticmethod
+    def make_key(provider, model, system_prompt, prompt):
+        normalized = re.sub(r"\s+", " ", prompt or "").strip() # Indentasi/spasi prompt f-string tidak mengubah key
+        return hashlib.sha256("\x1f".join([provider, model, system_prompt or "", normalized]).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            try:
+                conn = self._db()
+                row = conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key)); self.hits += 1
+                    return row[0]
+                if row: conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            except sqlite3.Error as e: app.logger.error(f"LLM cache get gagal: {str(e)}")
+            self.misses += 1
+            return None
+
+    def put(self, key, provider, model, text):
+        if is_ai_error(text): return False # Error API tidak pernah di-cache
+        now = time.time(); size = len(text.encode('utf-8'))
+        if size > self.max_bytes: return False
+        with self.lock:
+            try:
+                conn = self._db()
+                conn.execute("INSERT OR REPLACE INTO llm_cache (key, provider, model, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)", (key, provider, model, text, size, now, now))
+                self.stores += 1; self._evict(conn, now)
+                return True
+            except sqlite3.Error as e: app.logger.error(f"LLM cache put gagal: {str(e)}"); return False
+
+    def _evict(self, conn, now):
+        expired = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)).rowcount
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        victims = []
+        if count > self.max_entries or total > self.max_bytes:
+            for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access"):
+                if count <= self.max_entries and total <= self.max_bytes: break
+                victims.append((key,)); count -= 1; total -= size
+            conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+        self.evictions += expired + len(victims)
+
+    def stats(self):
+        with self.lock:
+            try: entries, total = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+            except sqlite3.Error: entries, total = None, None
+            lookups = self.hits + self.misses
+            return {"enabled": LLM_CACHE_ENABLED, "hits": self.hits, "misses": self.misses, "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                    "stores": self.stores, "evictions": self.evictions, "entries": entries, "bytes": total, "max_entries": self.max_entries, "max_bytes": self.max_bytes, "ttl_seconds": self.ttl}
+
+llm_cache = LLMResponseCache(LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_BYTES)
+
+def _llm_cache_key(provider, prompt, system_prompt):
+    model = GEMINI_MODEL_NAME if provider == 'gemini' else BYTEPLUS_MODEL_NAME
+    provider = 'gemini' if provider == 'gemini' else 'byteplus' # Samakan dengan dispatcher call_ai
+    return LLMResponseCache.make_key(provider, model, system_prompt, prompt), provider, model
+
+def call_ai_cached(provider, prompt, system_prompt="Anda asisten AI.", bypass=False):
+    """call_ai dengan cache respons. Mengembalikan (teks, status_cache): 'hit' / 'miss' / 'bypass'."""
+    if bypass or not LLM_CACHE_ENABLED: return call_ai(provider, prompt, system_prompt), 'bypass'
+    key, provider_key, model = _llm_cache_key(provider, prompt, system_prompt)
+    cached = llm_cache.get(key)
+    if cached is not None: app.logger.info(f"LLM cache HIT ({provider_key}/{model})"); return cached, 'hit'
+    text, answered_by = llm_router.call(provider, prompt, system_prompt)
+    if answered_by: llm_cache.put(*_llm_cache_key(answered_by, prompt, system_prompt), text) # Simpan di bawah provider yang benar-benar menjawab (bisa hasil failover)
+    return text, 'miss'
+
+def stream_ai_cached(provider, prompt, system_prompt="Anda asisten AI.", bypass=False):
+    """Versi streaming call_ai_cached: (generator, status_cache). Hit dikirim sebagai satu potongan; miss disimpan setelah stream selesai."""
+    if bypass or not LLM_CACHE_ENABLED: return stream_ai(provider, prompt, system_prompt), 'bypass'
+    cached = llm_cache.get(_llm_cache_key(provider, prompt, system_prompt)[0])
+    if cached is not None: return iter([cached]), 'hit'
+    outcome = {}; chunks = stream_ai(provider, prompt, system_prompt, outcome) # Di luar generator: cek admission sebelum respons dimulai
+    def generate():
+        parts = []
+        for chunk in chunks: parts.append(chunk); yield chunk
+        # Stream yang putus di tengah (teks parsial + 'Error API ...') tidak pernah di-cache
+        if outcome.get('ok'): llm_cache.put(*_llm_cache_key(outcome['provider'], prompt, system_prompt), "".join(parts))
+    return generate(), 'miss'
+
+# --- Helper: Flag Request & Respons Streaming (SSE) ---
+def request_flag(name, truthy=('1', 'true', 'yes')):
+    """Baca flag boolean dari query string, field form, atau body JSON."""
+    flag = request.args.get(name) or request.form.get(name)
+    if flag is None and request.is_json: flag = (request.get_json(silent=True) or {}).get(name)
+    return str(flag).lower() in truthy
+
+def wants_stream():
+    """Mode streaming opt-in: ?stream=1, field form 'stream', atau key JSON 'stream'."""
+    return request_flag('stream', truthy=('1', 'true', 'yes', 'sse'))
+
+def cache_bypass_requested():
+    """Bypass cache per request: flag 'no_cache' atau header 'Cache-Control: no-cache'."""
+    return request_flag('no_cache') or 'no-cache' in (request.headers.get('Cache-Control') or '').lower()
+
+def sse_event(data, event=None):
+    return (f"event: {event}\n" if event else "") + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def stream_ai_response(chunks, finalize):
+    """Bungkus generator token LLM menjadi respons text/event-stream.
+    Event: 'start' (langsung), data {"delta": ...} per potongan, lalu 'done' berisi payload JSON final dari finalize(teks_lengkap)."""
+    def generate():
+        yield sse_event({"status": "started"}, event="start")
+        parts = []
+        try:
+            for chunk in chunks:
+                if not chunk: continue
+                parts.append(chunk); yield sse_event({"delta": chunk})
+            yield sse_event(finalize("".join(parts)), event="done")
+        except Exception as e:
+            app.logger.error(f"Error streaming AI: {str(e)}"); yield sse_event({"error": str(e)}, event="error")
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- Helper: OSINT Engine (Cache TTL + Stale-While-Revalidate + Single-Flight) ---
+OSINT_CACHE_TTL = int(os.getenv('OSINT_CACHE_TTL', str(6 * 3600))) # detik; lebih tua dari ini = stale
+OSINT_CACHE_STALE_TTL = int(os.getenv('OSINT_CACHE_STALE_TTL', str(7 * 24 * 3600))) # batas umur stale yang masih boleh dilayani
+OSINT_CACHE_MAX_ENTRIES = int(os.getenv('OSINT_CACHE_MAX_ENTRIES', '2000'))
+GOOGLE_CSE_DAILY_QUOTA = int(os.getenv('GOOGLE_CSE_DAILY_QUOTA', '100')); GOOGLE_CSE_QUOTA_RESERVE = int(os.getenv('GOOGLE_CSE_QUOTA_RESERVE', '10'))
+osint_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='osint-refresh')
+_osint_http = threading.local()
+
+class OsintQueryCache:
+    """Cache hasil kueri Google CSE di memori.
+    - Segar (<= ttl): langsung dilayani. Stale (<= stale_ttl): dilayani + di-refresh di background.
+    - Single-flight: request bersamaan untuk kueri yang sama berbagi satu panggilan upstream.
+    - Hemat kuota: jika estimasi kuota harian hampir habis, hasil stale (berapapun umurnya) dilayani tanpa refresh,
+      dan error upstream diganti hasil stale bila ada."""
+    def __init__(self, ttl, stale_ttl, max_entries, daily_quota, quota_reserve):
+        self.ttl, self.stale_ttl, self.max_entries = ttl, stale_ttl, max_entries
+        self.daily_quota, self.quota_reserve = daily_quota, quota_reserve
+        self.lock = threading.Lock(); self.entries = OrderedDict(); self.inflight = {}
+        self.quota_day = None; self.quota_used = 0; self.quota_exhausted = False
+        self.hits = self.stale_hits = self.misses = self.coalesced = self.upstream_calls = self.upstream_errors = 0
+
+    @staticmethod
+    def normalize(query): return re.sub(r"\s+", " ", query or "").strip().lower()
+    @staticmethod
+    def _copy(articles): return [dict(a) for a in articles]
+
+    def _roll_quota_day(self):
+        # Kuota CSE di-reset tengah malam waktu Pasifik; cukup diperkirakan dengan UTC-8
+        day = (datetime.datetime.utcnow() - datetime.timedelta(hours=8)).date()
+        if day != self.quota_day: self.quota_day, self.quota_used, self.quota_exhausted = day, 0, False
+    def _quota_low(self):
+        self._roll_quota_day()
+        return self.quota_exhausted or self.quota_used >= self.daily_quota - self.quota_reserve
+
+    def lookup(self, query, fetch):
+        key = self.normalize(query); now = time.time()
+        with self.lock:
+            entry = self.entries.get(key); quota_low = self._quota_low()
+            if entry:
+                self.entries.move_to_end(key); age = now - entry[1]
+                if age <= self.ttl: self.hits += 1; return self._copy(entry[0])
+                if quota_low or age <= self.stale_ttl:
+                    self.stale_hits += 1
+                    if not quota_low and key not in self.inflight:
+                        self.inflight[key] = Future(); osint_refresh_executor.submit(self._refresh, key, query, fetch)
+                    return self._copy(entry[0])
+            if self.quota_exhausted:
+                self.misses += 1
+                return [{"source": "Google", "title": "Error API", "url": "#", "snippet": "Kuota Habis?"}]
+            future = self.inflight.get(key); owner = future is None
+            if owner: future = self.inflight[key] = Future(); self.misses += 1
+            else: self.coalesced += 1
+        if owner: self._fetch_into(key, query, fetch)
+        return self._copy(future.result())
+
+    def _refresh(self, key, query, fetch):
+        with admission_priority('background'): self._fetch_into(key, query, fetch)
+
+    def _fetch_into(self, key, query, fetch):
+        with self.lock: future = self.inflight[key]
+        try: articles, ok, quota_error = fetch(query)
+        except ProviderBusy as e: # Ditolak admission control: tidak memakai kuota; hasil lama bila ada, selain itu 503 ke pemanggil
+            with self.lock: self.inflight.pop(key, None); entry = self.entries.get(key)
+            if entry: future.set_result(entry[0]); return
+            future.set_exception(e); raise
+        except Exception as e: articles, ok, quota_error = [{"source": "Google", "title": "Error API", "url": "#", "snippet": str(e)}], False, False
+        with self.lock:
+            self._roll_quota_day(); self.upstream_calls += 1; self.quota_used += 1
+            if ok:
+                self.entries[key] = (articles, time.time()); self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries: self.entries.popitem(last=False)
+            else:
+                self.upstream_errors += 1
+                if quota_error: self.quota_exhausted = True
+                if key in self.entries: articles = self.entries[key][0] # Error -> layani hasil lama, bukan placeholder error
+            self.inflight.pop(key, None)
+        future.set_result(articles)
+
+    def stats(self):
+        with self.lock:
+            self._roll_quota_day(); lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+            return {"entries": len(self.entries), "hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses, "coalesced": self.coalesced,
+                    "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                    "upstream_calls": self.upstream_calls, "upstream_errors": self.upstream_errors, "ttl_seconds": self.ttl, "stale_ttl_seconds": self.stale_ttl,
+                    "quota": {"daily_budget": self.daily_quota, "reserve": self.quota_reserve, "used_today_estimate": self.quota_used,
+                              "remaining_estimate": 0 if self.quota_exhausted else max(0, self.daily_quota - self.quota_used),
+                              "exhausted": self.quota_exhausted, "saving_mode": self._quota_low()}}
+
+osint_cache = OsintQueryCache(OSINT_CACHE_TTL, OSINT_CACHE_STALE_TTL, OSINT_CACHE_MAX_ENTRIES, GOOGLE_CSE_DAILY_QUOTA, GOOGLE_CSE_QUOTA_RESERVE)
+
+@admission_controlled('google_cse')
+def _google_cse_search(query):
+    """Satu panggilan upstream Google CSE. Mengembalikan (articles, ok, quota_error)."""
+    # httplib2.Http tidak thread-safe -> satu koneksi per thread
+    if not hasattr(_osint_http, 'http'): _osint_http.http = httplib2.Http(timeout=15)
     articles = []
-    if not google_search_service:
-        articles.append({"source": "Sistem", "title": "Google Search API Error", "url": "#", "snippet": "API Key/CSE ID tidak valid."})
-        return articles
     try:
-        result = google_search_service.cse().list(q=query, cx=GOOGLE_CSE_ID, num=3, gl='id').execute() 
+        result = google_search_service.cse().list(q=query, cx=GOOGLE_CSE_ID, num=3, gl='id').execute(http=_osint_http.http)
         if 'items' in result:
             for item in result['items']: articles.append({"source": item.get('displayLink','N/A'), "title": item.get('title','N/A'), "url": item.get('link','#'), "snippet": item.get('snippet','')})
         else: articles.append({"source": "Google", "title": "Tidak ada hasil", "url": "#", "snippet": ""})
+        return articles, True, False
     except Exception as e:
-        app.logger.error(f"Error Google Search API: {str(e)}")
-        err_msg = "Kuota Habis?" if "quota" in str(e).lower() else str(e)
-        articles.append({"source": "Google", "title": "Error API", "url": "#", "snippet": err_msg})
-    return articles
+        app.logger.error(f"Error Google Search API: {str(e)}"); count_upstream_error('google_cse', e)
+        quota_error = "quota" in str(e).lower()
+        err_msg = "Kuota Habis?" if quota_error else str(e)
+        return [{"source": "Google", "title": "Error API", "url": "#", "snippet": err_msg}], False, quota_error
 
-# --- Helper: Parsing Skor (Fokus 0-100) ---
-def parse_score(text, keyword, default=0): 
-    try:
-        # Pola 1: Keyword [spasi opsional] [:/] [spasi opsional] [angka]
-        pattern1 = rf"(?:{keyword}\s*[:\-]*\s*|\*\*\s*)(\d+)(?:\s*/\s*(?:100|7))?"
-        matches1 = re.findall(pattern1, text, re.IGNORECASE | re.DOTALL)
-        if matches1:
-            score = int(matches1[0]) 
-            app.logger.info(f"Parse '{keyword}': Pola 1 (Direct) -> {score}")
-            # Asumsikan semua skor 0-100 kecuali keyword spesifik 1-7 (untuk Lentera)
-            if "Skala 1-7" in keyword or (score <= 7 and "FINAL" not in keyword.upper() and "HASIL KERJA" not in keyword.upper()): 
-                return max(1, min(7, score))
-            return max(0, min(100, score)) 
-                
-        # Pola 2: [Angka] / 100 di baris keyword
-        pattern2 = rf"{keyword}.*?(\d+)\s*/\s*100"
-        match2 = re.search(pattern2, text, re.IGNORECASE | re.DOTALL)
-        if match2: score = int(match2.group(1)); app.logger.info(f"Parse '{keyword}': Pola 2 (Fraction 100) -> {score}"); return max(0, min(100, score))
-        
-        # Pola 3: [Angka] / 7 di baris keyword
-        pattern3 = rf"{keyword}.*?(\d)\s*/\s*7"
-        match3 = re.search(pattern3, text, re.IGNORECASE | re.DOTALL)
-        if match3: score_7 = int(match3.group(1)); app.logger.info(f"Parse '{keyword}': Pola 3 (Fraction 7) -> {score_7}"); return max(1, min(7, score_7))
-            
-        # Pola 4: Angka saja setelah keyword
-        pattern4 = rf"{keyword}.*?(\d+)"
-        match4 = re.search(pattern4, text, re.IGNORECASE | re.DOTALL)
-        if match4:
-            score = int(match4.group(1))
-            app.logger.info(f"Parse '{keyword}': Pola 4 (After) -> {score}")
-            if score > 7: return max(0, min(100, score))
-            else: return max(1, min(7, score))
-
-        app.logger.warning(f"Pola skor '{keyword}' tidak ditemukan. Default: {default}")
+@instrument_stage('osint')
+def run_osint_analysis(query):
+    app.logger.info(f"OSINT Engine: Google Search '{query}'")
+    if not google_search_service:
+        return [{"source": "Sistem", "title": "Google Search API Error", "url": "#", "snippet": "API Key/CSE ID tidak valid."}]
+    return osint_cache.lookup(query, _google_cse_search)
+
+# --- Helper: Parsing Skor (Fokus 0-100, satu kali scan per skema) ---
+class ScoreSchema:
+    """Ekstraktor skor terkompilasi untuk satu templat output AI. fields: {nama: (keyword, default)}.
+    Seluruh teks discan SEKALI dengan satu regex gabungan (keyword | angka[/100|/7]) tanpa `.*?`,
+    lalu tiap keyword diselesaikan dengan urutan pola lama:
+      1. Langsung: 'Keyword:** 85' (penanda bold di antara keyword dan angka boleh ada)
+      2. Angka pertama berformat N / 100 setelah keyword
+      3. Angka pertama berformat N / 7 setelah keyword (digit terakhir, skala 1-7)
+      4. Angka pertama setelah keyword"""
+    def __init__(self, name, fields):
+        self.name, self.fields = name, fields
+        keywords = [kw for kw, _ in fields.values()]
+        for a in keywords:
+            for b in keywords:
+                if a is not b and a.lower() in b.lower(): raise ValueError(f"ScoreSchema '{name}': keyword '{a}' tumpang tindih dengan '{b}'.")
+        alternation = "|".join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True))
+        self.pattern = re.compile(rf"(?P<kw>{alternation})(?:(?=\s*(?:\*\*)?\s*[:\-]*\s*(?:\*\*)?\s*(?P<direct>\d+)))?|(?P<num>\d+)(?:\s*/\s*(?P<den>100|7))?", re.IGNORECASE)
+        # Aturan skala pola 1 (dipertahankan dari parse_score lama): angka <= 7 dianggap skala 1-7 kecuali skor FINAL / HASIL KERJA
+        self.rules = {name: (kw.lower(), default, "Skala 1-7" in kw, "FINAL" not in kw.upper() and "HASIL KERJA" not in kw.upper()) for name, (kw, default) in fields.items()}
+
+    @instrument_stage('parse_score')
+    def extract(self, text):
+        first_kw, first_direct, num_starts, nums = {}, {}, [], []
+        for m in self.pattern.finditer(text or ""):
+            kw = m.group('kw')
+            if kw is not None:
+                key = kw.lower(); first_kw.setdefault(key, m.end())
+                if m.group('direct') is not None: first_direct.setdefault(key, int(m.group('direct')))
+            else: num_starts.append(m.start()); nums.append((m.group('num'), m.group('den')))
+        scores = {}
+        for name, (key, default, force_7, small_is_7) in self.rules.items():
+            scores[name] = self._resolve(name, key, default, force_7, small_is_7, first_kw, first_direct, num_starts, nums)
+        app.logger.info(f"Parse skor ({self.name}): {scores}")
+        return scores
+
+    def _resolve(self, name, key, default, force_7, small_is_7, first_kw, first_direct, num_starts, nums):
+        if key in first_direct:
+            score = first_direct[key]; app.logger.debug(f"Parse '{name}': Pola 1 (Direct) -> {score}")
+            return max(1, min(7, score)) if force_7 or (score <= 7 and small_is_7) else max(0, min(100, score))
+        if key not in first_kw: app.logger.debug(f"Pola skor '{name}' tidak ditemukan. Default: {default}"); return default
+        following = range(bisect.bisect_left(num_starts, first_kw[key]), len(nums))
+        for i in following:
+            if nums[i][1] == '100': app.logger.debug(f"Parse '{name}': Pola 2 (Fraction 100)"); return max(0, min(100, int(nums[i][0])))
+        for i in following:
+            if nums[i][1] == '7': app.logger.debug(f"Parse '{name}': Pola 3 (Fraction 7)"); return max(1, min(7, int(nums[i][0][-1])))
+        if following:
+            score = int(nums[following[0]][0]); app.logger.debug(f"Parse '{name}': Pola 4 (After) -> {score}")
+            return max(0, min(100, score)) if score > 7 else max(1, min(7, score))
+        app.logger.debug(f"Pola skor '{name}' tidak ditemukan. Default: {default}")
         return default
+
+LENTERA_SCORE_SCHEMA = ScoreSchema("Lentera", {
+    "skor_potensi": ("SKOR TOTAL POTENSI", 0), "kualifikasi": ("Kualifikasi & Pengetahuan", 4), "nalar": ("Nalar & Logika", 4),
+    "problem": ("Problem Solving", 4), "osint": ("Jejak Digital", 4), "integritas": ("Potensi Integritas", 4)})
+SELAYAR_SKP_SCORE_SCHEMA = ScoreSchema("Selayar-SKP", {
+    "skor_kinerja": ("SKOR KINERJA FINAL", 0), "pelayanan": ("Berorientasi Pelayanan", 0), "akuntabel": ("Akuntabel", 0), "kompeten": ("Kompeten", 0),
+    "harmonis": ("Harmonis", 0), "loyal": ("Loyal", 0), "adaptif": ("Adaptif", 0), "kolaboratif": ("Kolaboratif", 0)})
+
+@functools.lru_cache(maxsize=64)
+def _single_score_schema(keyword, default): return ScoreSchema(keyword, {"score": (keyword, default)})
+
+def parse_score(text, keyword, default=0): 
+    """Skor tunggal (mis. 'Skor Sentimen'); memakai skema satu keyword yang dikompilasi sekali."""
+    try: return _single_score_schema(keyword, default).extract(text)["score"]
     except Exception as e:
         app.logger.error(f"Error parsing skor '{keyword}': {str(e)}. Default: {default}")
         return default
@@ -168,18 +1316,168 @@ def parse_sentiment(text):
         if "sentimen umum:" in line.lower(): return line.split(":")[-1].strip().replace('*','')[:100]
      return "Tidak Ditemukan"
 
-# --- Helper: Generate PDF ---
+# --- Helper: Generate PDF (process pool xhtml2pdf + cache hasil per hash markdown/judul/CSS) ---
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', str(min(4, os.cpu_count() or 1)))) # 0 = render di thread request (perilaku lama)
+PDF_RENDER_TIMEOUT = float(os.getenv('PDF_RENDER_TIMEOUT', '60')); PDF_RENDER_MAX_PENDING = int(os.getenv('PDF_RENDER_MAX_PENDING', str(max(PDF_RENDER_WORKERS, 1) * 8)))
+PDF_CACHE_MAX_BYTES = int(float(os.getenv('PDF_CACHE_MAX_MB', '64')) * 1024 * 1024); PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR') # Kosong = tanpa persistensi disk
+PDF_BATCH_MAX = int(os.getenv('PDF_BATCH_MAX', '200')); PDF_BATCH_MAX_MB = float(os.getenv('PDF_BATCH_MAX_MB', '50')) # Sama dengan batas body JSON gateway untuk rute ini
+# forkserver: worker di-fork dari server kecil yang hanya memuat pdf_render (preload), bukan dari proses Flask yang sudah punya thread (fork di situ bisa deadlock pada lock milik thread lain).
+# Saat dijalankan langsung (python app.py) worker tetap mengimpor app.py sebagai __mp_main__; efek samping startup dijaga dengan cek __name__ di bawah.
+PDF_RENDER_START_METHOD = os.getenv('PDF_RENDER_START_METHOD', 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+class PdfRenderBusy(Exception):
+    """Antrean render PDF penuh; dijawab 503 + Retry-After."""
+
+class PdfCache:
+    """LRU bytes PDF per SHA-256 (markdown, judul, CSS), dibatasi total ukuran; opsional disalin ke PDF_CACHE_DIR (satu file .pdf per kunci)."""
+    def __init__(self, max_bytes, cache_dir=None):
+        self.max_bytes, self.cache_dir = max_bytes, cache_dir
+        self.lock = threading.Lock(); self.entries = OrderedDict(); self.total_bytes = 0
+        self.hits = self.disk_hits = self.misses = 0
+        if cache_dir: os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(markdown_text, title, css): return hashlib.sha256(json.dumps([markdown_text, title, css], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            pdf_bytes = self.entries.get(key)
+            if pdf_bytes is not None: self.entries.move_to_end(key); self.hits += 1; return pdf_bytes
+        pdf_bytes = self._load_disk(key)
+        with self.lock:
+            if pdf_bytes is None: self.misses += 1; return None
+            self._insert(key, pdf_bytes); self.disk_hits += 1; return pdf_bytes
+
+    def put(self, key, pdf_bytes):
+        with self.lock: self._insert(key, pdf_bytes)
+        self._save_disk(key, pdf_bytes)
+
+    def _insert(self, key, pdf_bytes):
+        if len(pdf_bytes) > self.max_bytes: return
+        old = self.entries.pop(key, None)
+        if old is not None: self.total_bytes -= len(old)
+        self.entries[key] = pdf_bytes; self.total_bytes += len(pdf_bytes)
+        while self.total_bytes > self.max_bytes: _, evicted = self.entries.popitem(last=False); self.total_bytes -= len(evicted)
+
+    def _disk_path(self, key): return os.path.join(self.cache_dir, f"{key}.pdf")
+    def _load_disk(self, key):
+        if not self.cache_dir: return None
+        try:
+            with open(self._disk_path(key), 'rb') as f: return f.read()
+        except OSError: return None
+    def _save_disk(self, key, pdf_bytes):
+        if not self.cache_dir: return
+        try:
+            tmp_path = f"{self._disk_path(key)}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, 'wb') as f: f.write(pdf_bytes)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e: app.logger.error(f"Gagal simpan cache PDF ke disk: {str(e)}")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {"entries": len(self.entries), "bytes": self.total_bytes, "max_bytes": self.max_bytes, "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0, "persistent": bool(self.cache_dir)}
+
+class PdfRenderPool:
+    """xhtml2pdf di ProcessPoolExecutor: render besar tidak lagi menahan GIL proses Flask.
+    Antrean dibatasi (PdfRenderBusy bila penuh); render identik yang sedang berjalan dipakai bersama.
+    Paling banyak `workers` render dikirim ke pool sekaligus, sehingga batas waktu dihitung sejak render mulai, bukan sejak masuk antrean;
+    worker yang melewati batas waktu dimatikan dan pool dibuat ulang (render lain yang ikut terputus dicoba sekali lagi)."""
+    def __init__(self, workers, timeout, max_pending):
+        self.workers, self.timeout = workers, timeout; self.slots = threading.BoundedSemaphore(max(max_pending, 1))
+        self.running = threading.BoundedSemaphore(max(workers, 1)) # Satu slot per worker: tugas yang dikirim ke pool langsung dikerjakan
+        self.lock = threading.Lock(); self.executor = None; self.inflight = {}
+        self.rendered = self.shared = self.rejected = self.timeouts = self.failures = self.restarts = 0
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                context = multiprocessing.get_context(PDF_RENDER_START_METHOD)
+                if PDF_RENDER_START_METHOD == 'forkserver': context.set_forkserver_preload(['pdf_render'])
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self.executor
+
+    def _restart(self, broken):
+        with self.lock:
+            if self.executor is not broken: return # Sudah dibuat ulang oleh thread lain
+            self.executor = None; self.restarts += 1
+        for process in list((getattr(broken, '_processes', None) or {}).values()): process.terminate() # Python < 3.14 belum punya terminate_workers()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _render(self, markdown_text, title, css):
+        if not self.workers: return pdf_render.render_pdf(markdown_text, title, css)
+        if not self.slots.acquire(blocking=False):
+            with self.lock: self.rejected += 1
+            raise PdfRenderBusy("Antrean render PDF penuh, coba lagi sebentar.")
+        try:
+            if not self.running.acquire(timeout=self.timeout): # Menunggu worker bebas; tidak ikut dihitung ke batas waktu render
+                with self.lock: self.rejected += 1
+                raise PdfRenderBusy("Semua worker render PDF sibuk, coba lagi sebentar.")
+            try: return self._submit(markdown_text, title, css)
+            finally: self.running.release()
+        finally: self.slots.release()
+
+    def _submit(self, markdown_text, title, css):
+        for _ in range(2):
+            executor = self._executor()
+            try: return executor.submit(pdf_render.render_pdf, markdown_text, title, css).result(timeout=self.timeout)
+            except FuturesTimeoutError:
+                with self.lock: self.timeouts += 1
+                self._restart(executor); raise TimeoutError(f"Render PDF melebihi {self.timeout:g} detik")
+            except BrokenProcessPool: self._restart(executor)
+        raise RuntimeError("Process pool render PDF berhenti berulang kali")
+
+    def render(self, key, markdown_text, title, css):
+        """Bytes PDF; PdfRenderBusy bila antrean penuh, TimeoutError/ValueError bila render gagal."""
+        with self.lock:
+            shared = self.inflight.get(key)
+            if shared is None: owner = self.inflight[key] = Future()
+            else: self.shared += 1
+        if shared is not None: return shared.result(timeout=self.timeout * 2)
+        try:
+            pdf_bytes = self._render(markdown_text, title, css)
+            with self.lock: self.rendered += 1
+            owner.set_result(pdf_bytes); return pdf_bytes
+        except Exception as e:
+            if not isinstance(e, PdfRenderBusy):
+                with self.lock: self.failures += 1
+            owner.set_exception(e); raise
+        finally:
+            with self.lock: self.inflight.pop(key, None)
+
+    def warm_up(self):
+        """Muat pdf_render di proses utama (dan preload forkserver) lalu satu render kecil per worker, agar ekspor pertama tidak menanggung start proses + import."""
+        if not self.workers: pdf_render.render_pdf("warm-up", "warm-up"); return
+        LAZY_RESOURCES['pdf_render'].get(); executor = self._executor()
+        for future in [executor.submit(pdf_render.render_pdf, "warm-up", "warm-up") for _ in range(self.workers)]: future.result(timeout=self.timeout)
+
+    def stats(self):
+        with self.lock:
+            return {"workers": self.workers, "timeout_s": self.timeout, "in_flight": len(self.inflight), "rendered": self.rendered, "shared": self.shared,
+                    "rejected": self.rejected, "timeouts": self.timeouts, "failures": self.failures, "restarts": self.restarts}
+
+pdf_cache = PdfCache(PDF_CACHE_MAX_BYTES, PDF_CACHE_DIR)
+pdf_render_pool = PdfRenderPool(PDF_RENDER_WORKERS, PDF_RENDER_TIMEOUT, PDF_RENDER_MAX_PENDING)
+atexit.register(lambda: pdf_render_pool.executor and pdf_render_pool.executor.shutdown(wait=False, cancel_futures=True))
+
+@instrument_stage('pdf')
+def generate_pdf_bytes(markdown_text, title, css=None):
+    css = pdf_render.PDF_CSS if css is None else css; key = PdfCache.key(markdown_text, title, css)
+    pdf_bytes = pdf_cache.get(key)
+    if pdf_bytes is None: pdf_bytes = pdf_render_pool.render(key, markdown_text, title, css); pdf_cache.put(key, pdf_bytes)
+    return pdf_bytes
+
 def generate_pdf_from_markdown(markdown_text, title="Profil Lentera"): # Tambah parameter title
-    try:
-        html_content = markdown.markdown(markdown_text, extensions=['extra', 'nl2br'])
-        css = """ @page { size: A4; margin: 1.5cm; } body { font-family: sans-serif; font-size: 10pt; color: #333; } h1, h2, h3, h4 { color: #003366; } h1 { font-size: 18pt; text-align: center; margin-bottom: 20px; } h2 { font-size: 14pt; border-bottom: 1px solid #ccc; padding-bottom: 5px; margin-top: 15px; } strong { color: #00509E; } ul, ol { padding-left: 20px; } li { margin-bottom: 5px; } pre { background-color: #f0f0f0; padding: 10px; border-radius: 5px; font-family: monospace; white-space: pre-wrap; } a { color: #3b82f6; text-decoration: none; } """
-        result = BytesIO()
-        # Gunakan title dinamis
-        pdf = pisa.CreatePDF(BytesIO(f"<html><head><style>{css}</style></head><body><h1>{title}</h1>{html_content}</body></html>".encode('utf-8')), dest=result)
-        if pdf.err: app.logger.error(f"Error xhtml2pdf: {pdf.err}"); return None
-        result.seek(0); return result
+    """BytesIO PDF atau None bila gagal; PdfRenderBusy diteruskan ke handler 503."""
+    try: return BytesIO(generate_pdf_bytes(markdown_text, title))
+    except PdfRenderBusy: raise
     except Exception as e: app.logger.error(f"Error generate_pdf: {str(e)}"); return None
 
+@app.errorhandler(PdfRenderBusy)
+def pdf_render_busy(e):
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "2"}
+
 # --- MODUL 1: LENTERA ---
 @app.route('/api/lentera/generate-case', methods=['POST'])
 def lentera_generate_case():
@@ -188,6 +1486,7 @@ def lentera_generate_case():
     jabatan = request.form.get('jabatan', '') 
     cv_text = "" 
     filename = "N/A"
+    cv_extraction = None
 
     if not jabatan: 
         app.logger.error("LENTERA Generate Case Gagal: Jabatan kosong.")
@@ -198,9 +1497,9 @@ def lentera_generate_case():
         file_cv = request.files['file_cv']
         if file_cv and file_cv.filename != '': 
             filename = secure_filename(file_cv.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             try:
-                file_cv.save(file_path); cv_text_extracted = extract_text_from_file(file_path); os.remove(file_path)
+                cv_extraction = extract_upload(file_cv, max_chars=CV_TEXT_BUDGET)
+                cv_text_extracted = cv_extraction["text"] if cv_extraction else None
                 if cv_text_extracted: cv_text = cv_text_extracted; app.logger.info(f"CV {filename} OK.")
                 else: app.logger.warning(f"Gagal ekstrak CV {filename}.")
             except Exception as e: app.logger.error(f"Error proses CV {filename}: {str(e)}")
@@ -244,53 +1543,81 @@ def lentera_generate_case():
     app.logger.info(f"Prompt AI Generate Case:\n{prompt[:500]}...") # Log 500 karakter pertama prompt
 
     # Panggil AI
-    if provider == 'gemini': 
-        result = call_gemini_api(prompt)
-    elif provider == 'byteplus' and BYTEPLUS_KEY:
-        result = call_byteplus_api(prompt, "Anda adalah Asesor AI BKN pembuat soal studi kasus spesifik.")
-    else: 
+    if not llm_router.routable(provider): # Provider tidak dikenal, atau tidak ada provider terkonfigurasi yang bisa menggantikannya
         app.logger.error(f"Provider AI '{provider}' tidak valid/dikonfigurasi.")
-        result = f"Error: Provider AI '{provider}' tidak valid."
+        return jsonify({"case_study": f"Error: Provider AI '{provider}' tidak valid.", "cv_text_cache": cv_text})
+    system_prompt = "Anda adalah Asesor AI BKN pembuat soal studi kasus spesifik."
+    # Soal untuk jabatan yang sama (tanpa CV) identik antar kandidat -> layani dari cache respons LLM
+    if wants_stream():
+        chunks, cache_status = stream_ai_cached(provider, prompt, system_prompt, bypass=cache_bypass_requested())
+        return stream_ai_response(chunks, lambda case_text: {"case_study": case_text, "cv_text_cache": cv_text, "llm_cache": cache_status, "extraction_cache": extraction_cache_status(cv_extraction)})
+    result, cache_status = call_ai_cached(provider, prompt, system_prompt, bypass=cache_bypass_requested())
 
-    app.logger.info("LENTERA Generate Case - Selesai.")
-    return jsonify({"case_study": result, "cv_text_cache": cv_text})
+    app.logger.info(f"LENTERA Generate Case - Selesai (cache: {cache_status}).")
+    return jsonify({"case_study": result, "cv_text_cache": cv_text, "llm_cache": cache_status, "extraction_cache": extraction_cache_status(cv_extraction)})
 
 #Sub Modul Lentera - Penilaian
 @app.route('/api/lentera/grade-final', methods=['POST'])
 def lentera_grade_final():
     app.logger.info(f"LENTERA Grade Final - Request Origin: {request.origin}, Content-Type: {request.content_type}")
-    
-    # Ambil data teks dari form DULU
-    provider = request.form.get('provider', 'gemini')
-    jabatan = request.form.get('jabatan', 'Analis Kebijakan')
-    cv_text = request.form.get('cv_text_cache', '') 
-    case_study = request.form.get('case_study', '') 
+    # Ambil data teks dari form DULU (cv_text_cache, case_study, answer_text, jabatan, provider)
+    fields = request.form.to_dict()
+    file_answer = request.files.get('file_answer')
+    has_file = bool(file_answer and file_answer.filename != '')
+    if request_flag('async'): return enqueue_assessment_job('lentera-grade', fields, file_answer if has_file else None)
+
+    ctx = begin_lentera_grade(fields, file_answer.read() if has_file else None, secure_filename(file_answer.filename) if has_file else None)
+    if ctx is None: return jsonify({"error": "Tidak ada jawaban yang valid terdeteksi (baik file maupun teks)."}), 400
+    if wants_stream():
+        # Event 'start' terkirim sebelum menunggu OSINT; prompt dirakit di dalam generator
+        llm_router.check_admission(ctx['provider']); state = {}
+        def chunks():
+            prompt, state['osint_status'] = assemble_lentera_prompt(ctx)
+            yield from stream_ai(ctx['provider'], prompt, LENTERA_GRADER_SYSTEM_PROMPT)
+        return stream_ai_response(chunks(), lambda text: complete_lentera_grade(ctx, text, state.get('osint_status')))
+    prompt, osint_status = assemble_lentera_prompt(ctx)
+    result_text = call_ai(ctx['provider'], prompt, LENTERA_GRADER_SYSTEM_PROMPT)
+    return jsonify(complete_lentera_grade(ctx, result_text, osint_status))
+
+LENTERA_GRADER_SYSTEM_PROMPT = "Anda AI Grader BKN pembuat profil modern."
+
+def begin_lentera_grade(fields, answer_bytes=None, answer_filename=None):
+    """Tahap awal pipeline grade-final (request biasa, streaming, maupun job background):
+    mulai OSINT di background lalu ekstrak jawaban. Mengembalikan dict konteks, atau None jika tidak ada jawaban valid."""
+    provider = fields.get('provider', 'gemini')
+    jabatan = fields.get('jabatan', 'Analis Kebijakan')
+    cv_text = fields.get('cv_text_cache', '') 
+    case_study = fields.get('case_study', '') 
     # Ambil jawaban teks dari form (mungkin ada meskipun file diupload)
-    answer_text_from_form = request.form.get('answer_text', '') 
+    answer_text_from_form = fields.get('answer_text', '') 
+
+    # --- PIPELINE KONKUREN: OSINT hanya butuh nama dari CV -> mulai SEKARANG, paralel dengan ekstraksi jawaban ---
+    nama_kandidat = "Kandidat" 
+    match_nama = re.search(r"(?:nama|name)\s*[:\-]*\s*(.+)", cv_text, re.IGNORECASE) if cv_text else None
+    if match_nama: nama_kandidat = match_nama.group(1).strip().splitlines()[0] 
+    osint_deadline = time.monotonic() + OSINT_STAGE_TIMEOUT
+    osint_future = pipeline_executor.submit(run_osint_analysis, f'"{nama_kandidat}" ASN OR PNS OR BKN')
     
     answer_text = "" # Inisialisasi teks jawaban final
     filename_ans = "N/A"
+    answer_extraction = None
 
     # --- LOGIKA PEMBACAAN JAWABAN (REVISI) ---
     # Prioritaskan file jika ada DAN berhasil dibaca
-    if 'file_answer' in request.files:
-        file_answer = request.files['file_answer']
-        if file_answer and file_answer.filename != '':
-            filename_ans = secure_filename(file_answer.filename)
-            filepath_ans = os.path.join(app.config['UPLOAD_FOLDER'], filename_ans)
-            app.logger.info(f"Mencoba membaca file jawaban: {filename_ans}")
-            try:
-                file_answer.save(filepath_ans)
-                answer_text_extracted = extract_text_from_file(filepath_ans)
-                os.remove(filepath_ans)
-                if answer_text_extracted: 
-                    answer_text = answer_text_extracted # Gunakan teks dari file
-                    app.logger.info(f"Jawaban berhasil diekstrak dari file {filename_ans}.")
-                else: 
-                    app.logger.warning(f"File jawaban {filename_ans} kosong atau gagal diekstrak.")
-            except Exception as e: 
-                app.logger.error(f"Error saat memproses file jawaban {filename_ans}: {str(e)}")
-                # Jangan return error dulu, coba fallback ke teks
+    if answer_bytes is not None:
+        filename_ans = answer_filename
+        app.logger.info(f"Mencoba membaca file jawaban: {filename_ans}")
+        try:
+            answer_extraction, extract_status = await_stage(pipeline_executor.submit(extract_document, answer_bytes, filename_ans), EXTRACT_STAGE_TIMEOUT, "ekstraksi jawaban")
+            answer_text_extracted = answer_extraction["text"] if answer_extraction else None
+            if answer_text_extracted: 
+                answer_text = answer_text_extracted # Gunakan teks dari file
+                app.logger.info(f"Jawaban berhasil diekstrak dari file {filename_ans}.")
+            else: 
+                app.logger.warning(f"File jawaban {filename_ans} kosong atau gagal diekstrak ({extract_status}).")
+        except Exception as e: 
+            app.logger.error(f"Error saat memproses file jawaban {filename_ans}: {str(e)}")
+            # Jangan return error dulu, coba fallback ke teks
     
     # Jika teks jawaban dari file KOSONG (karena tidak ada file ATAU file gagal dibaca),
     # GUNAKAN teks dari form field 'answer_text'
@@ -299,52 +1626,46 @@ def lentera_grade_final():
         answer_text = answer_text_from_form # Gunakan teks dari form
         filename_ans = "Input Teks" # Update nama sumber
 
-    # FINAL CHECK: Jika answer_text masih kosong setelah semua usaha, baru return 400
+    # FINAL CHECK: Jika answer_text masih kosong setelah semua usaha, pemanggil mengembalikan 400
     if not answer_text:
+        osint_future.cancel()
         app.logger.error("Gagal mendapatkan teks jawaban dari file maupun form.")
-        return jsonify({"error": "Tidak ada jawaban yang valid terdeteksi (baik file maupun teks)."}), 400
+        return None
     # --------------------------------------------------
     app.logger.info(f"LENTERA (Tahap 2): Melanjutkan Grade Final. Sumber Jawaban: {filename_ans}")
+    return {"provider": provider, "jabatan": jabatan, "cv_text": cv_text, "case_study": case_study, "nama_kandidat": nama_kandidat, "answer_text": answer_text,
+            "answer_extraction": answer_extraction, "osint_future": osint_future, "osint_deadline": osint_deadline}
 
-    # --- Sisa logika (OSINT, Prompt AI, Parsing, Simpan Log) TETAP SAMA ---
-    nama_kandidat = "Kandidat" 
-    match_nama = re.search(r"(?:nama|name)\s*[:\-]*\s*(.+)", cv_text, re.IGNORECASE) if cv_text else None
-    if match_nama: nama_kandidat = match_nama.group(1).strip().splitlines()[0] 
-        
-    osint_results = run_osint_analysis(f'"{nama_kandidat}" ASN OR PNS OR BKN')
-    osint_summary = "\n".join([f"- [{res['source']}]: {res['snippet'][:100]}..." for res in osint_results])
-
+def assemble_lentera_prompt(ctx):
+    """Tunggu OSINT (sisa batas waktu saja) lalu rakit prompt penilaian. Mengembalikan (prompt, osint_status)."""
+    # OSINT lambat tidak menahan penilaian: lewat batas waktu -> lanjut tanpa OSINT
+    osint_results, osint_status = await_stage(ctx['osint_future'], ctx['osint_deadline'] - time.monotonic(), "OSINT")
+    if osint_status == 'ok': osint_summary = "\n".join([f"- [{res['source']}]: {res['snippet'][:100]}..." for res in osint_results])
+    else: osint_summary = f"(Data OSINT tidak tersedia: {osint_status}. Nilai Jejak Digital secara netral dan sebutkan keterbatasan ini.)"
+    jabatan, nama_kandidat, cv_text, case_study, answer_text = ctx['jabatan'], ctx['nama_kandidat'], ctx['cv_text'], ctx['case_study'], ctx['answer_text']
     # Pastikan 'answer_text' (yang sudah final) digunakan di prompt
     prompt = f"""Anda AI Grader BKN modern...\n--- DATA ---\nJabatan:{jabatan}\nNama:{nama_kandidat}\nCV:{'(Ada)' if cv_text else '(Tidak)'} {cv_text[:1000] if cv_text else ''}\nSoal:{case_study}\nJawaban:{answer_text}\nOSINT:{osint_summary}\n--- END DATA ---\nINSTRUKSI: Buat Profil Potensi LENTERA (Markdown, Skor 1-7)...\n---...\n## 👤 PROFIL POTENSI LENTERA\n...\n### 📊 SKOR ATRIBUT (Skala 1-7):\n...\n### 📈 REKOMENDASI & PENGEMBANGAN:\n..."""
-    if provider == 'gemini': result_text = call_gemini_api(prompt)
-    else: result_text = call_byteplus_api(prompt, "Anda AI Grader BKN pembuat profil modern.")
-    
-    # Parsing Skor & Rekomendasi (Sama seperti V3)
-    skor_potensi_final = parse_score(result_text, "SKOR TOTAL POTENSI")
+    return prompt, osint_status
+
+def complete_lentera_grade(ctx, result_text, osint_status):
+    return {**finalize_lentera_grade(result_text, ctx['nama_kandidat'], ctx['jabatan']), "osint_status": osint_status, "extraction_cache": extraction_cache_status(ctx['answer_extraction'])}
+
+def finalize_lentera_grade(result_text, nama_kandidat, jabatan):
+    """Parsing skor + simpan log Lentera; dipakai jalur JSON biasa maupun streaming."""
+    # Parsing Skor (satu kali scan) & Rekomendasi
+    scores_structured_dict = LENTERA_SCORE_SCHEMA.extract(result_text)
+    skor_potensi_final = scores_structured_dict.pop("skor_potensi")
     rekomendasi_final = parse_recommendation(result_text)
-    scores_structured_dict = {
-        "kualifikasi": parse_score(result_text, "Kualifikasi & Pengetahuan", default=4),
-        "nalar": parse_score(result_text, "Nalar & Logika", default=4),
-        "problem": parse_score(result_text, "Problem Solving", default=4),
-        "osint": parse_score(result_text, "Jejak Digital", default=4),
-        "integritas": parse_score(result_text, "Potensi Integritas", default=4)
-    }
     # Simpan Log (Sama seperti V3)
-    try: 
-        log_entry = AssessmentLog(
-            module='Lentera', 
-            candidate_name=nama_kandidat, 
-            jabatan_or_program=jabatan, 
-            skor_potensi=skor_potensi_final, 
-            recommendation=rekomendasi_final
-        )
-        db.session.add(log_entry) # Baris baru
-        db.session.commit() # Baris baru
-        app.logger.info(f"Log Lentera disimpan. ID: {log_entry.id}")
-    except Exception as e: 
-        db.session.rollback()
-        app.logger.error(f"Gagal log Lentera: {str(e)}")        
-    return jsonify({ "grading_result": result_text, "skor_potensi": skor_potensi_final, "scores_structured": scores_structured_dict, "recommendation": rekomendasi_final })
+    log_id = assessment_log_writer.submit(
+        module='Lentera', 
+        candidate_name=nama_kandidat, 
+        jabatan_or_program=jabatan, 
+        skor_potensi=skor_potensi_final, 
+        recommendation=rekomendasi_final
+    )
+    app.logger.info(f"Log Lentera diantrekan. ID: {log_id}")
+    return { "grading_result": result_text, "skor_potensi": skor_potensi_final, "scores_structured": scores_structured_dict, "recommendation": rekomendasi_final }
 
 #Sub Modul Lentera - Eksport Penilaian
 @app.route('/api/lentera/export-pdf', methods=['POST'])
@@ -369,6 +1690,7 @@ def selayar_osint_sentiment():
     sentiment_summary = "Error: Gagal memproses sentimen."
     skor_sentimen = 0
     sentimen_umum = "Error" # <-- Inisialisasi default
+    cache_status = None
     
     if not osint_articles or any("Error" in article.get("title", "") for article in osint_articles):
         app.logger.error("SELAYAR OSINT Gagal mendapatkan artikel.")
@@ -377,8 +1699,7 @@ def selayar_osint_sentiment():
         osint_snippets = "\n".join([f"- [{a['source']}]: {a['snippet'][:150]}..." for a in osint_articles if a.get('snippet')])
         prompt = f"""Anda AI Analis Sentimen Publik...\nOSINT Snippets "{program_kerja}":\n---\n{osint_snippets or "N/A"}\n---\nTUGAS: Format Markdown:\n**Analisis Sentimen Publik (OSINT):**\n* **Sentimen Umum:** [Positif/Negatif/Netral/Campuran]\n* **Skor Sentimen (Estimasi):** [Angka 1-100] / 100\n* **Ringkasan Utama:** [1 kalimat]"""
         
-        if provider == 'gemini': sentiment_summary_raw = call_gemini_api(prompt)
-        else: sentiment_summary_raw = call_byteplus_api(prompt, "Anda analis sentimen publik ringkas.")
+        sentiment_summary_raw, cache_status = call_ai_cached(provider, prompt, "Anda analis sentimen publik ringkas.", bypass=cache_bypass_requested())
         
         if "Error:" not in sentiment_summary_raw:
              sentiment_summary = sentiment_summary_raw
@@ -389,32 +1710,157 @@ def selayar_osint_sentiment():
              sentimen_umum = "Error (AI Call Failed)" # <-- Beri nilai jika AI error
     
     # Simpan Log DB
-    try:
-        log_entry = AssessmentLog(module='Selayar-OSINT', jabatan_or_program=program_kerja, sentiment=sentimen_umum) 
-        db.session.add(log_entry); db.session.commit()
-    except Exception as e: db.session.rollback(); app.logger.error(f"Gagal log Selayar-OSINT: {str(e)}")
+    assessment_log_writer.submit(module='Selayar-OSINT', jabatan_or_program=program_kerja, sentiment=sentimen_umum)
     
     app.logger.info(f"SELAYAR OSINT Selesai. Sentimen: {sentimen_umum}, Skor: {skor_sentimen}") 
-    return jsonify({"program": program_kerja, "sentiment_analysis_text": sentiment_summary, "sentiment_score": skor_sentimen, "articles": osint_articles})
+    return jsonify({"program": program_kerja, "sentiment_analysis_text": sentiment_summary, "sentiment_score": skor_sentimen, "articles": osint_articles, "llm_cache": cache_status})
 
 # --- FUNGSI ANALISIS SKP (PROMPT BARU V3.8) ---
 @app.route('/api/selayar/analyze-skp', methods=['POST']) 
 def selayar_analyze_skp():
     if 'file_skp' not in request.files: return jsonify({"error": "File SKP tidak ada"}), 400
     file_skp, provider = request.files['file_skp'], request.form.get('provider', 'gemini')
-    filename = secure_filename(file_skp.filename); file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename); file_skp.save(file_path)
-    app.logger.info(f"SELAYAR (SKP V3.8): Analyze Artifact. File: {filename}")
-    doc_text_full = extract_text_from_file(file_path); os.remove(file_path)
-    if not doc_text_full: return jsonify({"error": "Gagal baca teks SKP"}), 500
-    doc_text = doc_text_full[:8000] 
-    if len(doc_text_full) > 8000: app.logger.warning(f"SKP {filename} dipotong.")
+    if request_flag('async'): return enqueue_assessment_job('selayar-skp', request.form.to_dict(), file_skp)
+    filename = secure_filename(file_skp.filename)
+    skp_extraction, mode = extract_selayar_skp(file_skp.read(), filename, request.form.get('skp_mode')) # skp_mode: auto / single / chunked
+    if not skp_extraction: return jsonify({"error": "Gagal baca teks SKP"}), 500
+    
+    system_prompt = SELAYAR_SKP_SYSTEM_PROMPT
+    if wants_stream():
+        # Event 'start' terkirim sebelum tahap map (dokumen panjang); prompt dirakit di dalam generator
+        llm_router.check_admission(provider)
+        def chunks():
+            prompt = assemble_selayar_skp_prompt(skp_extraction, filename, provider, mode)
+            yield from stream_ai(provider, prompt, system_prompt)
+        return stream_ai_response(chunks(), lambda text: {**finalize_selayar_skp(text, filename)[0], **skp_extraction_meta(skp_extraction)})
+    result_text = call_ai(provider, assemble_selayar_skp_prompt(skp_extraction, filename, provider, mode), system_prompt)
+    payload, status = finalize_selayar_skp(result_text, filename)
+    return jsonify({**payload, **skp_extraction_meta(skp_extraction)}), status
+
+def skp_extraction_meta(skp_extraction):
+    return {"extraction_cache": extraction_cache_status(skp_extraction), "pages": skp_extraction["pages"], "pages_read": skp_extraction["pages_read"], "analysis": skp_extraction["analysis"]}
+
+SELAYAR_SKP_SYSTEM_PROMPT = "Anda Asesor Kinerja ASN Objektif dan Analitis."
+
+# --- Analisis SKP Panjang (map-reduce: potong di batas RHK/Perilaku, ekstraksi fakta paralel, satu panggilan merge) ---
+SKP_ANALYSIS_MODES = ('auto', 'single', 'chunked')
+SKP_ANALYSIS_MODE = os.getenv('SKP_ANALYSIS_MODE', 'auto') # auto = map-reduce hanya bila teks > SKP_TEXT_BUDGET; single = perilaku lama (dipotong); chunked = selalu map-reduce
+SKP_FULL_TEXT_BUDGET = int(os.getenv('SKP_FULL_TEXT_BUDGET', '200000')) # Batas baca dokumen pada mode map-reduce
+SKP_CHUNK_CHARS = int(os.getenv('SKP_CHUNK_CHARS', '6000')); SKP_MAX_CHUNKS = int(os.getenv('SKP_MAX_CHUNKS', '24')); SKP_HEADER_CHARS = 1500
+# Awal bagian struktural SKP/EKP: baris RHK, blok Hasil/Perilaku Kerja, blok evaluasi per periode, predikat
+SKP_SECTION_BOUNDARY = re.compile(r"^[ \t]*(?:RHK\s*\d|RENCANA HASIL KERJA|HASIL KERJA|PERILAKU KERJA|EVALUASI KINERJA|CAPAIAN KINERJA|PREDIKAT KINERJA|[A-D]\.\s+(?:UTAMA|TAMBAHAN)\b)", re.IGNORECASE | re.MULTILINE)
+SKP_FACT_SYSTEM_PROMPT = "Anda pengekstrak fakta dokumen SKP/EKP yang teliti dan tidak menambah informasi."
 
+def resolve_skp_mode(mode):
+    mode = (mode or SKP_ANALYSIS_MODE or 'auto').lower()
+    return mode if mode in SKP_ANALYSIS_MODES else 'auto'
+
+def _split_lines_within(text, max_chars):
+    """Pecah satu bagian yang terlalu panjang per baris (baris yang sendirian melebihi max_chars dipotong keras)."""
+    pieces, current = [], ""
+    for line in text.splitlines(keepends=True):
+        if current and len(current) + len(line) > max_chars: pieces.append(current); current = ""
+        while len(line) > max_chars: pieces.append(line[:max_chars]); line = line[max_chars:]
+        current += line
+    if current: pieces.append(current)
+    return pieces
+
+def split_skp_document(text, chunk_chars=SKP_CHUNK_CHARS, max_chunks=SKP_MAX_CHUNKS):
+    """Pecah teks SKP/EKP di batas struktural lalu kemas bagian berurutan menjadi potongan <= chunk_chars.
+    Bagian yang muat tidak terbelah; bagian yang sendirian melebihi chunk_chars dipecah per baris dan potongan berisi pecahannya dicatat di `partial`.
+    Ukuran potongan dinaikkan bila dokumen akan menghasilkan lebih dari max_chunks. Mengembalikan (header_identitas, [potongan], {indeks potongan parsial})."""
+    chunk_chars = max(chunk_chars, math.ceil(len(text) / max_chunks))
+    starts = [match.start() for match in SKP_SECTION_BOUNDARY.finditer(text)]
+    header = text[:starts[0]] if starts else text[:SKP_HEADER_CHARS]
+    sections = [text[:starts[0]]] + [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])] if starts else [text]
+    chunks, partial, current, current_partial = [], set(), "", False
+    for section in sections:
+        pieces = [section] if len(section) <= chunk_chars else _split_lines_within(section, chunk_chars)
+        for piece in pieces:
+            if current and len(current) + len(piece) > chunk_chars:
+                if current.strip():
+                    if current_partial: partial.add(len(chunks))
+                    chunks.append(current)
+                current, current_partial = "", False
+            current += piece; current_partial = current_partial or len(pieces) > 1
+    if current.strip():
+        if current_partial: partial.add(len(chunks))
+        chunks.append(current)
+    return header.strip()[:SKP_HEADER_CHARS], chunks, partial
+
+def build_skp_fact_prompt(chunk, index, total, partial=False):
+    partial_note = ("\nCATATAN: bagian ini memuat potongan RHK/blok yang terbelah dengan bagian sebelum atau sesudahnya. Salin fakta yang terlihat apa adanya,"
+                    " isi '-' untuk kolom yang terpotong, dan akhiri baris fakta dari blok terbelah dengan '(sebagian)'.\n") if partial else ""
+    return f"""Ekstrak fakta dari BAGIAN {index}/{total} dokumen SKP/EKP berikut. JANGAN menilai, menghitung, atau menyimpulkan; hanya salin fakta yang tertulis.
+{partial_note}
+--- BAGIAN DOKUMEN ---
+{chunk}
+--- AKHIR BAGIAN ---
+
+FORMAT OUTPUT (satu fakta per baris, tanpa teks lain; tulis '-' untuk kolom yang tidak ada; lewati jenis fakta yang tidak muncul di bagian ini):
+RHK | [Nama RHK] | Target: [angka + satuan] | Realisasi: [angka + satuan] | Umpan Balik: [kutipan umpan balik pimpinan]
+PERILAKU | [Aspek: Berorientasi Pelayanan/Akuntabel/Kompeten/Harmonis/Loyal/Adaptif/Kolaboratif] | [kutipan umpan balik pimpinan]
+IDENTITAS | [Nama/NIP/Jabatan/Unit Kerja/Periode] | [nilai]
+PREDIKAT | [Predikat kinerja yang tertulis di dokumen, beserta periodenya bila ada]"""
+
+@instrument_stage('skp_map')
+def extract_skp_facts(chunks, provider, partial=()):
+    """Tahap map: satu panggilan LLM ringkas per potongan, paralel di pool LLM (tetap lewat router & admission control).
+    Mengembalikan (daftar teks fakta per potongan, jumlah potongan gagal)."""
+    futures = [submit_ai(provider, build_skp_fact_prompt(chunk, index + 1, len(chunks), index in partial), SKP_FACT_SYSTEM_PROMPT) for index, chunk in enumerate(chunks)]
+    facts, failed = [], 0
+    try:
+        for index, future in enumerate(futures):
+            text = future.result()
+            if is_ai_error(text): failed += 1; app.logger.warning(f"SKP map: bagian {index + 1}/{len(chunks)} gagal: {text[:200]}"); facts.append(f"(Bagian {index + 1}: fakta gagal diekstrak)")
+            else: facts.append(text.strip())
+    except Exception:
+        for future in futures: future.cancel()
+        raise
+    return facts, failed
+
+def prepare_selayar_skp(file_bytes, filename, provider='gemini', mode=None):
+    """Ekstraksi dokumen SKP + rakit prompt V3.8. Mengembalikan (prompt, extraction) atau (None, None) jika teks gagal dibaca."""
+    skp_extraction, mode = extract_selayar_skp(file_bytes, filename, mode)
+    if not skp_extraction: return None, None
+    return assemble_selayar_skp_prompt(skp_extraction, filename, provider, mode), skp_extraction
+
+def extract_selayar_skp(file_bytes, filename, mode=None):
+    """Tahap cepat: baca teks dokumen sesuai anggaran mode. Mengembalikan (extraction, mode) atau (None, mode) jika teks gagal dibaca."""
+    mode = resolve_skp_mode(mode)
+    app.logger.info(f"SELAYAR (SKP V3.8): Analyze Artifact. File: {filename}, mode: {mode}")
+    return extract_document(file_bytes, filename, max_chars=SKP_TEXT_BUDGET if mode == 'single' else SKP_FULL_TEXT_BUDGET), mode # Berhenti membaca halaman setelah anggaran terlampaui
+
+def assemble_selayar_skp_prompt(skp_extraction, filename, provider, mode):
+    """Rakit prompt V3.8 dari teks hasil ekstraksi; extraction['analysis'] mencatat mode & jumlah potongan.
+    Teks melebihi SKP_TEXT_BUDGET (mode 'auto') atau mode 'chunked': fakta RHK/perilaku seluruh dokumen diekstrak per potongan secara paralel
+    (tahap map, bisa lama), dan prompt yang dikembalikan adalah panggilan merge berisi fakta tersebut."""
+    doc_text_full = skp_extraction["text"]
+    if mode == 'chunked' or (mode == 'auto' and len(doc_text_full) > SKP_TEXT_BUDGET):
+        if len(doc_text_full) > SKP_FULL_TEXT_BUDGET: app.logger.warning(f"SKP {filename} melebihi {SKP_FULL_TEXT_BUDGET} karakter, sisa dokumen tidak dianalisis.")
+        header, chunks, partial = split_skp_document(doc_text_full[:SKP_FULL_TEXT_BUDGET])
+        facts, failed = extract_skp_facts(chunks, provider, partial)
+        if failed < len(chunks):
+            app.logger.info(f"SKP {filename}: map-reduce {len(chunks)} bagian ({failed} gagal), {len(doc_text_full)} -> {sum(map(len, facts))} karakter fakta.")
+            skp_extraction["analysis"] = {"mode": "chunked", "chunks": len(chunks), "failed_chunks": failed, "partial_chunks": len(partial), "chars": min(len(doc_text_full), SKP_FULL_TEXT_BUDGET)}
+            merged = f"IDENTITAS (awal dokumen):\n{header or '-'}\n\nFAKTA PER BAGIAN ({len(chunks)} bagian, berurutan sesuai dokumen):\n" + "\n".join(facts)
+            note = (" Dokumen ini panjang sehingga telah diringkas menjadi daftar fakta per bagian (RHK, umpan balik perilaku, identitas, predikat) dari SELURUH dokumen."
+                    " Analisis SEMUA RHK yang tercantum (satu baris ringkas per RHK, bukan hanya 3) dan jangan mengarang data yang tidak ada di fakta."
+                    + (" Baris bertanda '(sebagian)' berasal dari RHK/blok yang terbelah antar bagian; gabungkan dengan baris bernama sama di bagian berdekatan." if partial else ""))
+            return build_selayar_skp_prompt(merged, filename, "FAKTA SKP/EKP", note)
+        app.logger.error(f"SKP {filename}: semua bagian map gagal, kembali ke analisis tunggal (dipotong).")
+    doc_text = doc_text_full[:SKP_TEXT_BUDGET] 
+    if len(doc_text_full) > SKP_TEXT_BUDGET: app.logger.warning(f"SKP {filename} dipotong.")
+    skp_extraction["analysis"] = {"mode": "single", "chunks": 1, "failed_chunks": 0, "chars": len(doc_text)}
+    return build_selayar_skp_prompt(doc_text, filename)
+
+def build_selayar_skp_prompt(doc_text, filename, document_label="DOKUMEN SKP/EKP", note=""):
     # --- PROMPT BARU V3.8 (Revisi berdasarkan umpan balik) ---
-    prompt = f"""
+    return f"""
     Anda adalah **Asesor Kinerja ASN (PPK) berbasis AI** yang **sangat teliti, objektif, dan analitis**.
-    Tugas Anda adalah menganalisis dokumen SKP/EKP berikut (yang berisi Rencana, Target, Realisasi, dan Umpan Balik Pimpinan) dan menghasilkan **Analisis Objektif Kinerja SELAYAR** dalam format Markdown terstruktur.
+    Tugas Anda adalah menganalisis dokumen SKP/EKP berikut (yang berisi Rencana, Target, Realisasi, dan Umpan Balik Pimpinan) dan menghasilkan **Analisis Objektif Kinerja SELAYAR** dalam format Markdown terstruktur.{note}
 
-    --- DOKUMEN SKP/EKP ---
+    --- {document_label} ---
     {doc_text}
     --- AKHIR DOKUMEN ---
 
@@ -482,32 +1928,18 @@ def selayar_analyze_skp():
     *Disclaimer: Analisis ini adalah estimasi AI.*
     ---
     """
-    # --------------------------------------------------------
-    
-    if provider == 'gemini': result_text = call_gemini_api(prompt)
-    else: result_text = call_byteplus_api(prompt, "Anda Asesor Kinerja ASN Objektif dan Analitis.")
-    
+
+def finalize_selayar_skp(result_text, filename):
+    """Parsing skor SKP + antrekan log; mengembalikan (payload, status_http)."""
     if "Error:" in result_text: 
         app.logger.error(f"Panggilan AI gagal SKP {filename}: {result_text}")
-        return jsonify({"artifact_analysis": result_text, "skor_kinerja": 0, "scores_structured": {}}), 500
+        return {"artifact_analysis": result_text, "skor_kinerja": 0, "scores_structured": {}}, 500
     
-    skor_kinerja_final = parse_score(result_text, "SKOR KINERJA FINAL", default=0) 
-    scores_perilaku = {
-        "pelayanan": parse_score(result_text, "Berorientasi Pelayanan", default=0),
-        "akuntabel": parse_score(result_text, "Akuntabel", default=0),
-        "kompeten": parse_score(result_text, "Kompeten", default=0),
-        "harmonis": parse_score(result_text, "Harmonis", default=0),
-        "loyal": parse_score(result_text, "Loyal", default=0),
-        "adaptif": parse_score(result_text, "Adaptif", default=0),
-        "kolaboratif": parse_score(result_text, "Kolaboratif", default=0)
-    }
-    scores_structured_dict = scores_perilaku 
+    scores_structured_dict = SELAYAR_SKP_SCORE_SCHEMA.extract(result_text) # Skor final + 7 aspek perilaku dalam satu scan
+    skor_kinerja_final = scores_structured_dict.pop("skor_kinerja")
     nama_pegawai_skp = filename.split('.')[0]
-    try:
-        log_entry = AssessmentLog(module='Selayar-SKP', candidate_name=nama_pegawai_skp, jabatan_or_program="Analisis SKP", skor_kinerja=skor_kinerja_final)
-        db.session.add(log_entry); db.session.commit()
-    except Exception as e: db.session.rollback(); app.logger.error(f"Gagal log Selayar-SKP: {str(e)}")
-    return jsonify({ "artifact_analysis": result_text, "skor_kinerja": skor_kinerja_final, "scores_structured": scores_structured_dict })
+    assessment_log_writer.submit(module='Selayar-SKP', candidate_name=nama_pegawai_skp, jabatan_or_program="Analisis SKP", skor_kinerja=skor_kinerja_final)
+    return { "artifact_analysis": result_text, "skor_kinerja": skor_kinerja_final, "scores_structured": scores_structured_dict }, 200
 
 @app.route('/api/selayar/export-pdf', methods=['POST'])
 def export_selayar_pdf():
@@ -520,27 +1952,434 @@ def export_selayar_pdf():
         return send_file(pdf_buffer, mimetype='application/pdf', as_attachment=True, download_name=safe_filename)
     else: return jsonify({"error": "Gagal generate PDF SKP"}), 500
 
+# Ekspor PDF massal: modul -> (judul, field nama, nama default, nama file) sama dengan endpoint export-pdf tunggal
+PDF_EXPORTS = {'lentera': ("Profil Potensi Lentera", 'nama_kandidat', 'Kandidat', lambda nama: f"Profil_Lentera_{nama}.pdf"),
+               'selayar': ("Analisis Objektif Kinerja SELAYAR", 'nama_file_skp', 'SKP_Pegawai', lambda nama: f"Analisis_Selayar_{nama.replace('.pdf','').replace('.txt','')}.pdf")}
+pdf_batch_executor = ContextThreadPoolExecutor(max_workers=max(PDF_RENDER_WORKERS, 1) * 2, thread_name_prefix='pdf-batch') # Thread hanya menunggu process pool
+
+@app.route('/api/export-pdf-batch', methods=['POST'])
+def export_pdf_batch():
+    """Banyak profil -> satu ZIP, dirender paralel. Body: {"module": "lentera"|"selayar", "profiles": [{"profile_markdown", "nama_kandidat"/"nama_file_skp", "module"?}]}.
+    Profil yang gagal dicatat di _gagal.txt di dalam ZIP (header X-Export-Failed)."""
+    request.max_content_length = int(PDF_BATCH_MAX_MB * 1024 * 1024) # Body JSON berisi ratusan profil: batas sendiri, bukan MAX_UPLOAD_MB
+    data = request.json or {}; profiles = data.get('profiles')
+    if not isinstance(profiles, list) or not profiles: return jsonify({"error": "'profiles' harus berupa array yang tidak kosong"}), 400
+    if len(profiles) > PDF_BATCH_MAX: return jsonify({"error": f"Maksimal {PDF_BATCH_MAX} profil per ekspor."}), 400
+    exports, used_names = [], set()
+    for i, profile in enumerate(profiles):
+        module = (profile.get('module') if isinstance(profile, dict) else None) or data.get('module')
+        if module not in PDF_EXPORTS: return jsonify({"error": f"profiles[{i}]: module harus 'lentera' atau 'selayar'"}), 400
+        if not profile.get('profile_markdown'): return jsonify({"error": f"profiles[{i}]: profile_markdown kosong"}), 400
+        title, name_field, default_name, make_filename = PDF_EXPORTS[module]
+        filename = secure_filename(make_filename(profile.get(name_field) or default_name))
+        if filename in used_names: filename = f"{i + 1}_{filename}" # Nama ganda: beri nomor urut
+        used_names.add(filename); exports.append((filename, profile['profile_markdown'], title))
+    app.logger.info(f"Ekspor PDF massal: {len(exports)} profil")
+    started = time.perf_counter()
+    futures = [pdf_batch_executor.submit(generate_pdf_bytes, markdown_text, title) for _, markdown_text, title in exports]
+    zip_buffer, failed = BytesIO(), []
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_STORED) as archive: # PDF sudah terkompresi
+        for (filename, _, _), future in zip(exports, futures):
+            try: archive.writestr(filename, future.result())
+            except Exception as e: failed.append(f"{filename}: {str(e)}"); app.logger.error(f"Ekspor PDF massal gagal untuk {filename}: {str(e)}")
+        if failed: archive.writestr('_gagal.txt', "\n".join(failed))
+    if len(failed) == len(exports): return jsonify({"error": "Semua PDF gagal dibuat", "details": failed}), 500
+    app.logger.info(f"Ekspor PDF massal selesai dalam {time.perf_counter() - started:.2f} s ({len(failed)} gagal)")
+    zip_buffer.seek(0)
+    response = send_file(zip_buffer, mimetype='application/zip', as_attachment=True, download_name=f"Ekspor_PDF_{len(exports)}_profil.zip")
+    response.headers['X-Export-Failed'] = str(len(failed))
+    return response
+
+@app.route('/api/selayar/analyze-skp-batch', methods=['POST'])
+def selayar_analyze_skp_batch():
+    """Analisis SKP massal: banyak file 'file_skp' atau satu ZIP. Selalu asinkron (202 + job dengan progres & manifest per file)."""
+    request.max_content_length = int(SKP_BATCH_MAX_MB * 1024 * 1024) # Batch ratusan SKP: batas sendiri, bukan MAX_UPLOAD_MB per dokumen
+    uploads = [f for f in request.files.getlist('file_skp') if f and f.filename]
+    if not uploads: return jsonify({"error": "File SKP / ZIP tidak ada"}), 400
+    if len(uploads) == 1 and uploads[0].filename.lower().endswith('.zip'): archive_bytes = uploads[0].read()
+    else:
+        # Kumpulkan upload ganda ke satu ZIP (tanpa kompresi) agar job cukup menyimpan satu blob input
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+            seen = set()
+            for index, upload in enumerate(uploads):
+                filename = secure_filename(upload.filename)
+                if filename in seen: filename = f"{index}_{filename}" # Nama kembar: tetap unik di manifest
+                seen.add(filename); archive.writestr(filename, upload.read())
+        archive_bytes = buffer.getvalue()
+    try: total = len(list_skp_archive(archive_bytes)) # Hanya metadata ZIP; isi dibaca per file oleh worker job
+    except (zipfile.BadZipFile, ValueError) as e: return jsonify({"error": f"Batch SKP tidak valid: {str(e)}"}), 400
+    if not total: return jsonify({"error": "Tidak ada dokumen SKP (pdf/docx/txt) di dalam batch."}), 400
+    app.logger.info(f"SELAYAR (SKP Batch): {total} file masuk antrean.")
+    return enqueue_assessment_job('selayar-skp-batch', request.form.to_dict(), data=archive_bytes, filename='batch.zip', total=total)
+
+# --- JOB ASESMEN BACKGROUND (202 + polling / SSE) ---
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2')); JOB_MAX_QUEUED = int(os.getenv('JOB_MAX_QUEUED', '200')); JOB_EVENTS_MAX_SECONDS = int(os.getenv('JOB_EVENTS_MAX_SECONDS', '900'))
+JOB_TERMINAL_STATUSES = ('succeeded', 'failed', 'cancelled')
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+job_cancel_events = {}; job_state_changed = threading.Condition()
+
+class JobCancelled(Exception): pass
+
+def _job_checkpoint(cancelled):
+    if cancelled.is_set(): raise JobCancelled()
+
+def _notify_job_change():
+    with job_state_changed: job_state_changed.notify_all()
+
+def job_to_dict(job, include_result=True):
+    fmt = lambda dt: dt.strftime('%Y-%m-%d %H:%M:%S') if dt else None
+    data = {"job_id": job.id, "kind": job.kind, "status": job.status, "attempts": job.attempts, "created_at": fmt(job.created_at), "started_at": fmt(job.started_at), "finished_at": fmt(job.finished_at), "error": job.error,
+            "progress": {"done": job.progress_done or 0, "total": job.progress_total or 1},
+            "status_url": f"/api/jobs/{job.id}", "events_url": f"/api/jobs/{job.id}/events"}
+    if include_result and job.result: data["result"] = json.loads(job.result)
+    return data
+
+def _job_lentera_grade(job, cancelled):
+    ctx = begin_lentera_grade(json.loads(job.params or '{}'), job.input_file, job.input_filename)
+    if ctx is None: raise ValueError("Tidak ada jawaban yang valid terdeteksi (baik file maupun teks).")
+    _job_checkpoint(cancelled); prompt, osint_status = assemble_lentera_prompt(ctx)
+    _job_checkpoint(cancelled); result_text = call_ai(ctx['provider'], prompt, LENTERA_GRADER_SYSTEM_PROMPT)
+    _job_checkpoint(cancelled); return complete_lentera_grade(ctx, result_text, osint_status), True
+
+def _job_selayar_skp(job, cancelled):
+    if job.input_file is None: raise ValueError("File SKP tidak ada")
+    params = json.loads(job.params or '{}'); provider = params.get('provider', 'gemini')
+    prompt, skp_extraction = prepare_selayar_skp(job.input_file, job.input_filename, provider, params.get('skp_mode'))
+    if not prompt: raise ValueError("Gagal baca teks SKP")
+    _job_checkpoint(cancelled); result_text = call_ai(provider, prompt, SELAYAR_SKP_SYSTEM_PROMPT)
+    _job_checkpoint(cancelled); payload, status = finalize_selayar_skp(result_text, job.input_filename)
+    return {**payload, "extraction_cache": extraction_cache_status(skp_extraction), "pages": skp_extraction["pages"], "pages_read": skp_extraction["pages_read"], "analysis": skp_extraction["analysis"]}, status == 200
+
+SKP_BATCH_CONCURRENCY = int(os.getenv('SKP_BATCH_CONCURRENCY', '4')); SKP_BATCH_MAX_FILES = int(os.getenv('SKP_BATCH_MAX_FILES', '500')); SKP_BATCH_FLUSH_EVERY = int(os.getenv('SKP_BATCH_FLUSH_EVERY', '20'))
+SKP_BATCH_MAX_MB = float(os.getenv('SKP_BATCH_MAX_MB', '256')); SKP_BATCH_MAX_UNCOMPRESSED_MB = float(os.getenv('SKP_BATCH_MAX_UNCOMPRESSED_MB', '1024')) # Upload batch / total isi ZIP setelah dekompresi
+SKP_BATCH_EXTENSIONS = ('pdf', 'docx', 'doc', 'txt')
+skp_batch_executor = ContextThreadPoolExecutor(max_workers=SKP_BATCH_CONCURRENCY, thread_name_prefix='skp-batch')
+
+def list_skp_archive(data):
+    """Daftar (nama_file, nama_entri_zip) dokumen SKP di dalam ZIP, dari metadata saja (tanpa dekompresi).
+    Entri folder/format lain dilewati; jumlah file, ukuran per entri dan total ukuran setelah dekompresi dibatasi."""
+    documents = []; total = 0
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        for info in archive.infolist():
+            filename = secure_filename(os.path.basename(info.filename))
+            if info.is_dir() or not filename or filename.lower().split('.')[-1] not in SKP_BATCH_EXTENSIONS: continue
+            if info.file_size > app.config['MAX_CONTENT_LENGTH']: raise ValueError(f"File {filename} di dalam ZIP terlalu besar.")
+            if len(documents) >= SKP_BATCH_MAX_FILES: raise ValueError(f"Batch melebihi {SKP_BATCH_MAX_FILES} file.")
+            total += info.file_size
+            if total > SKP_BATCH_MAX_UNCOMPRESSED_MB * 1024 * 1024: raise ValueError(f"Total isi ZIP melebihi {SKP_BATCH_MAX_UNCOMPRESSED_MB:g} MB setelah dekompresi.")
+            documents.append((filename, info.filename))
+    return documents
+
+def read_skp_archive_entry(data, member):
+    """Dekompresi satu entri ZIP di worker; zipfile berhenti di file_size yang sudah divalidasi list_skp_archive."""
+    with zipfile.ZipFile(BytesIO(data)) as archive: return archive.read(member)
+
+def analyze_skp_archive_entry(data, member, filename, provider, mode=None):
+    return analyze_skp_document(filename, read_skp_archive_entry(data, member), provider, mode)
+
+def analyze_skp_document(filename, file_bytes, provider, mode=None):
+    """Satu file dalam batch: ekstraksi -> LLM -> parsing (log lewat penulis log berkelompok). Mengembalikan baris manifest."""
+    prompt, skp_extraction = prepare_selayar_skp(file_bytes, filename, provider, mode)
+    if not prompt: return {"file": filename, "status": "error", "error": "Gagal baca teks SKP"}
+    payload, status = finalize_selayar_skp(call_ai(provider, prompt, SELAYAR_SKP_SYSTEM_PROMPT), filename)
+    if status != 200: return {"file": filename, "status": "error", "error": payload["artifact_analysis"]}
+    return {"file": filename, "status": "ok", "skor_kinerja": payload["skor_kinerja"], "scores_structured": payload["scores_structured"], "artifact_analysis": payload["artifact_analysis"],
+            "analysis_mode": skp_extraction["analysis"]["mode"]}
+
+def _batch_summary(manifest, total):
+    scores = [row["skor_kinerja"] for row in manifest if row["status"] == "ok"]
+    return {"total": total, "processed": len(manifest), "succeeded": len(scores), "failed": len(manifest) - len(scores), "avg_skor_kinerja": round(sum(scores) / len(scores), 2) if scores else None}
+
+def _job_selayar_skp_batch(job, cancelled):
+    """Fan-out file SKP ke pool berkonkurensi terbatas; progres dan manifest parsial disimpan per SKP_BATCH_FLUSH_EVERY file."""
+    params = json.loads(job.params or '{}'); provider = params.get('provider', 'gemini')
+    documents = list_skp_archive(job.input_file); manifest = []
+    futures = {skp_batch_executor.submit(analyze_skp_archive_entry, job.input_file, member, name, provider, params.get('skp_mode')): name for name, member in documents}
+    def flush():
+        job.progress_done = len(manifest); job.result = json.dumps({"summary": _batch_summary(manifest, len(documents)), "manifest": manifest}, ensure_ascii=False)
+        db.session.commit(); _notify_job_change()
+    try:
+        for future in as_completed(futures):
+            try: row = future.result()
+            except Exception as e: row = {"file": futures[future], "status": "error", "error": str(e)}
+            manifest.append(row)
+            if len(manifest) % SKP_BATCH_FLUSH_EVERY == 0: flush()
+            if cancelled.is_set():
+                for pending in futures: pending.cancel()
+                flush(); raise JobCancelled()
+        flush()
+    except JobCancelled: raise
+    except Exception:
+        for pending in futures: pending.cancel()
+        raise
+    return {"summary": _batch_summary(manifest, len(documents)), "manifest": manifest}, True
+
+JOB_HANDLERS = {'lentera-grade': _job_lentera_grade, 'selayar-skp': _job_selayar_skp, 'selayar-skp-batch': _job_selayar_skp_batch}
+
+def run_assessment_job(job_id):
+    """Worker pool: jalankan satu job (ekstraksi, OSINT, LLM, parsing) dan simpan status/hasil ke SQLite."""
+    with app.app_context(), admission_priority('batch'): # Panggilan provider job antre di belakang request interaktif
+        job = db.session.get(AssessmentJob, job_id)
+        if not job or job.status != 'queued': return # Dibatalkan sebelum sempat jalan
+        cancelled = job_cancel_events.setdefault(job_id, threading.Event())
+        job.status, job.started_at, job.attempts = 'running', datetime.datetime.utcnow(), (job.attempts or 0) + 1
+        db.session.commit(); _notify_job_change()
+        app.logger.info(f"JOB {job_id} ({job.kind}) mulai, percobaan ke-{job.attempts}.")
+        try:
+            payload, ok = JOB_HANDLERS[job.kind](job, cancelled)
+            job.result = json.dumps(payload, ensure_ascii=False)
+            job.status = 'succeeded' if ok else 'failed'
+            if ok: job.input_file, job.progress_done = None, job.progress_total # Input tidak diperlukan lagi
+            else: job.error = payload.get('artifact_analysis') or payload.get('error') or "Job gagal."
+        except JobCancelled: job.status = 'cancelled'; app.logger.info(f"JOB {job_id} dibatalkan.")
+        except Exception as e: db.session.rollback(); job.status, job.error = 'failed', str(e); app.logger.error(f"JOB {job_id} gagal: {str(e)}")
+        finally:
+            job.finished_at = datetime.datetime.utcnow()
+            try: db.session.commit()
+            except Exception as e: db.session.rollback(); app.logger.error(f"Gagal simpan status JOB {job_id}: {str(e)}")
+            job_cancel_events.pop(job_id, None); _notify_job_change()
+
+def enqueue_assessment_job(kind, fields, upload=None, data=None, filename=None, total=1):
+    """Simpan job ke SQLite lalu jadwalkan ke worker pool. Input dari upload (FileStorage) atau data/filename mentah. Respons 202 + URL status."""
+    if AssessmentJob.query.filter_by(status='queued').count() >= JOB_MAX_QUEUED:
+        return jsonify({"error": "Antrean job penuh, coba lagi nanti."}), 503, {"Retry-After": "30"}
+    fields = {k: v for k, v in fields.items() if k not in ('async', 'stream')}
+    if upload is not None: data, filename = upload.read(), secure_filename(upload.filename)
+    job = AssessmentJob(kind=kind, params=json.dumps(fields, ensure_ascii=False), input_filename=filename, input_file=data, progress_total=total)
+    db.session.add(job); db.session.commit()
+    job_executor.submit(run_assessment_job, job.id)
+    app.logger.info(f"JOB {job.id} ({kind}) masuk antrean.")
+    return jsonify(job_to_dict(job)), 202, {"Location": f"/api/jobs/{job.id}"}
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Polling status (dan hasil bila selesai) sebuah job."""
+    job = db.session.get(AssessmentJob, job_id)
+    if not job: return jsonify({"error": "Job tidak ditemukan."}), 404
+    return jsonify(job_to_dict(job))
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """Langganan status job via SSE: event 'status' setiap perubahan status/progres, stream ditutup saat job selesai."""
+    if not db.session.get(AssessmentJob, job_id): return jsonify({"error": "Job tidak ditemukan."}), 404
+    def generate():
+        last_state, deadline = None, time.monotonic() + JOB_EVENTS_MAX_SECONDS
+        while time.monotonic() < deadline:
+            db.session.rollback() # Akhiri transaksi baca agar status terbaru terlihat
+            job = db.session.get(AssessmentJob, job_id); db.session.refresh(job)
+            if (job.status, job.progress_done) != last_state:
+                last_state = (job.status, job.progress_done); yield sse_event(job_to_dict(job, include_result=job.status in JOB_TERMINAL_STATUSES), event="status")
+                if job.status in JOB_TERMINAL_STATUSES: return
+            with job_state_changed: changed = job_state_changed.wait(timeout=15)
+            if not changed: yield ": keep-alive\n\n"
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = db.session.get(AssessmentJob, job_id)
+    if not job: return jsonify({"error": "Job tidak ditemukan."}), 404
+    if job.status == 'queued':
+        job.status, job.finished_at = 'cancelled', datetime.datetime.utcnow(); db.session.commit(); _notify_job_change()
+    elif job.status == 'running':
+        job_cancel_events.setdefault(job_id, threading.Event()).set() # Worker berhenti di checkpoint tahap berikutnya
+        return jsonify({**job_to_dict(job, include_result=False), "status": "cancelling"}), 202
+    return jsonify(job_to_dict(job, include_result=False))
+
+@app.route('/api/jobs/<job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    job = db.session.get(AssessmentJob, job_id)
+    if not job: return jsonify({"error": "Job tidak ditemukan."}), 404
+    if job.status not in ('failed', 'cancelled'): return jsonify({"error": f"Job berstatus '{job.status}' tidak bisa diulang."}), 409
+    job.status, job.result, job.error, job.started_at, job.finished_at, job.progress_done = 'queued', None, None, None, None, 0
+    db.session.commit(); _notify_job_change()
+    job_executor.submit(run_assessment_job, job.id)
+    return jsonify(job_to_dict(job)), 202, {"Location": f"/api/jobs/{job.id}"}
+
+def recover_assessment_jobs():
+    """Saat start: job 'running' dari proses sebelumnya ditandai gagal (bisa di-retry), job 'queued' dijadwalkan ulang."""
+    with app.app_context():
+        interrupted = AssessmentJob.query.filter_by(status='running').all()
+        for job in interrupted: job.status, job.error, job.finished_at = 'failed', "Server berhenti saat job berjalan.", datetime.datetime.utcnow()
+        db.session.commit()
+        queued_ids = [job_id for (job_id,) in db.session.query(AssessmentJob.id).filter_by(status='queued').order_by(AssessmentJob.created_at)]
+    for job_id in queued_ids: job_executor.submit(run_assessment_job, job_id)
+    if interrupted or queued_ids: app.logger.info(f"JOB recovery: {len(interrupted)} terputus, {len(queued_ids)} dijadwalkan ulang.")
+
+# --- Warm-up Opsional & Statistik Startup ---
+NAVIGARA_WARMUP = os.getenv('NAVIGARA_WARMUP', '') # Kosong = semua lazy; 'all' atau daftar koma (mis. 'database,pdf') = warm-up di thread background saat start
+WARMUP_COMPONENTS = {'database': ensure_database, 'gemini': lambda: LAZY_RESOURCES['Gemini'].get(), 'search': lambda: LAZY_RESOURCES['Google Search'].get(),
+                     'extract': lambda: [LAZY_RESOURCES[name].get() for name in ('fitz', 'docx')],
+                     'graph': lambda: [LAZY_RESOURCES[name].get() for name in ('networkx', 'numpy', 'scipy.sparse', 'scipy.sparse.csgraph') if name in LAZY_RESOURCES],
+                     'pdf': lambda: pdf_render_pool.warm_up()}
+
+def parse_warmup_components(value):
+    """'all' / list / string koma -> daftar komponen; ValueError bila ada nama yang tidak dikenal."""
+    names = list(WARMUP_COMPONENTS) if value in (None, 'all', ['all']) else [n.strip() for n in (value.split(',') if isinstance(value, str) else value) if n and n.strip()]
+    unknown = [n for n in names if n not in WARMUP_COMPONENTS]
+    if unknown: raise ValueError(f"Komponen warm-up tidak dikenal: {', '.join(unknown)}. Pilihan: {', '.join(WARMUP_COMPONENTS)}")
+    return names
+
+def warm_up(components=None):
+    """Inisialisasi eksplisit komponen lazy; mengembalikan durasi (ms) atau pesan error per komponen."""
+    timings = {}
+    for name in parse_warmup_components(components):
+        started = time.perf_counter()
+        try: WARMUP_COMPONENTS[name](); timings[name] = round((time.perf_counter() - started) * 1000, 1)
+        except Exception as e: timings[name] = f"error: {str(e)}"; app.logger.error(f"Warm-up {name} gagal: {str(e)}")
+    STARTUP_STATS["warm_up"] = timings; app.logger.info(f"Warm-up selesai: {timings}")
+    return timings
+
+@app.route('/api/startup/stats', methods=['GET'])
+def get_startup_stats():
+    """Durasi import modul, inisialisasi database, dan status/durasi muat tiap resource lazy."""
+    return jsonify({**STARTUP_STATS, "database_ready": _database_ready.is_set(), "resources": {name: resource.stats() for name, resource in LAZY_RESOURCES.items()}})
+
+@app.route('/api/startup/warm-up', methods=['POST'])
+def post_startup_warm_up():
+    """Body opsional {"components": [...]} (default semua): memuat dependensi/klien sekarang, bukan saat request pertama yang memakainya."""
+    try: components = parse_warmup_components((request.get_json(silent=True) or {}).get('components'))
+    except ValueError as e: return jsonify({"error": str(e)}), 400
+    return jsonify({"warm_up": warm_up(components)})
+
+@app.route('/api/llm/providers', methods=['GET'])
+def get_llm_providers():
+    """Kesehatan provider LLM di router: state circuit breaker, error rate & latensi p50/p95 jendela rolling, jeda hedge."""
+    return jsonify(llm_router.stats())
+
+@app.route('/api/admission/stats', methods=['GET'])
+def get_admission_stats():
+    """Status admission control per provider: slot berjalan, antrean, token bucket, jumlah diterima/antre/ditolak."""
+    return jsonify({"providers": {name: limiter.stats() for name, limiter in admission_limiters.items()},
+                    "wait_seconds": ADMISSION_WAIT, "batch_queue_share": ADMISSION_BATCH_QUEUE_SHARE})
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Histogram latensi route & tahap, counter ukuran prompt/respons dan error provider, dalam format teks Prometheus (untuk di-scrape)."""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Statistik cache (hit/miss, ukuran) untuk monitoring."""
+    return jsonify({"llm": llm_cache.stats(), "osint": osint_cache.stats(), "extraction": extraction_cache.stats(), "org_graph": org_graph_store.stats(), "graph_layout": graph_layout_cache.stats(), "org_dataset": org_dataset_cache.stats(), "pdf": pdf_cache.stats(), "pdf_render": pdf_render_pool.stats()})
+
+HISTORY_COLUMNS = ('id', 'timestamp', 'module', 'candidate_name', 'jabatan_or_program', 'skor_potensi', 'skor_kinerja', 'recommendation', 'sentiment')
+HISTORY_DEFAULT_LIMIT = 50; HISTORY_MAX_LIMIT = 500
+
+def encode_history_cursor(timestamp, log_id):
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat() if timestamp else ''}|{log_id}".encode()).decode() # Timestamp kosong = baris lama tanpa timestamp
+
+def decode_history_cursor(cursor):
+    timestamp, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+    return (datetime.datetime.fromisoformat(timestamp) if timestamp else None), log_id
+
+def _history_int_arg(name):
+    value = request.args.get(name)
+    return int(value) if value not in (None, '') else None
+
+def _history_date_arg(name):
+    value = request.args.get(name)
+    return datetime.datetime.strptime(value, '%Y-%m-%d') if value else None
+
+def build_history_query(columns):
+    """SELECT kolom terpilih (tanpa hidrasi ORM) + filter dari query string, urut (timestamp, id) menurun.
+    Baris dengan timestamp NULL berada paling akhir (urutan DESC SQLite), diurutkan menurut id."""
+    query = db.session.query(*[getattr(AssessmentLog, name) for name in columns])
+    modules = [m for m in request.args.get('module', '').split(',') if m]
+    if len(modules) == 1: query = query.filter(AssessmentLog.module == modules[0])
+    elif modules: query = query.filter(AssessmentLog.module.in_(modules))
+    name = request.args.get('candidate_name', '').strip()
+    if name: # Prefix, case-insensitive: memakai index candidate_name COLLATE NOCASE
+        escaped = name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query = query.filter(AssessmentLog.candidate_name.like(f"{escaped}%", escape='\\'))
+    date_from, date_to = _history_date_arg('date_from'), _history_date_arg('date_to')
+    if date_from: query = query.filter(AssessmentLog.timestamp >= date_from)
+    if date_to: query = query.filter(AssessmentLog.timestamp < date_to + datetime.timedelta(days=1)) # date_to inklusif
+    for arg, column in (('min_potensi', AssessmentLog.skor_potensi), ('min_kinerja', AssessmentLog.skor_kinerja)):
+        value = _history_int_arg(arg)
+        if value is not None: query = query.filter(column >= value)
+    for arg, column in (('max_potensi', AssessmentLog.skor_potensi), ('max_kinerja', AssessmentLog.skor_kinerja)):
+        value = _history_int_arg(arg)
+        if value is not None: query = query.filter(column <= value)
+    cursor = request.args.get('cursor')
+    if cursor: # Keyset: lanjut tepat setelah baris terakhir halaman sebelumnya (tanpa OFFSET)
+        cursor_ts, cursor_id = decode_history_cursor(cursor)
+        if cursor_ts is None: query = query.filter(AssessmentLog.timestamp.is_(None), AssessmentLog.id < cursor_id)
+        else: query = query.filter(db.or_(db.tuple_(AssessmentLog.timestamp, AssessmentLog.id) < (cursor_ts, cursor_id), AssessmentLog.timestamp.is_(None)))
+    return query.order_by(AssessmentLog.timestamp.desc(), AssessmentLog.id.desc())
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    """Mengambil semua log asesmen dari database."""
+    """Log asesmen per halaman (keyset cursor) dengan filter module/candidate_name/tanggal/skor dan proyeksi kolom (?fields=)."""
     try:
-        logs = AssessmentLog.query.order_by(AssessmentLog.timestamp.desc()).all()
-        history_data = [{
-            "id": log.id,
-            "timestamp": log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            "module": log.module,
-            "candidate_name": log.candidate_name,
-            "jabatan_or_program": log.jabatan_or_program,
-            "skor_potensi": log.skor_potensi,
-            "skor_kinerja": log.skor_kinerja,
-            "recommendation": log.recommendation,
-            "sentiment": log.sentiment
-        } for log in logs]
-        return jsonify(history_data)
+        limit = min(max(_history_int_arg('limit') or HISTORY_DEFAULT_LIMIT, 1), HISTORY_MAX_LIMIT)
+        requested = [f for f in request.args.get('fields', '').split(',') if f]
+        unknown = [f for f in requested if f not in HISTORY_COLUMNS]
+        if unknown: return jsonify({"error": f"Kolom tidak dikenal: {', '.join(unknown)}"}), 400
+        columns = ['id', 'timestamp'] + [f for f in (requested or HISTORY_COLUMNS) if f not in ('id', 'timestamp')]
+        rows = build_history_query(columns).limit(limit + 1).all() # +1 baris untuk tahu masih ada halaman berikutnya
+    except (ValueError, UnicodeDecodeError, binascii.Error) as e:
+        return jsonify({"error": f"Parameter riwayat tidak valid: {str(e)}"}), 400
     except Exception as e:
         app.logger.error(f"Gagal mengambil history: {str(e)}")
         return jsonify({"error": "Gagal mengambil riwayat asesmen"}), 500
+    has_more = len(rows) > limit; rows = rows[:limit]
+    items = []
+    for row in rows:
+        item = dict(zip(columns, row))
+        item["timestamp"] = row.timestamp.strftime('%Y-%m-%d %H:%M:%S') if row.timestamp else None
+        items.append(item)
+    next_cursor = encode_history_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None
+    return jsonify({"items": items, "next_cursor": next_cursor, "has_more": has_more, "limit": limit})
+
+ANALYTICS_BUCKETS = {'day': AssessmentRollup.bucket_day, 'week': db.func.strftime('%Y-W%W', AssessmentRollup.bucket_day), 'month': db.func.substr(AssessmentRollup.bucket_day, 1, 7)}
+ANALYTICS_TOP_METRICS = ('skor_kinerja', 'skor_potensi')
+
+def _rollup_aggregates():
+    return (db.func.sum(AssessmentRollup.n).label('count'), db.func.sum(AssessmentRollup.sum_potensi).label('sum_potensi'), db.func.sum(AssessmentRollup.n_potensi).label('n_potensi'),
+            db.func.sum(AssessmentRollup.sum_kinerja).label('sum_kinerja'), db.func.sum(AssessmentRollup.n_kinerja).label('n_kinerja'))
+
+def _rollup_row(key_name, row):
+    avg = lambda total, n: round(total / n, 2) if n else None
+    return {key_name: row[0] or None, "count": row.count, "avg_skor_potensi": avg(row.sum_potensi, row.n_potensi), "avg_skor_kinerja": avg(row.sum_kinerja, row.n_kinerja)}
+
+@app.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    """Agregat dashboard dari tabel rollup (biaya O(bucket), bukan O(semua asesmen)): rata-rata skor per modul/jabatan/bucket waktu, distribusi rekomendasi & sentimen, top-N kandidat."""
+    bucket_name = request.args.get('bucket', 'day'); top_metric = request.args.get('top_metric', 'skor_kinerja')
+    if bucket_name not in ANALYTICS_BUCKETS: return jsonify({"error": f"bucket harus salah satu dari: {', '.join(ANALYTICS_BUCKETS)}"}), 400
+    if top_metric not in ANALYTICS_TOP_METRICS: return jsonify({"error": f"top_metric harus salah satu dari: {', '.join(ANALYTICS_TOP_METRICS)}"}), 400
+    try:
+        top_n = min(max(_history_int_arg('top') or 10, 0), 100); jabatan_limit = min(max(_history_int_arg('jabatan_limit') or 50, 1), 500)
+        date_from, date_to = _history_date_arg('date_from'), _history_date_arg('date_to')
+    except ValueError as e: return jsonify({"error": f"Parameter analitik tidak valid: {str(e)}"}), 400
+    modules = [m for m in request.args.get('module', '').split(',') if m]
+    def rollup_query(*keys):
+        query = db.session.query(*keys, *_rollup_aggregates())
+        if modules: query = query.filter(AssessmentRollup.module.in_(modules))
+        if date_from: query = query.filter(AssessmentRollup.bucket_day >= date_from.strftime('%Y-%m-%d'))
+        if date_to: query = query.filter(AssessmentRollup.bucket_day <= date_to.strftime('%Y-%m-%d'))
+        return query.group_by(*keys)
+    try:
+        bucket = ANALYTICS_BUCKETS[bucket_name].label('bucket')
+        by_module = [_rollup_row('module', r) for r in rollup_query(AssessmentRollup.module).all()]
+        by_jabatan = [_rollup_row('jabatan_or_program', r) for r in rollup_query(AssessmentRollup.jabatan_or_program).order_by(db.desc('count')).limit(jabatan_limit).all()]
+        by_bucket = [_rollup_row('bucket', r) for r in rollup_query(bucket).order_by(bucket).all()]
+        recommendations = {(r[0] or None): r.count for r in rollup_query(AssessmentRollup.recommendation).all() if r[0]}
+        sentiments = {(r[0] or None): r.count for r in rollup_query(AssessmentRollup.sentiment).all() if r[0]}
+        # Top-N memakai index skor di assessment_log (ORDER BY ... LIMIT N), bukan scan penuh
+        score_column = getattr(AssessmentLog, top_metric)
+        top_query = db.session.query(AssessmentLog.id, AssessmentLog.timestamp, AssessmentLog.module, AssessmentLog.candidate_name, AssessmentLog.jabatan_or_program, score_column).filter(score_column.isnot(None))
+        if modules: top_query = top_query.filter(AssessmentLog.module.in_(modules))
+        if date_from: top_query = top_query.filter(AssessmentLog.timestamp >= date_from)
+        if date_to: top_query = top_query.filter(AssessmentLog.timestamp < date_to + datetime.timedelta(days=1))
+        top_candidates = [{"id": r.id, "timestamp": r.timestamp.strftime('%Y-%m-%d %H:%M:%S') if r.timestamp else None, "module": r.module, "candidate_name": r.candidate_name,
+                           "jabatan_or_program": r.jabatan_or_program, top_metric: r[5]} for r in top_query.order_by(score_column.desc(), AssessmentLog.timestamp.desc()).limit(top_n).all()]
+    except Exception as e:
+        app.logger.error(f"Gagal menghitung analitik: {str(e)}")
+        return jsonify({"error": "Gagal menghitung analitik asesmen"}), 500
+    return jsonify({"bucket": bucket_name, "by_module": by_module, "by_jabatan_or_program": by_jabatan, "by_bucket": by_bucket,
+                    "recommendation_distribution": recommendations, "sentiment_distribution": sentiments, "top_metric": top_metric, "top_candidates": top_candidates})
 
 @app.route('/api/history/<log_id>', methods=['DELETE'])
 def delete_history_entry(log_id):
@@ -561,7 +2400,22 @@ def delete_history_entry(log_id):
 # -----------------------------
 
 # --- MODUL 3: NAKHODA (Sama seperti V2.1) ---
-def analyze_graph(pegawai_list, kolaborasi_list):
+NAKHODA_GRAPH_BACKEND = os.getenv('NAKHODA_GRAPH_BACKEND', 'auto').lower() # auto | networkx | sparse
+NAKHODA_SPARSE_MIN_NODES = int(os.getenv('NAKHODA_SPARSE_MIN_NODES', '5000'))
+
+def use_sparse_backend(num_pegawai):
+    """Backend sparse (NumPy/SciPy) untuk graf besar; 'auto' memakainya mulai NAKHODA_SPARSE_MIN_NODES pegawai bila SciPy terpasang."""
+    if NAKHODA_GRAPH_BACKEND == 'networkx' or sparse_graph is None: return False
+    return NAKHODA_GRAPH_BACKEND == 'sparse' or num_pegawai >= NAKHODA_SPARSE_MIN_NODES
+
+@instrument_stage('analyze_graph')
+def analyze_graph(pegawai_list, kolaborasi_list, advanced=None):
+    """advanced: None, atau dict {budget_ms, samples, top} untuk menambah metrics['advanced'] (betweenness, komunitas, bridge)."""
+    result = analyze_graph_sparse(pegawai_list, kolaborasi_list) if use_sparse_backend(len(pegawai_list)) else analyze_graph_networkx(pegawai_list, kolaborasi_list)
+    if advanced is not None and result['nodes']: result['metrics']['advanced'] = OrgGraph(pegawai_list, kolaborasi_list).advanced_metrics(**advanced)
+    return result
+
+def analyze_graph_networkx(pegawai_list, kolaborasi_list):
     G = nx.Graph()
     for p in pegawai_list:
         potensi = p.get('skor_potensi', 50); kinerja = p.get('skor_kinerja', 50)
@@ -584,28 +2438,868 @@ def analyze_graph(pegawai_list, kolaborasi_list):
     return {"nodes": nodes_for_reactflow, "edges": edges_for_reactflow, "metrics": metrics}
 
 
-@app.route('/api/nakhoda/get-graph', methods=['GET'])
-def get_graph():
-    app.logger.info("Modul NAKHODA: Mengambil graf awal (dummy_data_v2.json).")
+# --- Backend Graf Sparse (kolom NumPy + matriks adjacency SciPy) ---
+class SparseGraph:
+    """Pegawai sebagai array kolom, kolaborasi sebagai pasangan edge unik. Semantik mengikuti nx.Graph:
+    id ganda -> atribut terakhir menang di posisi pertama, edge ganda/terbalik digabung (label terakhir), self-loop berderajat 2."""
+
+    def __init__(self, pegawai_list, kolaborasi_list):
+        records = {}
+        for p in pegawai_list: records[p['id']] = p
+        self.ids = list(records); self.index = {node_id: i for i, node_id in enumerate(self.ids)}; n = self.n = len(self.ids)
+        records = list(records.values())
+        self.labels = [p.get('nama','N/A') for p in records]; self.units = [p.get('unit','N/A') for p in records]; self.jabatan = [p.get('jabatan','N/A') for p in records]
+        kinerja = np.array([p.get('skor_kinerja', 50) for p in records], dtype=np.float64).reshape(n)
+        potensi = np.array([p.get('skor_potensi', 50) for p in records], dtype=np.float64).reshape(n)
+        self.score = (kinerja * 0.6) + (potensi * 0.4)
+        index = self.index
+        missing = itertools.repeat(-1) # map(dict.get) jauh lebih cepat dari generator per edge
+        source = np.fromiter(map(index.get, [k.get('source') for k in kolaborasi_list], missing), dtype=np.int64, count=len(kolaborasi_list))
+        target = np.fromiter(map(index.get, [k.get('target') for k in kolaborasi_list], missing), dtype=np.int64, count=len(kolaborasi_list))
+        valid = np.flatnonzero((source >= 0) & (target >= 0))
+        low, high = np.minimum(source[valid], target[valid]), np.maximum(source[valid], target[valid])
+        # Edge unik, label dari kemunculan terakhir. Urutan & arah seperti nx.Graph.edges(): (node lebih awal, node lebih akhir) menurut urutan sisip node,
+        # dikelompokkan per node awal, tetangga menurut kemunculan pertama edge-nya
+        pair_key = low * max(n, 1) + high
+        _, first = np.unique(pair_key, return_index=True)
+        _, last_reversed = np.unique(pair_key[::-1], return_index=True)
+        order = np.lexsort((first, low[first])); first, last = first[order], (len(valid) - 1 - last_reversed)[order]
+        self.edge_label_rows = valid[last]
+        edge_low, edge_high = low[first], high[first]
+        self.source, self.target = edge_low, edge_high
+        self.num_edges = len(first)
+        self.degree = np.bincount(edge_low, minlength=n) + np.bincount(edge_high, minlength=n) # Self-loop otomatis terhitung 2
+        self.adjacency = sparse_graph.coo_matrix((np.ones(self.num_edges, dtype=np.int8), (edge_low, edge_high)), shape=(n, n)).tocsr()
+
+    def centrality(self):
+        if self.n <= 1: return np.ones(self.n)
+        return self.degree * (1.0 / (self.n - 1.0)) # Sama dengan nx.degree_centrality (kali 1/(n-1), bukan bagi)
+
+    def num_silos(self):
+        return int(sparse_csgraph.connected_components(self.adjacency, directed=False)[0]) if self.n else 0
+
+    def total_effectiveness(self):
+        # Suku per node dihitung vektor; penjumlahan berurutan dengan sum() bawaan agar hasil float identik dengan jalur networkx
+        return sum((self.score * (1 + self.centrality())).tolist())
+
+    def metrics(self):
+        if not self.n: return {"total_pegawai": 0, "total_kolaborasi": 0, "avg_effectiveness": 0, "num_silos": 0}
+        return {"total_pegawai": self.n, "total_kolaborasi": self.num_edges, "avg_effectiveness": self.total_effectiveness() / self.n, "num_silos": self.num_silos()}
+
+def analyze_graph_sparse(pegawai_list, kolaborasi_list):
+    """Padanan analyze_graph_networkx untuk graf besar. Metrik, node, dan edge (id, arah, urutan, label) identik."""
+    graph = SparseGraph(pegawai_list, kolaborasi_list)
+    if not graph.n: return {"nodes": [], "edges": [], "metrics": graph.metrics()}
+    nodes_for_reactflow = [_reactflow_node(node_id, label, unit, score) for node_id, label, unit, score in zip(graph.ids, graph.labels, graph.units, graph.score.tolist())]
+    return {"nodes": nodes_for_reactflow, "edges": sparse_edge_views(graph, kolaborasi_list), "metrics": graph.metrics()}
+
+def sparse_edge_views(graph, kolaborasi_list):
+    ids = graph.ids
+    return [{"id": f"e-{ids[u]}-{ids[v]}", "source": ids[u], "target": ids[v], "label": kolaborasi_list[row].get('project', ''), "animated": True}
+            for u, v, row in zip(graph.source.tolist(), graph.target.tolist(), graph.edge_label_rows.tolist())]
+
+# --- Layout Graf Nakhoda (server-side: cluster per unit / force-directed, cache + warm start) ---
+NAKHODA_LAYOUT_SPACING = float(os.getenv('NAKHODA_LAYOUT_SPACING', '180')) # px per satuan layout (~jarak antar node)
+NAKHODA_LAYOUT_ITERATIONS = int(os.getenv('NAKHODA_LAYOUT_ITERATIONS', '60')); NAKHODA_LAYOUT_WARM_ITERATIONS = int(os.getenv('NAKHODA_LAYOUT_WARM_ITERATIONS', '20'))
+NAKHODA_LAYOUT_FORCE_MAX_NODES = int(os.getenv('NAKHODA_LAYOUT_FORCE_MAX_NODES', '5000')) # Di atas ini 'auto' memakai layout cluster unit O(n)
+NAKHODA_LAYOUT_CACHE_SIZE = int(os.getenv('NAKHODA_LAYOUT_CACHE_SIZE', '32'))
+LAYOUT_MODES = ('auto', 'force', 'unit', 'none')
+LAYOUT_EXACT_MAX_NODES = 600 # Repulsi eksak O(n^2) di bawah ini, di atasnya aproksimasi Barnes-Hut satu tingkat (grid)
+LAYOUT_UNIT_PULL = 0.5; LAYOUT_GRAVITY = 0.01; LAYOUT_CHUNK = 2048
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+def sunflower_offsets(rank):
+    """Posisi ke-rank dalam spiral Vogel (jarak antar titik ~1 satuan)."""
+    radius = 0.56 * np.sqrt(rank + 0.5); theta = rank * GOLDEN_ANGLE
+    return np.column_stack((radius * np.cos(theta), radius * np.sin(theta)))
+
+def unit_cluster_layout(unit_codes, num_units):
+    """Satu lingkaran per unit (terbesar dulu, disusun per baris), anggota unit dalam spiral di dalamnya. O(n)."""
+    sizes = np.bincount(unit_codes, minlength=num_units); radii = 0.56 * np.sqrt(sizes) + 1.0
+    row_width = max(math.sqrt(float(((2 * radii) ** 2).sum())) * 1.1, float(2 * radii.max()) if num_units else 0.0)
+    centers = np.zeros((num_units, 2)); x = y = row_height = 0.0
+    for unit in np.argsort(-sizes, kind='stable').tolist():
+        diameter = 2 * radii[unit]
+        if x > 0 and x + diameter > row_width: x, y, row_height = 0.0, y + row_height, 0.0
+        centers[unit] = (x + radii[unit], y + radii[unit]); x += diameter; row_height = max(row_height, diameter)
+    order = np.argsort(unit_codes, kind='stable'); starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    rank = np.empty(len(unit_codes)); rank[order] = np.arange(len(unit_codes)) - starts[unit_codes[order]]
+    return centers[unit_codes] + sunflower_offsets(rank)
+
+def _pairwise_push(target_xy, source_xy, weight=None):
+    """Jumlah dorongan w * delta / |delta|^2 dari setiap sumber ke setiap target (x & y terpisah: jauh lebih cepat dari reduksi sumbu berukuran 2)."""
+    dx = target_xy[:, 0][:, None] - source_xy[:, 0][None, :]; dy = target_xy[:, 1][:, None] - source_xy[:, 1][None, :]
+    inverse = 1.0 / np.maximum(dx * dx + dy * dy, 1e-4)
+    if weight is not None: inverse *= weight
+    return np.column_stack(((dx * inverse).sum(1), (dy * inverse).sum(1)))
+
+def _layout_repulsion(pos, rows):
+    """Gaya tolak Fruchterman-Reingold (k=1) pada node 'rows'. Graf besar: sel grid jauh diwakili pusat massanya (Barnes-Hut satu tingkat), sel sendiri eksak."""
+    n = len(pos); disp = np.zeros((len(rows), 2))
+    if n <= LAYOUT_EXACT_MAX_NODES:
+        for start in range(0, len(rows), LAYOUT_CHUNK): # Diri sendiri: delta 0 -> kontribusi 0
+            block = rows[start:start + LAYOUT_CHUNK]; disp[start:start + len(block)] = _pairwise_push(pos[block], pos)
+        return disp
+    cells_per_side = max(int(math.ceil(math.sqrt(n / 16))), 2); low = pos.min(0); span = np.ptp(pos, axis=0) + 1e-9
+    cell_xy = np.minimum(((pos - low) / span * cells_per_side).astype(np.int64), cells_per_side - 1)
+    _, cell_index = np.unique(cell_xy[:, 0] * cells_per_side + cell_xy[:, 1], return_inverse=True); mass = np.bincount(cell_index).astype(np.float64)
+    centroid = np.column_stack((np.bincount(cell_index, pos[:, 0]), np.bincount(cell_index, pos[:, 1]))) / mass[:, None]
+    for start in range(0, len(rows), LAYOUT_CHUNK): # Medan jauh: pusat massa setiap sel kecuali sel sendiri
+        block = rows[start:start + LAYOUT_CHUNK]; weight = np.broadcast_to(mass, (len(block), len(mass))).copy()
+        weight[np.arange(len(block)), cell_index[block]] = 0
+        disp[start:start + len(block)] = _pairwise_push(pos[block], centroid, weight)
+    row_position = np.full(n, -1); row_position[rows] = np.arange(len(rows))
+    members_by_cell = np.argsort(cell_index, kind='stable'); bounds = np.concatenate(([0], np.cumsum(mass).astype(np.int64)))
+    for c in np.unique(cell_index[rows]).tolist(): # Medan dekat: pasangan eksak di dalam sel
+        members = members_by_cell[bounds[c]:bounds[c + 1]]; targets = members[row_position[members] >= 0]
+        disp[row_position[targets]] += _pairwise_push(pos[targets], pos[members])
+    return disp
+
+def force_layout(pos, edge_u, edge_v, unit_codes, num_units, movable, iterations, temperature):
+    """Fruchterman-Reingold + tarikan ke pusat unit masing-masing + gravitasi lemah; hanya node 'movable' yang dipindah (warm start)."""
+    pos = pos.copy(); rows = np.flatnonzero(movable); n = len(pos)
+    if not n or not len(rows) or not iterations: return pos
+    sizes = np.maximum(np.bincount(unit_codes, minlength=num_units), 1)
+    for iteration in range(iterations):
+        step_limit = temperature * (1 - iteration / iterations) + 1e-3
+        disp = np.zeros((n, 2)); disp[rows] = _layout_repulsion(pos, rows)
+        if len(edge_u): # Tarikan edge: d^2/k sepanjang arah edge
+            delta = pos[edge_u] - pos[edge_v]; force = delta * np.sqrt((delta ** 2).sum(-1))[:, None]
+            np.add.at(disp, edge_u, -force); np.add.at(disp, edge_v, force)
+        centers = np.column_stack((np.bincount(unit_codes, pos[:, 0], num_units), np.bincount(unit_codes, pos[:, 1], num_units))) / sizes[:, None]
+        disp += LAYOUT_UNIT_PULL * (centers[unit_codes] - pos) + LAYOUT_GRAVITY * (pos.mean(0) - pos)
+        length = np.maximum(np.sqrt((disp[rows] ** 2).sum(-1)), 1e-9)
+        pos[rows] += disp[rows] * (np.minimum(length, step_limit) / length)[:, None]
+    return pos
+
+def layout_pixel_scale(pos, sample=256):
+    """Skala px per satuan layout agar median jarak tetangga terdekat = NAKHODA_LAYOUT_SPACING (node tidak saling tumpuk)."""
+    if len(pos) < 2: return NAKHODA_LAYOUT_SPACING
+    picks = np.linspace(0, len(pos) - 1, min(sample, len(pos))).astype(np.int64)
+    dx = pos[picks, 0][:, None] - pos[:, 0][None, :]; dy = pos[picks, 1][:, None] - pos[:, 1][None, :]
+    dist2 = dx * dx + dy * dy; dist2[np.arange(len(picks)), picks] = np.inf
+    nearest = float(np.median(np.sqrt(dist2.min(1))))
+    return NAKHODA_LAYOUT_SPACING / max(nearest, 1e-3)
+
+class GraphLayoutCache:
+    """LRU (posisi layout, skala px) per hash (mode + node beserta unitnya + himpunan edge)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries; self.entries = OrderedDict(); self.lock = threading.Lock()
+        self.hits = self.misses = self.warm_starts = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None: self.misses += 1; return None
+            self.entries.move_to_end(key); self.hits += 1; return entry
+
+    def put(self, key, entry, warm=False):
+        with self.lock:
+            self.entries[key] = entry; self.entries.move_to_end(key); self.warm_starts += 1 if warm else 0
+            while len(self.entries) > self.max_entries: self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses, "warm_starts": self.warm_starts}
+
+graph_layout_cache = GraphLayoutCache(NAKHODA_LAYOUT_CACHE_SIZE)
+
+def resolve_layout_mode(requested, num_nodes):
+    if np is None or requested == 'none' or not num_nodes: return None
+    if requested == 'auto': return 'force' if num_nodes <= NAKHODA_LAYOUT_FORCE_MAX_NODES else 'unit'
+    return requested
+
+# --- Metrik Jaringan Lanjutan Nakhoda (betweenness k-pivot, komunitas, bridge; dibatasi waktu, status disimpan per struktur graf) ---
+NAKHODA_METRICS_BUDGET_MS = int(os.getenv('NAKHODA_METRICS_BUDGET_MS', '2000')); NAKHODA_METRICS_MAX_BUDGET_MS = int(os.getenv('NAKHODA_METRICS_MAX_BUDGET_MS', '30000'))
+NAKHODA_BETWEENNESS_SAMPLES = int(os.getenv('NAKHODA_BETWEENNESS_SAMPLES', '256')) # Pivot (sumber BFS); graf <= nilai ini dihitung eksak
+NAKHODA_COMMUNITY_MAX_ITER = int(os.getenv('NAKHODA_COMMUNITY_MAX_ITER', '50'))
+NETWORK_METRICS_CELLS = 4_000_000 # n x pivot per batch BFS (membatasi memori matriks padat)
+
+def find_bridges(n, indptr, indices):
+    """Bridge (Tarjan iteratif, O(V+E), eksak): [(parent, child, jumlah pegawai yang terpisah bila edge putus)]."""
+    disc, low, size = [-1] * n, [0] * n, [1] * n; bridges = []; clock = 0
+    for root in range(n):
+        if disc[root] >= 0: continue
+        disc[root] = low[root] = clock; clock += 1; found = []
+        stack = [(root, -1, iter(indices[indptr[root]:indptr[root + 1]]))]
+        while stack:
+            v, parent, neighbours = stack[-1]
+            for w in neighbours:
+                if w == parent: continue
+                if disc[w] < 0:
+                    disc[w] = low[w] = clock; clock += 1; stack.append((w, v, iter(indices[indptr[w]:indptr[w + 1]]))); break
+                if disc[w] < low[v]: low[v] = disc[w]
+            else:
+                stack.pop()
+                if parent >= 0:
+                    size[parent] += size[v]
+                    if low[v] < low[parent]: low[parent] = low[v]
+                    if low[v] > disc[parent]: found.append((parent, v))
+        bridges += [(u, v, min(size[v], size[root] - size[v])) for u, v in found]
+    return bridges
+
+class NetworkMetrics:
+    """Betweenness, komunitas & bridge untuk satu struktur graf (node+edge tetap; unit tidak berpengaruh).
+    Sampling betweenness dan iterasi komunitas disimpan: permintaan berikutnya melanjutkan (akurasi naik), hasil lengkap dipakai ulang."""
+
+    def __init__(self, indptr, indices):
+        self.n = len(indptr) - 1; self.indptr, self.indices = indptr, indices; self.lock = threading.Lock()
+        self.bridges = None; self.pivot_order = None; self.pivots_done = 0; self.raw_betweenness = None
+        self.labels = None; self.community_iterations = 0; self.communities_converged = False
+        if sparse_graph is not None and self.n:
+            self.adjacency = sparse_graph.csr_matrix((np.ones(len(indices)), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)), shape=(self.n, self.n))
+        else: self.adjacency = None
+
+    def _graph(self):
+        G = nx.Graph(); G.add_nodes_from(range(self.n))
+        G.add_edges_from((i, j) for i in range(self.n) for j in self.indices[self.indptr[i]:self.indptr[i + 1]] if i < j)
+        return G
+
+    def bridge_list(self):
+        if self.bridges is None: self.bridges = find_bridges(self.n, self.indptr, self.indices)
+        return self.bridges
+
+    def _brandes_batch(self, sources):
+        """Brandes untuk sekumpulan sumber sekaligus: BFS per level & akumulasi balik sebagai perkalian matriks sparse x padat (n x sumber)."""
+        n, width = self.n, len(sources); cols = np.arange(width); A = self.adjacency
+        dist = np.full((n, width), -1, dtype=np.int32); sigma = np.zeros((n, width))
+        dist[sources, cols] = 0; sigma[sources, cols] = 1.0
+        frontier = np.zeros((n, width), dtype=bool); frontier[sources, cols] = True; levels = [frontier]
+        while True:
+            paths = A @ (sigma * frontier); new = (dist < 0) & (paths > 0)
+            if not new.any(): break
+            sigma[new] = paths[new]; dist[new] = len(levels); levels.append(new); frontier = new
+        delta = np.zeros((n, width)); safe_sigma = np.where(sigma > 0, sigma, 1.0)
+        for depth in range(len(levels) - 1, 0, -1):
+            coef = np.where(levels[depth], (1.0 + delta) / safe_sigma, 0.0)
+            delta += np.where(levels[depth - 1], sigma * (A @ coef), 0.0)
+        delta[sources, cols] = 0.0
+        return delta.sum(1)
+
+    def betweenness(self, samples, deadline):
+        """(skor ternormalisasi seperti nx.betweenness_centrality, jumlah pivot, eksak?). Pivot diambil dari permutasi acak tetap (seed 0)."""
+        n = self.n; target = min(max(samples, 1), n)
+        if self.adjacency is None: # Tanpa SciPy: networkx (k-pivot tanpa batas waktu)
+            if self.pivots_done < target:
+                scores = nx.betweenness_centrality(self._graph(), k=None if target >= n else target, seed=0)
+                self.raw_betweenness = np.array([scores[i] for i in range(n)]) if np is not None else [scores[i] for i in range(n)]; self.pivots_done = target
+            return self.raw_betweenness, self.pivots_done, self.pivots_done >= n
+        if self.pivot_order is None: self.pivot_order = np.random.default_rng(0).permutation(n); self.raw_betweenness = np.zeros(n)
+        batch = max(1, min(64, NETWORK_METRICS_CELLS // max(n, 1)))
+        while self.pivots_done < target and (self.pivots_done == 0 or time.perf_counter() < deadline):
+            sources = self.pivot_order[self.pivots_done:min(self.pivots_done + batch, target)]
+            self.raw_betweenness += self._brandes_batch(sources); self.pivots_done += len(sources)
+        pivots = self.pivots_done; scale = 1.0 / ((n - 1) * (n - 2)) if n > 2 else 1.0
+        return self.raw_betweenness * (scale * n / pivots), pivots, pivots >= n
+
+    def communities(self, deadline):
+        """Label propagation sinkron (label sendiri ikut dihitung agar tidak berosilasi; seri dipecah jitter deterministik).
+        Mengembalikan (label komunitas 0..C-1, iterasi, konvergen?)."""
+        n = self.n
+        if self.adjacency is None:
+            if self.labels is None:
+                labels = [0] * n
+                for c, members in enumerate(nx.community.label_propagation_communities(self._graph())):
+                    for i in members: labels[i] = c
+                self.labels, self.communities_converged = labels, True
+            return self.labels, self.community_iterations, self.communities_converged
+        if self.labels is None: self.labels = np.arange(n, dtype=np.int64)
+        rows = np.concatenate((np.repeat(np.arange(n, dtype=np.int64), np.diff(np.asarray(self.indptr))), np.arange(n, dtype=np.int64)))
+        cols = np.concatenate((np.asarray(self.indices, dtype=np.int64), np.arange(n, dtype=np.int64)))
+        while not self.communities_converged and self.community_iterations < NAKHODA_COMMUNITY_MAX_ITER and (self.community_iterations == 0 or time.perf_counter() < deadline):
+            keys, counts = np.unique(rows * n + self.labels[cols], return_counts=True)
+            node, label = keys // n, keys % n
+            score = counts + ((label * 2654435761 + self.community_iterations * 40503) % 1000003) / 1000003.0
+            order = np.lexsort((-score, node)); first = order[np.r_[True, node[order][1:] != node[order][:-1]]]
+            labels = self.labels.copy(); labels[node[first]] = label[first]
+            self.communities_converged = bool((labels == self.labels).all()); self.labels = labels; self.community_iterations += 1
+        return np.unique(self.labels, return_inverse=True)[1], self.community_iterations, self.communities_converged
+
+def network_metrics_report(state, ids, names, units, budget_ms, samples, top):
+    """Blok metrics['advanced']: broker (betweenness), komunitas (silo nyata lintas unit), bridge antar unit; 'approximate_metrics' menandai hasil perkiraan.
+    Bridge (eksak, linear) dihitung dulu; komunitas memakai hingga 40% anggaran; sisa anggaran untuk pivot betweenness."""
+    started = time.perf_counter(); deadline = started + budget_ms / 1000.0; n = len(ids)
+    with state.lock:
+        bridges_cached = state.bridges is not None; bridges = state.bridge_list()
+        labels, iterations, converged = state.communities(started + 0.4 * budget_ms / 1000.0)
+        pivots_before = state.pivots_done; scores, pivots, exact = state.betweenness(samples, deadline)
+    ranked = sorted(range(n), key=lambda i: -float(scores[i]))[:top]
+    betweenness = {"approximate": not exact, "method": "brandes" if exact else "k-pivot", "pivots": pivots, "total_nodes": n, "cached": pivots == pivots_before,
+                   "top": [{"id": ids[i], "nama": names[i], "unit": units[i], "score": round(float(scores[i]), 6)} for i in ranked]}
+    label_of = labels if isinstance(labels, list) else labels.tolist(); members, unit_mix, internal, external, degree_sum = {}, {}, {}, {}, {}
+    for i in range(n):
+        c = label_of[i]; members[c] = members.get(c, 0) + 1; mix = unit_mix.setdefault(c, {}); mix[units[i]] = mix.get(units[i], 0) + 1
+        row = state.indices[state.indptr[i]:state.indptr[i + 1]]; degree_sum[c] = degree_sum.get(c, 0) + len(row)
+        same = sum(1 for j in row if label_of[j] == c); internal[c] = internal.get(c, 0) + same; external[c] = external.get(c, 0) + len(row) - same
+    edges = len(state.indices) // 2
+    modularity = sum(internal[c] / 2 / edges - (degree_sum[c] / (2 * edges)) ** 2 for c in members) if edges else 0.0
+    biggest = sorted(members, key=lambda c: -members[c])[:top]
+    communities = {"approximate": not converged, "method": "label_propagation", "iterations": iterations, "converged": converged, "count": len(members),
+                   "modularity": round(modularity, 4), "multi_unit": sum(1 for c in members if len(unit_mix[c]) > 1),
+                   "top": [{"size": members[c], "units": len(unit_mix[c]), "dominant_unit": max(unit_mix[c], key=unit_mix[c].get),
+                            "dominant_unit_share": round(max(unit_mix[c].values()) / members[c], 3), "internal_edges": internal[c] // 2, "external_edges": external[c]} for c in biggest]}
+    cross = [b for b in bridges if units[b[0]] != units[b[1]]]
+    bridge_report = {"approximate": False, "total": len(bridges), "cross_unit": len(cross), "cached": bridges_cached,
+                     "top": [{"source": ids[u], "target": ids[v], "source_unit": units[u], "target_unit": units[v], "isolated_if_removed": cut} for u, v, cut in sorted(cross, key=lambda b: -b[2])[:top]]}
+    report = {"betweenness": betweenness, "communities": communities, "bridges": bridge_report}
+    report["approximate_metrics"] = [name for name, block in report.items() if block["approximate"]]
+    report.update({"budget_ms": budget_ms, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)})
+    return report
+
+# --- Graf Organisasi In-Memory (delta pemindahan unit + what-if massal) ---
+def _reactflow_node(node_id, label, unit, score):
+    bg = '#90EE90' if score > 80 else ('#FFD700' if score > 60 else '#F08080')
+    return {"id": node_id, "position": {"x": 0, "y": 0},"data": {"label": f"{label} ({unit})\nSkor: {score:.0f}"},"style": { "background": bg, "border": "1px solid #333", "whiteSpace": "pre-line", "textAlign": "center"}}
+
+def _unit_pair(unit_a, unit_b):
+    """Kunci edge antar unit tanpa arah (nama unit dari JSON bisa string/angka, jadi diurutkan lewat repr)."""
+    return (unit_a, unit_b) if repr(unit_a) <= repr(unit_b) else (unit_b, unit_a)
+
+def _unit_node_id(unit): return f"unit:{unit}"
+
+def _unit_edge_view(edge_id, source, target, weight):
+    return {"id": edge_id, "source": source, "target": target, "label": f"{weight} kolaborasi", "data": {"weight": weight}, "style": {"strokeWidth": round(min(1 + math.log2(weight), 8), 2)}}
+
+class OrgGraph:
+    """Graf organisasi persisten. Skor, sentralitas derajat dan jumlah silo hanya bergantung pada node+edge (dihitung sekali, sama persis dengan analyze_graph);
+    pemindahan unit diterapkan sebagai delta pada metrik lintas unit (kolaborasi lintas unit, unit yang terisolasi): evaluasi O(1), penerapan O(derajat)."""
+
+    def __init__(self, pegawai_list, kolaborasi_list):
+        self.lock = threading.RLock()
+        if use_sparse_backend(len(pegawai_list)): self._build_sparse(SparseGraph(pegawai_list, kolaborasi_list), kolaborasi_list)
+        else: self._build(pegawai_list, kolaborasi_list)
+        self._node_views = None # View React Flow dibangun saat pertama kali diminta
+        self.positions = None; self.layout_scale = NAKHODA_LAYOUT_SPACING; self.layout_mode = None; self.layout_dirty = set(); self._layout_edges = None; self._node_index = None
+        self.unit_members, self.unit_external = {}, {}; self.cross_unit_edges = 0
+        for u, data in self.nodes.items(): self.unit_members[data['unit']] = self.unit_members.get(data['unit'], 0) + 1; self.unit_external.setdefault(data['unit'], 0)
+        self.neighbour_units = {u: {} for u in self.nodes} # Per node: jumlah tetangga per unit (tanpa self-loop) -> evaluasi what-if O(1)
+        for u, nbrs in self.adj.items():
+            counts = self.neighbour_units[u]
+            for v in nbrs:
+                if v != u: counts[self.nodes[v]['unit']] = counts.get(self.nodes[v]['unit'], 0) + 1
+        for u, counts in self.neighbour_units.items(): # Ujung edge lintas unit per node = tetangga di unit lain
+            unit = self.nodes[u]['unit']; external = sum(counts.values()) - counts.get(unit, 0)
+            self.unit_external[unit] += external; self.cross_unit_edges += external
+        self.cross_unit_edges //= 2
+        self.unit_silos = sum(1 for unit, members in self.unit_members.items() if members and not self.unit_external[unit])
+        self.unit_nodes, self.unit_score, self.unit_internal, self.unit_links = {}, {}, {}, {} # Agregat supergraf unit (level-of-detail), diperbarui per pemindahan
+        for u, data in self.nodes.items():
+            unit = data['unit']; self.unit_nodes.setdefault(unit, {})[u] = None; self.unit_score[unit] = self.unit_score.get(unit, 0.0) + data['score']
+            for other, count in self.neighbour_units[u].items(): self._add_unit_link(unit, other, count)
+        self.unit_internal = {unit: count // 2 for unit, count in self.unit_internal.items()} # Tiap edge terhitung dari kedua ujungnya
+        self.unit_links = {pair: count // 2 for pair, count in self.unit_links.items()}; self._edge_index = None; self._network_metrics = None
+
+    def _build(self, pegawai_list, kolaborasi_list):
+        self.nodes = {}; self.adj = {}; edge_labels = {}
+        for p in pegawai_list: # Urutan dan semantik atribut mengikuti nx.Graph (id ganda: atribut ditimpa, posisi tetap)
+            potensi = p.get('skor_potensi', 50); kinerja = p.get('skor_kinerja', 50)
+            self.nodes[p['id']] = {"label": p.get('nama','N/A'), "unit": p.get('unit','N/A'), "jabatan": p.get('jabatan','N/A'), "score": (kinerja * 0.6) + (potensi * 0.4)}
+            self.adj.setdefault(p['id'], {})
+        for k in kolaborasi_list:
+            source, target = k.get('source'), k.get('target')
+            if source in self.nodes and target in self.nodes:
+                self.adj[source][target] = None; self.adj[target][source] = None
+                edge_labels[(source, target) if (target, source) not in edge_labels else (target, source)] = k.get('project','')
+        n = len(self.nodes)
+        degree = {u: len(nbrs) + (1 if u in nbrs else 0) for u, nbrs in self.adj.items()} # Self-loop dihitung 2 seperti networkx
+        scale = 1.0 / (n - 1) if n > 1 else None # nx.degree_centrality mengalikan dengan 1/(n-1); urutan operasi float disamakan
+        centrality = {u: 1 for u in self.nodes} if n <= 1 else {u: d * scale for u, d in degree.items()}
+        self.total_effectiveness = sum((data['score'] * (1 + centrality.get(u, 0))) for u, data in self.nodes.items())
+        self.num_silos = self._count_components()
+        self._edge_views = []; seen = set()
+        for u, nbrs in self.adj.items(): # Urutan edge = urutan G.edges() networkx
+            for v in nbrs:
+                if v in seen: continue
+                self._edge_views.append({"id": f"e-{u}-{v}", "source": u, "target": v, "label": edge_labels.get((u, v), edge_labels.get((v, u), '')), "animated": True})
+            seen.add(u)
+        self.num_edges = len(self._edge_views)
+
+    def _build_sparse(self, graph, kolaborasi_list):
+        """Graf besar: skor, sentralitas & komponen dari SparseGraph (vektor); adjacency per node diambil dari CSR simetris untuk delta pemindahan."""
+        ids = graph.ids
+        self.nodes = {node_id: {"label": label, "unit": unit, "jabatan": jabatan, "score": score} for node_id, label, unit, jabatan, score in zip(ids, graph.labels, graph.units, graph.jabatan, graph.score.tolist())}
+        self.total_effectiveness = graph.total_effectiveness(); self.num_silos = graph.num_silos()
+        symmetric = (graph.adjacency + graph.adjacency.T).tocsr()
+        indptr, indices = symmetric.indptr.tolist(), symmetric.indices.tolist()
+        self.adj = {node_id: dict.fromkeys([ids[j] for j in indices[indptr[i]:indptr[i + 1]]]) for i, node_id in enumerate(ids)}
+        self.num_edges = graph.num_edges; self._edge_views = None; self._sparse_source = (graph, kolaborasi_list)
+
+    @property
+    def node_views(self):
+        if self._node_views is None: self._node_views = {u: self._node_view(u) for u in self.nodes}
+        return self._node_views
+
+    def _node_view(self, node_id):
+        data = self.nodes[node_id]; view = _reactflow_node(node_id, data['label'], data['unit'], data['score'])
+        if self.positions is not None:
+            x, y = self.positions[self.node_index[node_id]]
+            view["position"] = {"x": round(float(x) * self.layout_scale, 1), "y": round(float(y) * self.layout_scale, 1)}
+        return view
+
+    @property
+    def node_index(self):
+        if self._node_index is None: self._node_index = {u: i for i, u in enumerate(self.nodes)}
+        return self._node_index
+
+    def _layout_key(self, mode, unit_codes):
+        if self._layout_edges is None: # Edge tidak berubah selama umur graf: indeks & digest dihitung sekali
+            index = self.node_index; pairs = [(index[u], index[v]) for u, nbrs in self.adj.items() for v in nbrs if index[u] < index[v]]
+            edge_u = np.array([a for a, _ in pairs], dtype=np.int64); edge_v = np.array([b for _, b in pairs], dtype=np.int64)
+            self._layout_edges = (edge_u, edge_v, hashlib.sha256(edge_u.tobytes() + edge_v.tobytes()).hexdigest())
+        digest = hashlib.sha256(f"{mode}|{self._layout_edges[2]}|".encode('utf-8'))
+        digest.update(repr([(u, data['unit']) for u, data in self.nodes.items()]).encode('utf-8'))
+        return digest.hexdigest()
+
+    def layout(self, mode):
+        """Hitung/ambil posisi node. Cache per hash node+unit+edge; setelah pemindahan, hanya node yang pindah & tetangganya yang dilepas (warm start)."""
+        started = time.perf_counter(); unit_names = {}
+        unit_codes = np.fromiter((unit_names.setdefault(data['unit'], len(unit_names)) for data in self.nodes.values()), dtype=np.int64, count=len(self.nodes))
+        key = self._layout_key(mode, unit_codes); cached = graph_layout_cache.get(key); scale = self.layout_scale
+        if cached is not None: status = 'hit'; positions, scale = cached
+        elif self.positions is not None and self.layout_mode == mode and self.layout_dirty:
+            status = 'warm'; positions = self.positions.astype(np.float64) # Skala px lama dipertahankan agar node lain tidak bergeser
+            index = self.node_index; moved = np.array([index[u] for u in self.layout_dirty], dtype=np.int64)
+            sizes = np.bincount(unit_codes, minlength=len(unit_names)); others = np.ones(len(unit_codes), dtype=bool); others[moved] = False
+            centers = np.column_stack((np.bincount(unit_codes[others], positions[others, 0], len(unit_names)), np.bincount(unit_codes[others], positions[others, 1], len(unit_names))))
+            counts = np.bincount(unit_codes[others], minlength=len(unit_names))
+            for i in moved.tolist(): # Node yang pindah mulai dari tepi cluster unit tujuan (unit baru: di kanan bounding box)
+                unit = unit_codes[i]
+                center = centers[unit] / counts[unit] if counts[unit] else np.array([positions[:, 0].max() + 3.0, positions[:, 1].mean()])
+                positions[i] = center + sunflower_offsets(np.array([float(sizes[unit] - 1)]))[0]
+            if mode == 'force':
+                movable = np.zeros(len(unit_codes), dtype=bool); movable[moved] = True
+                for u in self.layout_dirty: movable[[index[v] for v in self.adj[u]]] = True
+                positions = force_layout(positions, *self._layout_edges[:2], unit_codes, len(unit_names), movable, NAKHODA_LAYOUT_WARM_ITERATIONS, 1.0)
+        else:
+            status = 'full'; positions = unit_cluster_layout(unit_codes, len(unit_names))
+            if mode == 'force':
+                positions = force_layout(positions, *self._layout_edges[:2], unit_codes, len(unit_names), np.ones(len(unit_codes), dtype=bool), NAKHODA_LAYOUT_ITERATIONS, max(math.sqrt(len(unit_codes)) / 4, 1.0))
+        if status == 'full': positions = positions - positions.min(0); scale = layout_pixel_scale(positions)
+        if status != 'hit':
+            positions = positions.astype(np.float32); graph_layout_cache.put(key, (positions, scale), warm=(status == 'warm'))
+        changed = self.layout_dirty if status == 'warm' and self.positions is not None else None
+        self.positions, self.layout_scale, self.layout_mode = positions, scale, mode; self.layout_dirty = set()
+        if self._node_views is not None: # View diganti (bukan diubah) agar snapshot yang sedang diserialisasi tetap konsisten
+            if changed is not None and status == 'warm' and mode == 'unit': self._node_views.update({u: self._node_view(u) for u in changed})
+            else: self._node_views = {u: self._node_view(u) for u in self.nodes}
+        return {"mode": mode, "status": status, "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    @property
+    def edge_views(self):
+        if self._edge_views is None: self._edge_views = sparse_edge_views(*self._sparse_source); self._sparse_source = None
+        return self._edge_views
+
+    def _count_components(self):
+        seen, count = set(), 0
+        for start in self.nodes:
+            if start in seen: continue
+            count += 1; stack = [start]; seen.add(start)
+            while stack:
+                for v in self.adj[stack.pop()]:
+                    if v not in seen: seen.add(v); stack.append(v)
+        return count
+
+    def _add_unit_link(self, unit, other, count):
+        if unit == other: self.unit_internal[unit] = self.unit_internal.get(unit, 0) + count; return
+        pair = _unit_pair(unit, other); self.unit_links[pair] = self.unit_links.get(pair, 0) + count
+        if not self.unit_links[pair]: del self.unit_links[pair]
+
+    def _move_delta(self, node_id, target_unit):
+        """Perubahan (kolaborasi lintas unit, edge eksternal per unit, anggota per unit) bila node_id pindah ke target_unit.
+        Hanya unit lama & unit tujuan yang berubah: edge ke unit lain tetap lintas unit sebelum maupun sesudah pindah."""
+        old_unit = self.nodes[node_id]['unit']; counts = self.neighbour_units[node_id]
+        degree = sum(counts.values()); in_old, in_target = counts.get(old_unit, 0), counts.get(target_unit, 0)
+        external_delta = {old_unit: in_old - (degree - in_old), target_unit: (degree - in_target) - in_target}
+        return in_old - in_target, external_delta, {old_unit: -1, target_unit: 1}
+
+    def _silo_delta(self, external_delta, member_delta):
+        delta = 0
+        for unit in set(external_delta) | set(member_delta):
+            members, external = self.unit_members.get(unit, 0), self.unit_external.get(unit, 0)
+            before = bool(members) and not external
+            after = bool(members + member_delta.get(unit, 0)) and not (external + external_delta.get(unit, 0))
+            delta += after - before
+        return delta
+
+    def impact(self, node_id, target_unit):
+        """(dampak efektivitas, delta kolaborasi lintas unit, delta unit terisolasi) tanpa mengubah graf.
+        Skor & sentralitas tidak bergantung unit, jadi dampak efektivitas selalu 0; pembeda skenario ada di metrik lintas unit."""
+        if node_id not in self.nodes or self.nodes[node_id]['unit'] == target_unit: return 0.0, 0, 0
+        cross_delta, external_delta, member_delta = self._move_delta(node_id, target_unit)
+        return 0.0, cross_delta, self._silo_delta(external_delta, member_delta)
+
+    def evaluate_move(self, node_id, target_unit):
+        effectiveness_impact, cross_delta, silos_delta = self.impact(node_id, target_unit)
+        return {"effectiveness_impact": effectiveness_impact, "cross_unit_delta": cross_delta, "unit_silos_delta": silos_delta}
+
+    def move(self, node_id, target_unit):
+        """Terapkan pemindahan sebagai delta; hanya view node tersebut yang dibangun ulang. Mengembalikan unit lama (None bila node tidak ada)."""
+        if node_id not in self.nodes: return None
+        data = self.nodes[node_id]; old_unit = data['unit']
+        if old_unit == target_unit: return old_unit
+        cross_delta, external_delta, member_delta = self._move_delta(node_id, target_unit)
+        self.unit_silos += self._silo_delta(external_delta, member_delta); self.cross_unit_edges += cross_delta
+        for unit, change in external_delta.items(): self.unit_external[unit] = self.unit_external.get(unit, 0) + change
+        for unit, change in member_delta.items(): self.unit_members[unit] = self.unit_members.get(unit, 0) + change
+        for v in self.adj[node_id]:
+            if v == node_id: continue
+            counts = self.neighbour_units[v]; counts[old_unit] -= 1; counts[target_unit] = counts.get(target_unit, 0) + 1
+            if not counts[old_unit]: del counts[old_unit]
+        for other, count in self.neighbour_units[node_id].items(): self._add_unit_link(old_unit, other, -count); self._add_unit_link(target_unit, other, count)
+        del self.unit_nodes[old_unit][node_id]; self.unit_nodes.setdefault(target_unit, {})[node_id] = None
+        self.unit_score[old_unit] -= data['score']; self.unit_score[target_unit] = self.unit_score.get(target_unit, 0.0) + data['score']
+        data['unit'] = target_unit
+        if self.positions is not None: self.layout_dirty.add(node_id)
+        if self._node_views is not None: self._node_views[node_id] = self._node_view(node_id)
+        return old_unit
+
+    def sync_units(self, pegawai_list):
+        """Samakan unit dengan daftar pegawai dari klien (hanya yang berubah yang diproses)."""
+        moved = 0
+        for p in pegawai_list:
+            if p['id'] in self.nodes and self.nodes[p['id']]['unit'] != p.get('unit','N/A'): self.move(p['id'], p.get('unit','N/A')); moved += 1
+        return moved
+
+    def metrics(self):
+        n = len(self.nodes)
+        if not n: return {"total_pegawai": 0, "total_kolaborasi": 0, "avg_effectiveness": 0, "num_silos": 0, "cross_unit_collaboration": 0, "unit_silos": 0}
+        return {"total_pegawai": n, "total_kolaborasi": self.num_edges, "avg_effectiveness": self.total_effectiveness / n, "num_silos": self.num_silos,
+                "cross_unit_collaboration": self.cross_unit_edges, "unit_silos": self.unit_silos}
+
+    def to_reactflow(self, layout='none'):
+        if not self.nodes: return {"nodes": [], "edges": [], "metrics": self.metrics()}
+        mode = resolve_layout_mode(layout, len(self.nodes)); layout_info = self.layout(mode) if mode else None
+        result = {"nodes": [self.node_views[u] for u in self.nodes], "edges": list(self.edge_views), "metrics": self.metrics()}
+        if layout_info: result["layout"] = layout_info
+        return result
+
+    def advanced_metrics(self, budget_ms=None, samples=None, top=10):
+        """Metrik jaringan lanjutan; status sampling disimpan di graf ini (struktur tetap), unit dibaca saat ini."""
+        if self._network_metrics is None:
+            index = self.node_index; indices = [index[v] for u in self.nodes for v in self.adj[u] if v != u]
+            indptr = [0] + list(itertools.accumulate(sum(1 for v in self.adj[u] if v != u) for u in self.nodes))
+            self._network_metrics = NetworkMetrics(indptr, indices)
+        ids = list(self.nodes); nodes = self.nodes.values()
+        return network_metrics_report(self._network_metrics, ids, [data['label'] for data in nodes], [data['unit'] for data in nodes],
+                                      NAKHODA_METRICS_BUDGET_MS if budget_ms is None else budget_ms, NAKHODA_BETWEENNESS_SAMPLES if samples is None else samples, top)
+
+    def _view(self, node_id):
+        return self._node_views[node_id] if self._node_views is not None else self._node_view(node_id) # Tanpa membangun view semua node
+
+    def _edge_view(self, u, v):
+        if self._edge_index is None: self._edge_index = {(e['source'], e['target']): e for e in self.edge_views}
+        return self._edge_index.get((u, v)) or self._edge_index[(v, u)]
+
+    def _unit_view(self, unit, centers):
+        members = len(self.unit_nodes[unit]); avg_score = self.unit_score[unit] / members
+        view = _reactflow_node(_unit_node_id(unit), unit, f"{members} pegawai", avg_score)
+        view["data"].update({"unit": unit, "members": members, "avg_score": round(avg_score, 2), "internal_collaboration": self.unit_internal.get(unit, 0), "external_collaboration": self.unit_external.get(unit, 0)})
+        if unit in centers: view["position"] = {"x": round(float(centers[unit][0]), 1), "y": round(float(centers[unit][1]), 1)}
+        return view
+
+    def _unit_centers(self):
+        """Pusat (px) anggota tiap unit pada layout saat ini, agar drill-down muncul di tempat node unitnya."""
+        if self.positions is None: return {}
+        index = self.node_index
+        return {unit: self.positions[np.fromiter((index[u] for u in members), dtype=np.int64, count=len(members))].mean(0) * self.layout_scale for unit, members in self.unit_nodes.items() if members}
+
+    def to_units(self, layout='none', min_weight=1, max_edges=None):
+        """Level ringkas: satu node per unit (jumlah anggota, skor rata-rata) + edge antar unit berbobot jumlah kolaborasi (paling berat max_edges).
+        Ukuran respons ~ jumlah unit, bukan jumlah pegawai."""
+        mode = resolve_layout_mode(layout, len(self.nodes)) if self.nodes else None; layout_info = self.layout(mode) if mode else None
+        centers = self._unit_centers(); links = [(pair, weight) for pair, weight in self.unit_links.items() if weight >= min_weight]; total_edges = len(links)
+        if max_edges is not None and len(links) > max_edges: links = heapq.nlargest(max_edges, links, key=lambda e: e[1])
+        result = {"level": "units", "nodes": [self._unit_view(unit, centers) for unit, members in self.unit_nodes.items() if members],
+                  "edges": [_unit_edge_view(f"u-{a}-{b}", _unit_node_id(a), _unit_node_id(b), weight) for (a, b), weight in links],
+                  "edges_total": total_edges, "metrics": self.metrics()}
+        if layout_info: result["layout"] = layout_info
+        return result
+
+    def drilldown(self, unit, include_neighbors=False, offset=0, limit=200, layout='none'):
+        """Level detail: anggota unit (opsional + unit tetangganya, urut bobot kolaborasi) per halaman. Edge antar pegawai di halaman dikirim apa adanya;
+        edge ke pegawai di luar halaman diringkas menjadi edge ke node unitnya, sehingga ukuran respons ~ limit. None bila unit tidak ada."""
+        if not self.unit_nodes.get(unit): return None
+        units = [unit]
+        if include_neighbors:
+            neighbours = [(b if a == unit else a, weight) for (a, b), weight in self.unit_links.items() if a == unit or b == unit]
+            units += [other for other, _ in sorted(neighbours, key=lambda e: -e[1]) if self.unit_nodes.get(other)]
+        mode = resolve_layout_mode(layout, len(self.nodes)); layout_info = self.layout(mode) if mode else None
+        total = sum(len(self.unit_nodes[u]) for u in units)
+        page = list(itertools.islice(itertools.chain.from_iterable(self.unit_nodes[u] for u in units), offset, offset + limit)); on_page = set(page)
+        edges, outside, seen = [], {}, set()
+        for u in page: # Urutan edge mengikuti urutan halaman, tiap pasangan sekali (seperti edge_views)
+            for v in self.adj[u]:
+                if v in on_page:
+                    if v not in seen: edges.append(self._edge_view(u, v))
+                else: key = (u, self.nodes[v]['unit']); outside[key] = outside.get(key, 0) + 1
+            seen.add(u)
+        centers = self._unit_centers(); stub_units = dict.fromkeys(other for _, other in outside)
+        edges += [_unit_edge_view(f"x-{u}-{other}", u, _unit_node_id(other), weight) for (u, other), weight in outside.items()]
+        next_offset = offset + len(page) if offset + len(page) < total else None
+        result = {"level": "members", "unit": unit, "units": units, "nodes": [self._view(u) for u in page] + [self._unit_view(other, centers) for other in stub_units],
+                  "edges": edges, "offset": offset, "limit": limit, "total": total, "next_offset": next_offset, "has_more": next_offset is not None, "metrics": self.metrics()}
+        if layout_info: result["layout"] = layout_info
+        return result
+
+ORG_GRAPH_CACHE_SIZE = int(os.getenv('ORG_GRAPH_CACHE_SIZE', '16'))
+
+class OrgGraphStore:
+    """LRU graf organisasi. Kunci = hash struktur (pegawai tanpa 'unit' + kolaborasi), sehingga daftar yang hanya berbeda unit (hasil simulasi sebelumnya) memakai graf yang sama lewat delta."""
+
+    def __init__(self, max_graphs):
+        self.max_graphs = max_graphs; self.graphs = OrderedDict(); self.lock = threading.Lock()
+        self.hits = self.misses = self.synced_moves = 0
+
+    @staticmethod
+    def structure_key(pegawai_list, kolaborasi_list):
+        """Hanya atribut yang dipakai graf (tanpa unit)."""
+        structure = repr(([(p['id'], p.get('nama'), p.get('jabatan'), p.get('skor_potensi'), p.get('skor_kinerja')) for p in pegawai_list],
+                          [(k.get('source'), k.get('target'), k.get('project')) for k in kolaborasi_list]))
+        return hashlib.sha256(structure.encode('utf-8')).hexdigest()[:16]
+
+    def get(self, pegawai_list, kolaborasi_list):
+        """Graf untuk daftar ini (unit sudah disinkronkan); mengembalikan (graph_id, graph). Panggil sync di bawah graph.lock."""
+        graph_id = self.structure_key(pegawai_list, kolaborasi_list)
+        with self.lock:
+            graph = self.graphs.get(graph_id)
+            if graph is not None: self.graphs.move_to_end(graph_id); self.hits += 1
+        if graph is None:
+            graph = OrgGraph(pegawai_list, kolaborasi_list)
+            with self.lock:
+                self.misses += 1; graph = self.graphs.setdefault(graph_id, graph); self.graphs.move_to_end(graph_id)
+                while len(self.graphs) > self.max_graphs: self.graphs.popitem(last=False)
+        with graph.lock:
+            moved = graph.sync_units(pegawai_list)
+        if moved:
+            with self.lock: self.synced_moves += moved
+        return graph_id, graph
+
+    def by_id(self, graph_id):
+        with self.lock:
+            graph = self.graphs.get(graph_id)
+            if graph is not None: self.graphs.move_to_end(graph_id); self.hits += 1
+            return graph
+
+    def stats(self):
+        with self.lock:
+            return {"graphs": len(self.graphs), "max_graphs": self.max_graphs, "hits": self.hits, "misses": self.misses, "synced_moves": self.synced_moves}
+
+org_graph_store = OrgGraphStore(ORG_GRAPH_CACHE_SIZE)
+
+def load_dummy_graph_data():
     try:
-        with open('dummy_data_v2.json', 'r') as f: data = json.load(f)
+        with open('dummy_data_v2.json', 'r') as f: return json.load(f)
     except FileNotFoundError:
         app.logger.warning("dummy_data_v2.json tidak ada! Membuat baru...")
         new_dummy_data={"pegawai": [{"id": "1", "nama": "Anya", "unit": "A", "skor_potensi": 90, "skor_kinerja": 95}, {"id": "2", "nama": "Budi", "unit": "A", "skor_potensi": 95, "skor_kinerja": 70}, {"id": "3", "nama": "Citra", "unit": "SDM", "skor_potensi": 80, "skor_kinerja": 85}], "kolaborasi": [{"source": "1", "target": "2"}, {"source": "1", "target": "3"}, {"source": "2", "target": "3"}]}
         with open('dummy_data_v2.json', 'w') as f: json.dump(new_dummy_data, f, indent=2)
-        data = new_dummy_data
-    result = analyze_graph(data['pegawai'], data['kolaborasi'])
-    return jsonify(result)
+        return new_dummy_data
+
+# --- Penyimpanan Graf Organisasi (SQLite, impor streaming CSV/NDJSON, cache per versi dataset) ---
+ORG_DEFAULT_DATASET = 'default' # Diisi dari dummy_data_v2.json saat pertama kali diminta
+ORG_IMPORT_BATCH = int(os.getenv('ORG_IMPORT_BATCH', '5000')); ORG_IMPORT_MAX_MB = float(os.getenv('ORG_IMPORT_MAX_MB', '512'))
+ORG_EMPLOYEE_FIELDS = ('nama', 'unit', 'jabatan', 'skor_potensi', 'skor_kinerja')
+ORG_EMPLOYEE_UPSERT = """INSERT INTO org_employee (dataset, employee_id, nama, unit, jabatan, skor_potensi, skor_kinerja) {source}
+    ON CONFLICT (dataset, employee_id) DO UPDATE SET nama = excluded.nama, unit = excluded.unit, jabatan = excluded.jabatan,
+    skor_potensi = excluded.skor_potensi, skor_kinerja = excluded.skor_kinerja""" # id ganda: atribut ditimpa, urutan tetap (seperti nx.Graph.add_node)
+ORG_IMPORT_SQL = {'pegawai': ORG_EMPLOYEE_UPSERT.format(source="VALUES (:dataset, :employee_id, :nama, :unit, :jabatan, :skor_potensi, :skor_kinerja)"),
+                  'kolaborasi': "INSERT INTO org_collaboration (dataset, source, target, project) VALUES (:dataset, :source, :target, :project)"}
+ORG_IMPORT_TABLES = {'pegawai': 'org_employee', 'kolaborasi': 'org_collaboration'}
+
+def _org_text(value): return None if value in (None, '') else str(value)
+
+def _org_score(value):
+    if value in (None, ''): return None
+    try: return float(value)
+    except (TypeError, ValueError): raise ValueError(f"skor tidak valid: {value!r}")
+
+def _org_employee_row(dataset, record):
+    if _org_text(record.get('id')) is None: return None
+    return {"dataset": dataset, "employee_id": str(record['id']), "nama": _org_text(record.get('nama')), "unit": _org_text(record.get('unit')), "jabatan": _org_text(record.get('jabatan')),
+            "skor_potensi": _org_score(record.get('skor_potensi')), "skor_kinerja": _org_score(record.get('skor_kinerja'))}
+
+def _org_collaboration_row(dataset, record):
+    source, target = _org_text(record.get('source')), _org_text(record.get('target'))
+    if source is None or target is None: return None
+    return {"dataset": dataset, "source": source, "target": target, "project": _org_text(record.get('project'))}
+
+ORG_ROW_BUILDERS = {'pegawai': _org_employee_row, 'kolaborasi': _org_collaboration_row}
+
+def iter_org_records(stream, fmt):
+    """Baris CSV (dengan header) / NDJSON dari stream biner satu per satu, tanpa memuat seluruh file ke memori."""
+    text = TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        yield from csv.DictReader(text); return
+    for line_no, line in enumerate(text, 1):
+        line = line.strip()
+        if not line: continue
+        try: record = json.loads(line)
+        except json.JSONDecodeError as e: raise ValueError(f"NDJSON baris {line_no} tidak valid: {e.msg}")
+        if not isinstance(record, dict): raise ValueError(f"NDJSON baris {line_no} harus berupa objek JSON")
+        yield record
+
+def org_import_format(filename, declared=None):
+    fmt = (declared or '').lower() or os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if fmt in ('csv',): return 'csv'
+    if fmt in ('ndjson', 'jsonl', 'json', 'x-ndjson'): return 'ndjson'
+    raise ValueError(f"Format impor tidak dikenali: '{fmt or filename}' (gunakan CSV atau NDJSON)")
+
+def import_org_dataset(dataset, sources, replace=True):
+    """Impor [(jenis, iterator record)] ke dataset. Baris ditulis per batch ke dataset staging (commit per batch, lock tulis singkat),
+    lalu ditukar ke dataset tujuan dalam satu transaksi pendek + versi dinaikkan. Pembaca tidak pernah melihat data setengah jadi.
+    Mengembalikan {jenis: {"imported", "skipped"}}."""
+    staging = f"{ORG_STAGING_PREFIX}{uuid.uuid4().hex}"; summary = {}
+    try:
+        for kind, records in sources:
+            statement, to_row = db.text(ORG_IMPORT_SQL[kind]), ORG_ROW_BUILDERS[kind]; batch = []; imported = skipped = 0
+            for position, record in enumerate(records, 1):
+                try: row = to_row(staging, record)
+                except ValueError as e: raise ValueError(f"{kind} baris {position}: {e}")
+                if row is None: skipped += 1; continue
+                batch.append(row)
+                if len(batch) >= ORG_IMPORT_BATCH: db.session.execute(statement, batch); db.session.commit(); imported += len(batch); batch = []
+            if batch: db.session.execute(statement, batch); db.session.commit(); imported += len(batch)
+            summary[kind] = {"imported": imported, "skipped": skipped}
+        params = {"dataset": dataset, "staging": staging}
+        for kind in summary:
+            table = ORG_IMPORT_TABLES[kind]
+            if replace: db.session.execute(db.text(f"DELETE FROM {table} WHERE dataset = :dataset"), params)
+            if kind == 'pegawai' and not replace: # Tambah: pegawai yang sudah ada diperbarui di tempat
+                db.session.execute(db.text(ORG_EMPLOYEE_UPSERT.format(source="SELECT :dataset, employee_id, nama, unit, jabatan, skor_potensi, skor_kinerja FROM org_employee WHERE dataset = :staging ORDER BY seq")), params)
+                db.session.execute(db.text("DELETE FROM org_employee WHERE dataset = :staging"), params)
+            else: db.session.execute(db.text(f"UPDATE {table} SET dataset = :dataset WHERE dataset = :staging"), params)
+        db.session.execute(db.text("""INSERT INTO org_dataset (name, version, updated_at) VALUES (:dataset, 1, :now)
+            ON CONFLICT (name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at"""), {**params, "now": datetime.datetime.utcnow()})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        for table in ORG_IMPORT_TABLES.values(): db.session.execute(db.text(f"DELETE FROM {table} WHERE dataset = :staging"), {"staging": staging})
+        db.session.commit(); raise
+    org_dataset_cache.invalidate(dataset)
+    return summary
+
+def delete_org_dataset(dataset):
+    deleted = db.session.execute(db.text("DELETE FROM org_dataset WHERE name = :dataset"), {"dataset": dataset}).rowcount
+    for table in ORG_IMPORT_TABLES.values(): db.session.execute(db.text(f"DELETE FROM {table} WHERE dataset = :dataset"), {"dataset": dataset})
+    db.session.commit(); org_dataset_cache.invalidate(dataset)
+    return bool(deleted)
+
+def org_dataset_version(dataset):
+    return db.session.execute(db.text("SELECT version FROM org_dataset WHERE name = :dataset"), {"dataset": dataset}).scalar()
+
+def load_org_dataset(dataset):
+    """(pegawai_list, kolaborasi_list) dari DB sesuai urutan impor; kolom kosong dihilangkan agar default OrgGraph ('N/A', skor 50) berlaku."""
+    pegawai_list = []
+    for row in db.session.execute(db.text("SELECT employee_id, nama, unit, jabatan, skor_potensi, skor_kinerja FROM org_employee WHERE dataset = :dataset ORDER BY seq"), {"dataset": dataset}):
+        record = {"id": row[0]}; record.update((key, value) for key, value in zip(ORG_EMPLOYEE_FIELDS, row[1:]) if value is not None); pegawai_list.append(record)
+    kolaborasi_list = [{"source": source, "target": target, **({"project": project} if project is not None else {})}
+                       for source, target, project in db.session.execute(db.text("SELECT source, target, project FROM org_collaboration WHERE dataset = :dataset ORDER BY seq"), {"dataset": dataset})]
+    return pegawai_list, kolaborasi_list
+
+class OrgDatasetCache:
+    """Graf per dataset tersimpan: dimuat dari DB sekali per versi lalu dipakai ulang dari org_graph_store.
+    Tiap permintaan hanya membaca versi (lookup primary key); versi berubah (impor/hapus, juga dari proses lain) = muat ulang."""
+
+    def __init__(self):
+        self.entries = {}; self.lock = threading.Lock(); self.hits = self.loads = self.invalidations = 0
+
+    def get(self, dataset):
+        """(graph_id, graph) dengan unit sesuai data tersimpan (hasil simulate-move sebelumnya dibatalkan), atau None bila dataset tidak ada."""
+        version = org_dataset_version(dataset)
+        if version is None and dataset == ORG_DEFAULT_DATASET:
+            data = load_dummy_graph_data(); import_org_dataset(dataset, [('pegawai', data['pegawai']), ('kolaborasi', data['kolaborasi'])])
+            app.logger.info("Modul NAKHODA: dataset 'default' diisi dari dummy_data_v2.json."); version = org_dataset_version(dataset)
+        if version is None: return None
+        with self.lock: entry = self.entries.get(dataset)
+        graph = org_graph_store.by_id(entry[1]) if entry and entry[0] == version else None
+        if graph is not None:
+            with graph.lock: graph.sync_units(entry[2])
+            with self.lock: self.hits += 1
+            return entry[1], graph
+        pegawai_list, kolaborasi_list = load_org_dataset(dataset)
+        graph_id, graph = org_graph_store.get(pegawai_list, kolaborasi_list)
+        with self.lock: self.entries[dataset] = (version, graph_id, pegawai_list); self.loads += 1
+        return graph_id, graph
+
+    def invalidate(self, dataset):
+        with self.lock:
+            if self.entries.pop(dataset, None) is not None: self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            return {"datasets": len(self.entries), "hits": self.hits, "loads": self.loads, "invalidations": self.invalidations}
+
+org_dataset_cache = OrgDatasetCache()
+
+def resolve_org_graph(payload):
+    """Graf dari 'graphId' (hasil get-graph/load-custom-graph) bila masih di cache, selain itu dari pegawaiList/kolaborasiList (atau dataset tersimpan)."""
+    graph_id = payload.get('graphId')
+    if graph_id:
+        graph = org_graph_store.by_id(graph_id)
+        if graph is not None:
+            if payload.get('pegawaiList'):
+                with graph.lock: graph.sync_units(payload['pegawaiList'])
+            return graph_id, graph
+    pegawai_list, kolaborasi_list = payload.get('pegawaiList', []), payload.get('kolaborasiList', [])
+    if not pegawai_list:
+        dataset = payload.get('dataset') or ORG_DEFAULT_DATASET; resolved = org_dataset_cache.get(dataset)
+        if resolved is None: raise ValueError(f"Dataset '{dataset}' tidak ditemukan")
+        return resolved
+    return org_graph_store.get(pegawai_list, kolaborasi_list)
+
+NAKHODA_JSON_MAX_MB = float(os.getenv('NAKHODA_JSON_MAX_MB', '20')) # Body pegawaiList/kolaborasiList organisasi besar; sama dengan batas gateway
+NAKHODA_DRILLDOWN_MAX_NODES = int(os.getenv('NAKHODA_DRILLDOWN_MAX_NODES', '1000'))
+NAKHODA_UNIT_EDGE_LIMIT = int(os.getenv('NAKHODA_UNIT_EDGE_LIMIT', '2000')) # Edge antar unit terberat yang dikirim di level ringkas
+GRAPH_VIEWS = ('full', 'units') # full = semua pegawai (perilaku lama), units = supergraf unit untuk organisasi besar
+
+def advanced_metrics_args(source, enabled_key):
+    """Opsi metrik lanjutan dari query/body: None bila tidak diminta; ValueError bila angka tidak valid."""
+    if str(source.get(enabled_key, '')).lower() not in ('1', 'true', 'yes'): return None
+    try:
+        budget_ms = min(max(int(source.get('budgetMs', NAKHODA_METRICS_BUDGET_MS)), 0), NAKHODA_METRICS_MAX_BUDGET_MS)
+        samples = max(int(source.get('samples', NAKHODA_BETWEENNESS_SAMPLES)), 1); top = min(max(int(source.get('top', 10)), 1), 100)
+    except (TypeError, ValueError): raise ValueError("'budgetMs', 'samples' dan 'top' harus berupa angka")
+    return {"budget_ms": budget_ms, "samples": samples, "top": top}
+
+@app.route('/api/nakhoda/get-graph', methods=['GET'])
+def get_graph():
+    dataset = request.args.get('dataset', ORG_DEFAULT_DATASET)
+    app.logger.info(f"Modul NAKHODA: Mengambil graf dataset '{dataset}'.")
+    layout, view = request.args.get('layout', 'auto'), request.args.get('view', 'full')
+    if layout not in LAYOUT_MODES: return jsonify({"error": f"layout harus salah satu dari: {', '.join(LAYOUT_MODES)}"}), 400
+    if view not in GRAPH_VIEWS: return jsonify({"error": f"view harus salah satu dari: {', '.join(GRAPH_VIEWS)}"}), 400
+    try: advanced = advanced_metrics_args(request.args, 'advanced')
+    except ValueError as e: return jsonify({"error": str(e)}), 400
+    resolved = org_dataset_cache.get(dataset)
+    if resolved is None: return jsonify({"error": f"Dataset '{dataset}' tidak ditemukan"}), 404
+    graph_id, graph = resolved
+    with graph.lock:
+        result = graph.to_units(layout, max_edges=NAKHODA_UNIT_EDGE_LIMIT) if view == 'units' else graph.to_reactflow(layout)
+        if advanced is not None and graph.nodes: result["metrics"]["advanced"] = graph.advanced_metrics(**advanced)
+    return jsonify({**result, "graph_id": graph_id})
 
 @app.route('/api/nakhoda/load-custom-graph', methods=['POST'])
 def load_custom_graph():
+    request.max_content_length = int(NAKHODA_JSON_MAX_MB * 1024 * 1024)
     data = request.json
-    pegawai_json_text, kolaborasi_json_text = data.get('pegawaiData'), data.get('kolaborasiData')
+    pegawai_data, kolaborasi_data = data.get('pegawaiData'), data.get('kolaborasiData')
     app.logger.info("Modul NAKHODA: Menerima data graf kustom.")
+    layout, view = data.get('layout', 'auto'), data.get('view', 'full')
+    if layout not in LAYOUT_MODES: return jsonify({"error": f"layout harus salah satu dari: {', '.join(LAYOUT_MODES)}"}), 400
+    if view not in GRAPH_VIEWS: return jsonify({"error": f"view harus salah satu dari: {', '.join(GRAPH_VIEWS)}"}), 400
+    try: advanced = advanced_metrics_args(data, 'advanced')
+    except ValueError as e: return jsonify({"error": str(e)}), 400
     try:
-        pegawai_list, kolaborasi_list = json.loads(pegawai_json_text), json.loads(kolaborasi_json_text)
-        result = analyze_graph(pegawai_list, kolaborasi_list)
-        return jsonify(result)
+        # Array JSON langsung (tanpa parse ganda); string JSON tetap diterima untuk klien lama
+        pegawai_list = json.loads(pegawai_data) if isinstance(pegawai_data, str) else pegawai_data
+        kolaborasi_list = json.loads(kolaborasi_data) if isinstance(kolaborasi_data, str) else (kolaborasi_data or [])
+        if not isinstance(pegawai_list, list) or not isinstance(kolaborasi_list, list): return jsonify({"error": "pegawaiData dan kolaborasiData harus berupa array"}), 400
+        graph_id, graph = org_graph_store.get(pegawai_list, kolaborasi_list)
+        with graph.lock:
+            result = graph.to_units(layout, max_edges=NAKHODA_UNIT_EDGE_LIMIT) if view == 'units' else graph.to_reactflow(layout)
+            if advanced is not None and graph.nodes: result["metrics"]["advanced"] = graph.advanced_metrics(**advanced)
+        return jsonify({**result, "graph_id": graph_id})
     except Exception as e: return jsonify({"error": str(e)}), 400
 
 @app.route('/api/nakhoda/simulate-move', methods=['POST'])
@@ -613,22 +3307,153 @@ def simulate_move():
     try:
         sim_data = request.json
         pegawai_id, target_unit = sim_data.get('pegawaiId'), sim_data.get('targetUnit')
-        pegawai_list, kolaborasi_list = sim_data.get('pegawaiList', []), sim_data.get('kolaborasiList', [])
         app.logger.info(f"Modul NAKHODA: Simulasi pemindahan {pegawai_id} ke {target_unit}")
         if not pegawai_id or not target_unit: return jsonify({"error": "Data simulasi tidak lengkap"}), 400
-        if not pegawai_list:
-             with open('dummy_data_v2.json', 'r') as f: data = json.load(f)
-             pegawai_list, kolaborasi_list = data['pegawai'], data['kolaborasi']
-        sim_pegawai_list = [p.copy() if p['id'] != pegawai_id else {**p, 'unit': target_unit} for p in pegawai_list]
-        sim_result = analyze_graph(sim_pegawai_list, kolaborasi_list)
-        original_result = analyze_graph(pegawai_list, kolaborasi_list)
-        original_score, new_score = original_result['metrics']['avg_effectiveness'], sim_result['metrics']['avg_effectiveness']
+        layout = sim_data.get('layout', 'auto')
+        if layout not in LAYOUT_MODES: return jsonify({"error": f"layout harus salah satu dari: {', '.join(LAYOUT_MODES)}"}), 400
+        graph_id, graph = resolve_org_graph(sim_data)
+        with graph.lock: # Delta O(derajat) pada graf persisten, bukan dua kali bangun ulang graf penuh
+            original_metrics = graph.metrics(); old_unit = graph.move(pegawai_id, target_unit)
+            try: sim_result = graph.to_reactflow(layout) # Layout warm start: hanya pegawai yang pindah & tetangganya yang bergerak
+            finally: # Graf dipakai bersama (graphId/dataset): pemindahan dibatalkan lagi agar simulasi tidak menumpuk antar klien
+                if old_unit is not None: graph.move(pegawai_id, old_unit)
+        new_metrics = sim_result['metrics']
+        original_score, new_score = original_metrics['avg_effectiveness'], new_metrics['avg_effectiveness']
         impact = new_score - original_score
-        impact_report = (f"Laporan Dampak Simulasi:\n- Pegawai (ID: {pegawai_id}) dipindah ke Unit '{target_unit}'.\n\n**Skor Efektivitas Tim (Baru): {new_score:.2f}**\n**Skor Efektivitas Tim (Lama): {original_score:.2f}**\n**Dampak Perubahan: {impact:+.2f} Poin**\n\n- Jumlah Silo Organisasi: {sim_result['metrics']['num_silos']} (Sebelum: {original_result['metrics']['num_silos']}")
-        sim_result['report'] = impact_report
+        impact_report = (f"Laporan Dampak Simulasi:\n- Pegawai (ID: {pegawai_id}) dipindah ke Unit '{target_unit}'.\n\n**Skor Efektivitas Tim (Baru): {new_score:.2f}**\n**Skor Efektivitas Tim (Lama): {original_score:.2f}**\n**Dampak Perubahan: {impact:+.2f} Poin**\n\n- Jumlah Silo Organisasi: {new_metrics['num_silos']} (Sebelum: {original_metrics['num_silos']})"
+                         f"\n- Kolaborasi Lintas Unit: {new_metrics['cross_unit_collaboration']} (Sebelum: {original_metrics['cross_unit_collaboration']})\n- Unit Terisolasi: {new_metrics['unit_silos']} (Sebelum: {original_metrics['unit_silos']})")
+        sim_result['report'] = impact_report; sim_result['graph_id'] = graph_id
         app.logger.info("Simulasi berhasil.")
         return jsonify(sim_result)
     except Exception as e: return jsonify({"error": str(e)}), 500
 
+@app.route('/api/nakhoda/datasets', methods=['GET'])
+def list_org_datasets():
+    counts = {}
+    for table, key in (('org_employee', 'employees'), ('org_collaboration', 'collaborations')):
+        for name, count in db.session.execute(db.text(f"SELECT dataset, count(*) FROM {table} WHERE dataset NOT LIKE :prefix GROUP BY dataset"), {"prefix": ORG_STAGING_PREFIX + '%'}):
+            counts.setdefault(name, {})[key] = count
+    datasets = [{"name": d.name, "version": d.version, "updated_at": d.updated_at.isoformat() if d.updated_at else None,
+                 "employees": counts.get(d.name, {}).get('employees', 0), "collaborations": counts.get(d.name, {}).get('collaborations', 0)} for d in OrgDataset.query.order_by(OrgDataset.name)]
+    return jsonify({"datasets": datasets})
+
+@app.route('/api/nakhoda/datasets/<name>/import', methods=['POST'])
+def import_org_dataset_route(name):
+    """Impor streaming: multipart 'file_pegawai' dan/atau 'file_kolaborasi' (.csv/.ndjson), atau body mentah (text/csv, application/x-ndjson) dengan ?kind=pegawai|kolaborasi.
+    ?mode=replace (default, ganti isi jenis yang diimpor) | append (tambah; pegawai dengan id sama diperbarui)."""
+    request.max_content_length = int(ORG_IMPORT_MAX_MB * 1024 * 1024) # Impor tidak dibaca ke memori, jadi batasnya terpisah dari MAX_UPLOAD_MB
+    mode = request.args.get('mode', 'replace')
+    if mode not in ('replace', 'append'): return jsonify({"error": "mode harus 'replace' atau 'append'"}), 400
+    if name.startswith(ORG_STAGING_PREFIX) or not name.strip(): return jsonify({"error": "Nama dataset tidak valid"}), 400
+    try:
+        if request.mimetype == 'multipart/form-data':
+            uploads = [(kind, request.files.get(f"file_{kind}")) for kind in ('pegawai', 'kolaborasi')]
+            sources = [(kind, iter_org_records(upload.stream, org_import_format(upload.filename))) for kind, upload in uploads if upload and upload.filename]
+        else:
+            kind = request.args.get('kind')
+            if kind not in ORG_IMPORT_TABLES: return jsonify({"error": "kind harus 'pegawai' atau 'kolaborasi'"}), 400
+            sources = [(kind, iter_org_records(request.stream, org_import_format(None, request.args.get('format') or request.mimetype.split('/')[-1])))]
+        if not sources: return jsonify({"error": "Tidak ada file_pegawai / file_kolaborasi yang diunggah"}), 400
+        started = time.perf_counter(); summary = import_org_dataset(name, sources, replace=(mode == 'replace'))
+    except ValueError as e: return jsonify({"error": str(e)}), 400
+    except RequestEntityTooLarge: raise
+    except Exception as e:
+        app.logger.error(f"Impor dataset NAKHODA '{name}' gagal: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    app.logger.info(f"Modul NAKHODA: dataset '{name}' diimpor ({mode}) dalam {elapsed_ms:.0f} ms: {summary}")
+    return jsonify({"dataset": name, "mode": mode, "version": org_dataset_version(name), "summary": summary, "elapsed_ms": round(elapsed_ms, 1)})
+
+@app.route('/api/nakhoda/datasets/<name>', methods=['DELETE'])
+def delete_org_dataset_route(name):
+    if not delete_org_dataset(name): return jsonify({"error": f"Dataset '{name}' tidak ditemukan"}), 404
+    return jsonify({"dataset": name, "deleted": True})
+
+@app.route('/api/nakhoda/network-metrics', methods=['POST'])
+def network_metrics():
+    """Hanya metrik jaringan lanjutan (tanpa node/edge). Panggilan ulang pada graf yang sama melanjutkan sampling sampai 'samples' pivot tercapai."""
+    request.max_content_length = int(NAKHODA_JSON_MAX_MB * 1024 * 1024)
+    payload = request.json or {}
+    try: advanced = advanced_metrics_args({**payload, 'advanced': True}, 'advanced')
+    except ValueError as e: return jsonify({"error": str(e)}), 400
+    try:
+        graph_id, graph = resolve_org_graph(payload)
+        with graph.lock:
+            if not graph.nodes: return jsonify({"error": "Graf kosong"}), 400
+            result = {"graph_id": graph_id, "metrics": {**graph.metrics(), "advanced": graph.advanced_metrics(**advanced)}}
+    except Exception as e:
+        app.logger.error(f"Metrik jaringan NAKHODA gagal: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    return jsonify(result)
+
+@app.route('/api/nakhoda/graph-units', methods=['POST'])
+def graph_units():
+    """Supergraf unit dari graphId (atau pegawaiList/kolaborasiList); 'minWeight' menyaring edge antar unit yang tipis, 'maxEdges' membatasi jumlah edge."""
+    request.max_content_length = int(NAKHODA_JSON_MAX_MB * 1024 * 1024)
+    payload = request.json or {}
+    layout = payload.get('layout', 'auto')
+    if layout not in LAYOUT_MODES: return jsonify({"error": f"layout harus salah satu dari: {', '.join(LAYOUT_MODES)}"}), 400
+    try: min_weight, max_edges = max(int(payload.get('minWeight', 1)), 1), min(max(int(payload.get('maxEdges', NAKHODA_UNIT_EDGE_LIMIT)), 0), NAKHODA_UNIT_EDGE_LIMIT)
+    except (TypeError, ValueError): return jsonify({"error": "'minWeight' dan 'maxEdges' harus berupa angka"}), 400
+    try:
+        graph_id, graph = resolve_org_graph(payload)
+        with graph.lock: result = graph.to_units(layout, min_weight, max_edges)
+    except Exception as e: return jsonify({"error": str(e)}), 500
+    return jsonify({**result, "graph_id": graph_id})
+
+@app.route('/api/nakhoda/graph-drilldown', methods=['POST'])
+def graph_drilldown():
+    """Anggota satu unit (atau unit + tetangganya bila 'includeNeighbors') per halaman 'offset'/'limit'."""
+    request.max_content_length = int(NAKHODA_JSON_MAX_MB * 1024 * 1024)
+    payload = request.json or {}
+    unit, layout = payload.get('unit'), payload.get('layout', 'auto')
+    if unit is None: return jsonify({"error": "'unit' wajib diisi"}), 400
+    if layout not in LAYOUT_MODES: return jsonify({"error": f"layout harus salah satu dari: {', '.join(LAYOUT_MODES)}"}), 400
+    try: offset, limit = max(int(payload.get('offset', 0)), 0), min(max(int(payload.get('limit', 200)), 1), NAKHODA_DRILLDOWN_MAX_NODES)
+    except (TypeError, ValueError): return jsonify({"error": "'offset' dan 'limit' harus berupa angka"}), 400
+    try:
+        graph_id, graph = resolve_org_graph(payload)
+        with graph.lock: result = graph.drilldown(unit, bool(payload.get('includeNeighbors')), offset, limit, layout)
+    except Exception as e: return jsonify({"error": str(e)}), 500
+    if result is None: return jsonify({"error": f"Unit '{unit}' tidak ditemukan di graf"}), 404
+    return jsonify({**result, "graph_id": graph_id})
+
+NAKHODA_WHATIF_MAX = int(os.getenv('NAKHODA_WHATIF_MAX', '200000'))
+
+@app.route('/api/nakhoda/simulate-moves-batch', methods=['POST'])
+def simulate_moves_batch():
+    """What-if massal: evaluasi banyak (pegawai, unit tujuan) tanpa mengubah graf, diurutkan menurut dampak efektivitas lalu kolaborasi lintas unit.
+    Skenario dari 'moves' [{pegawaiId, targetUnit}] atau hasil kali 'pegawaiIds' x 'targetUnits' (default: semua pegawai x semua unit)."""
+    request.max_content_length = int(NAKHODA_JSON_MAX_MB * 1024 * 1024)
+    sim_data = request.json or {}
+    try: top_n = min(max(int(sim_data.get('top', 50)), 1), 1000)
+    except (TypeError, ValueError): return jsonify({"error": "'top' harus berupa angka"}), 400
+    started = time.perf_counter()
+    try:
+        graph_id, graph = resolve_org_graph(sim_data)
+        with graph.lock:
+            if sim_data.get('moves'): scenarios = [(m.get('pegawaiId'), m.get('targetUnit')) for m in sim_data['moves']]
+            else:
+                pegawai_ids = sim_data.get('pegawaiIds') or list(graph.nodes); target_units = sim_data.get('targetUnits') or [u for u, members in graph.unit_members.items() if members]
+                if len(pegawai_ids) * len(target_units) > NAKHODA_WHATIF_MAX: return jsonify({"error": f"Skenario melebihi batas {NAKHODA_WHATIF_MAX}; persempit pegawaiIds/targetUnits."}), 400
+                scenarios = [(p, u) for p in pegawai_ids if p in graph.nodes for u in target_units if graph.nodes[p]['unit'] != u]
+            if len(scenarios) > NAKHODA_WHATIF_MAX: return jsonify({"error": f"Skenario melebihi batas {NAKHODA_WHATIF_MAX}."}), 400
+            unknown = [p for p, _ in scenarios if p not in graph.nodes]
+            if unknown: return jsonify({"error": f"Pegawai tidak ditemukan di graf: {', '.join(map(str, unknown[:10]))}"}), 400
+            baseline = graph.metrics()
+            evaluated = [(graph.impact(p, u), p, u) for p, u in scenarios]
+            ranked = heapq.nsmallest(top_n, evaluated, key=lambda e: (-e[0][0], -e[0][1], e[0][2]))
+            results = [{"pegawaiId": p, "nama": graph.nodes[p]['label'], "from_unit": graph.nodes[p]['unit'], "target_unit": u,
+                        "effectiveness_impact": impact[0], "cross_unit_delta": impact[1], "unit_silos_delta": impact[2]} for impact, p, u in ranked]
+    except Exception as e:
+        app.logger.error(f"Simulasi massal NAKHODA gagal: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    app.logger.info(f"Modul NAKHODA: {len(evaluated)} skenario what-if dievaluasi dalam {elapsed_ms:.1f} ms.")
+    return jsonify({"graph_id": graph_id, "baseline": baseline, "evaluated": len(evaluated), "elapsed_ms": round(elapsed_ms, 2), "results": results})
+
+STARTUP_STATS["import_ms"] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+if NAVIGARA_WARMUP and __name__ != '__mp_main__': threading.Thread(target=warm_up, args=(parse_warmup_components(NAVIGARA_WARMUP),), name='navigara-warm-up', daemon=True).start() # Worker pool PDF (spawn/forkserver) mengimpor ulang app.py sebagai __mp_main__
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""Benchmark end-to-end offline: app Flask (server WSGI threaded) melawan stub lokal BytePlus/Gemini/Custom Search, dengan beban konkuren per endpoint.
+
+Jalankan dari folder backend-python:  python bench/bench_e2e.py [--requests 50] [--concurrency 8] [--provider gemini] [--scenarios lentera-grade-final selayar-analyze-skp]
+Latensi, error rate dan jumlah potongan stream provider diatur lewat --gemini-latency-ms, --error-rate, dst. (lihat stub_providers.py).
+Payload unik per request (CV/SKP/program/graf berbeda) agar cache ekstraksi, OSINT, LLM dan graf tidak menyembunyikan biaya; --cached untuk mengulang payload yang sama.
+Database, cache LLM dan cache PDF memakai direktori sementara. --save/--compare untuk baseline & deteksi regresi (p95).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+from report import add_result_arguments, finish, summarize
+from stub_providers import StubProviderServer, add_stub_arguments, stub_config_from_args
+from synthetic import cv_text, make_document, skp_text, synthetic_org
+
+
+def build_scenarios(args):
+    """{nama: fungsi(i) -> (method, path, kwargs requests)}; dokumen dibuat sebelum pengukuran."""
+    unique = lambda i: i if not args.cached else 0
+    count = 1 if args.cached else args.requests
+    cvs = [make_document(cv_text(i), 'pdf') for i in range(count)]
+    answers = [make_document(cv_text(10 ** 6 + i, paragraphs=3), 'docx') for i in range(count)]
+    skps = [make_document(skp_text(i, args.skp_rhk), 'pdf') for i in range(count)]
+    long_skps = [make_document(skp_text(10 ** 6 + i, args.skp_long_rhk), 'pdf') for i in range(count)] # Melebihi SKP_TEXT_BUDGET: single (dipotong) vs map-reduce
+    provider = {"provider": args.provider}
+    scenarios = {
+        "lentera-generate-case (CV pdf)": lambda i: ('post', '/api/lentera/generate-case', {"data": {**provider, "jabatan": f"Analis Kebijakan {unique(i)}"}, "files": {"file_cv": (f"cv_{unique(i)}.pdf", cvs[unique(i)])}}),
+        "lentera-grade-final (jawaban docx)": lambda i: ('post', '/api/lentera/grade-final', {"data": {**provider, "nama_kandidat": f"Kandidat {unique(i)}", "jabatan": "Analis Kebijakan", "case_study": "Skenario uji"},
+                                                                                         "files": {"file_answer": (f"jawaban_{unique(i)}.docx", answers[unique(i)])}}),
+        "selayar-osint-sentiment": lambda i: ('post', '/api/selayar/osint-sentiment', {"json": {**provider, "program": f"Program Layanan Publik {unique(i)}"}}),
+        "selayar-analyze-skp (pdf)": lambda i: ('post', '/api/selayar/analyze-skp', {"data": provider, "files": {"file_skp": (f"skp_{unique(i)}.pdf", skps[unique(i)])}}),
+        "selayar-analyze-skp (pdf, stream)": lambda i: ('post', '/api/selayar/analyze-skp?stream=1', {"data": provider, "files": {"file_skp": (f"skp_{unique(i)}.pdf", skps[unique(i)])}}),
+        "selayar-analyze-skp (panjang, single)": lambda i: ('post', '/api/selayar/analyze-skp', {"data": {**provider, "skp_mode": "single"}, "files": {"file_skp": (f"skp_long_{unique(i)}.pdf", long_skps[unique(i)])}}),
+        "selayar-analyze-skp (panjang, chunked)": lambda i: ('post', '/api/selayar/analyze-skp', {"data": {**provider, "skp_mode": "chunked"}, "files": {"file_skp": (f"skp_long_{unique(i)}.pdf", long_skps[unique(i)])}}),
+        "lentera-export-pdf": lambda i: ('post', '/api/lentera/export-pdf', {"json": {"profile_markdown": f"## Profil {unique(i)}\n\n" + skp_text(unique(i)).replace("\n", "\n\n"), "nama_kandidat": f"K{unique(i)}"}}),
+    }
+    for size in args.graph_sizes:
+        pegawai, kolaborasi = synthetic_org(size, args.edges_per_node)
+        template = json.dumps({"pegawaiData": pegawai, "kolaborasiData": kolaborasi, "layout": args.graph_layout})
+        # Ganti satu nama pegawai per request (murah) agar hash graf berbeda dan cache graf tidak terpakai
+        scenarios[f"nakhoda-load-custom-graph ({size})"] = lambda i, template=template: ('post', '/api/nakhoda/load-custom-graph', {
+            "data": template.replace('"Pegawai 0"', f'"Pegawai 0 #{unique(i)}"', 1), "headers": {"Content-Type": "application/json"}})
+    return scenarios
+
+
+def run_scenario(base_url, make_request, total, concurrency):
+    sessions = threading.local(); latencies, errors = [], []
+
+    def one(i):
+        if not hasattr(sessions, 'session'): sessions.session = requests.Session()
+        method, path, kwargs = make_request(i)
+        started = time.perf_counter()
+        try:
+            response = sessions.session.request(method, base_url + path, timeout=300, **kwargs); body = response.content
+            ok = response.status_code < 400 and not body.lstrip().startswith(b'{"error"') and b'event: error' not in body
+        except requests.RequestException: ok = False
+        latencies.append((time.perf_counter() - started) * 1000)
+        if not ok: errors.append(i)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool: list(pool.map(one, range(total)))
+    return summarize(latencies, len(errors), time.perf_counter() - started)
+
+
+def stage_summary(metrics):
+    """Rata-rata durasi per tahap dari histogram instrumentasi app (navigara_stage_duration_seconds)."""
+    print(f"\n{'tahap':<16} {'n':>6} {'rata-rata (ms)':>15}")
+    for (name, labels), (_, total, count) in sorted(metrics.histograms.items()):
+        if name == 'navigara_stage_duration_seconds' and count: print(f"{dict(labels)['stage']:<16} {count:>6} {total / count * 1000:15.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=50, help="Jumlah request per skenario")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--provider', choices=['gemini', 'byteplus'], default='gemini')
+    parser.add_argument('--scenarios', nargs='+', help="Awalan nama skenario yang dijalankan (default semua)")
+    parser.add_argument('--graph-sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--edges-per-node', type=int, default=10)
+    parser.add_argument('--graph-layout', default='auto')
+    parser.add_argument('--skp-rhk', type=int, default=8, help="Jumlah RHK per SKP sintetis (panjang dokumen)")
+    parser.add_argument('--skp-long-rhk', type=int, default=120, help="Jumlah RHK SKP panjang (skenario single vs chunked)")
+    parser.add_argument('--cached', action='store_true', help="Ulangi payload yang sama (mengukur jalur cache hit)")
+    add_stub_arguments(parser); add_result_arguments(parser)
+    args = parser.parse_args()
+
+    stub = StubProviderServer(stub_config_from_args(args)).start()
+    workdir = tempfile.mkdtemp(prefix='navigara-bench-')
+    os.environ.update(stub.environment())
+    os.environ.update({"DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'e2e.db')}", "LLM_CACHE_PATH": os.path.join(workdir, 'llm_cache.db'), "NAVIGARA_WARMUP": ""})
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as navigara  # noqa: E402 -- setelah env stub di-set
+    logging.getLogger().setLevel(logging.WARNING); navigara.app.logger.setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, navigara.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-wsgi', daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    print(f"Stub: {stub.url}  App: {base_url}  ({args.requests} request/skenario, konkurensi {args.concurrency}, provider {args.provider})")
+
+    scenarios = build_scenarios(args); results = {}
+    for name, make_request in scenarios.items():
+        if args.scenarios and not any(name.startswith(prefix) for prefix in args.scenarios): continue
+        results[name] = run_scenario(base_url, make_request, args.requests, args.concurrency)
+        print(f"  {name}: {results[name]['rps']:.2f} req/s, p95 {results[name]['p95_ms']:.0f} ms, {results[name]['errors']} error")
+    print()
+    finish(args, results)
+    stage_summary(navigara.metrics)
+    print(f"\nPanggilan stub: {stub.config.calls}  error tersimulasi: {stub.config.errors}")
+    server.shutdown(); stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Benchmark skala analyze_graph: jalur networkx vs backend sparse NumPy/SciPy pada graf organisasi sintetis.
+
+Jalankan dari folder backend-python:  python bench/bench_graph.py [--sizes 1000 10000 100000] [--edges-per-node 10] [--max-networkx 200000]
+Metrik, node, dan edge kedua backend diverifikasi identik untuk setiap ukuran yang dijalankan di networkx.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as navigara  # noqa: E402
+from synthetic import synthetic_org  # noqa: E402
+
+logging.getLogger().setLevel(logging.WARNING)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter(); result = fn(*args)
+    return time.perf_counter() - t0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--edges-per-node', type=int, default=10)
+    parser.add_argument('--max-networkx', type=int, default=200000, help="Ukuran terbesar yang juga dijalankan di networkx")
+    args = parser.parse_args()
+    if navigara.sparse_graph is None: sys.exit("SciPy/NumPy tidak terpasang; backend sparse tidak tersedia.")
+    print(f"{'pegawai':>9} {'edge':>9} | {'networkx':>10} {'sparse':>10} {'speedup':>8} | {'sparse (metrik)':>15} | hasil")
+    for size in args.sizes:
+        pegawai, kolaborasi = synthetic_org(size, args.edges_per_node)
+        sparse_time, sparse_result = timed(navigara.analyze_graph_sparse, pegawai, kolaborasi)
+        metrics_time, _ = timed(lambda: navigara.SparseGraph(pegawai, kolaborasi).metrics())
+        if size <= args.max_networkx:
+            nx_time, nx_result = timed(navigara.analyze_graph_networkx, pegawai, kolaborasi)
+            same = "identik" if all(nx_result[key] == sparse_result[key] for key in ('metrics', 'nodes', 'edges')) else "BERBEDA"
+            nx_col, speedup = f"{nx_time * 1000:8.0f}ms", f"{nx_time / sparse_time:7.1f}x"
+        else: nx_col, speedup, same = f"{'-':>10}", f"{'-':>8}", "-"
+        print(f"{size:>9} {sparse_result['metrics']['total_kolaborasi']:>9} | {nx_col} {sparse_time * 1000:8.0f}ms {speedup} | {metrics_time * 1000:13.0f}ms | {same}")
+
+
+if __name__ == '__main__':
+    main()
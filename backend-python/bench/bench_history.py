@@ -0,0 +1,76 @@
+"""Benchmark /api/history: latensi halaman pertama, halaman dalam (keyset cursor) dan filter pada tabel assessment_log besar.
+
+Jalankan dari folder backend-python:  python bench/bench_history.py [--rows 1000000] [--pages 20]
+Memakai database SQLite sementara (DATABASE_URL), bukan instance/assessment_log.db.
+"""
+import argparse
+import datetime
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+DB_DIR = tempfile.mkdtemp(prefix='navigara-bench-')
+DB_PATH = os.path.join(DB_DIR, 'history.db')
+os.environ['DATABASE_URL'] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as navigara  # noqa: E402
+
+logging.getLogger().setLevel(logging.WARNING)
+MODULES = ['Lentera', 'Selayar-OSINT', 'Selayar-SKP']
+
+
+def populate(rows):
+    """Isi assessment_log langsung via sqlite3 (executemany) agar cepat untuk jutaan baris."""
+    rng = random.Random(7); start = datetime.datetime(2024, 1, 1)
+    conn = sqlite3.connect(DB_PATH)
+    batch = []
+    for i in range(rows):
+        ts = start + datetime.timedelta(seconds=i * 30)
+        module = MODULES[i % 3]
+        batch.append((str(uuid.UUID(int=rng.getrandbits(128))), ts.strftime('%Y-%m-%d %H:%M:%S.%f'), module, f"Pegawai {rng.randint(1, 50000)}", "Analisis SKP",
+                      rng.randint(1, 7) if module == 'Lentera' else None, rng.randint(40, 100) if module == 'Selayar-SKP' else None, None, None))
+        if len(batch) == 50000:
+            conn.executemany("INSERT INTO assessment_log VALUES (?,?,?,?,?,?,?,?,?)", batch); batch.clear()
+    if batch: conn.executemany("INSERT INTO assessment_log VALUES (?,?,?,?,?,?,?,?,?)", batch)
+    conn.commit(); conn.execute("ANALYZE"); conn.close()
+
+
+def timed(client, url):
+    t0 = time.perf_counter(); response = client.get(url); elapsed = (time.perf_counter() - t0) * 1000
+    assert response.status_code == 200, response.get_json()
+    return elapsed, response.get_json()
+
+
+def report(label, samples):
+    print(f"{label:<38} p50 {statistics.median(samples):7.2f} ms   max {max(samples):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--pages', type=int, default=20, help="Jumlah halaman yang diikuti lewat next_cursor")
+    args = parser.parse_args()
+    navigara.ensure_database() # Tabel dibuat lazy; populate menulis langsung via sqlite3
+    t0 = time.perf_counter(); populate(args.rows)
+    print(f"Populate {args.rows} baris: {time.perf_counter() - t0:.1f} s  ({DB_PATH})")
+    client = navigara.app.test_client()
+
+    report("halaman 1 (limit=50)", [timed(client, '/api/history?limit=50')[0] for _ in range(10)])
+    samples, cursor = [], None
+    for _ in range(args.pages):
+        elapsed, body = timed(client, '/api/history?limit=50' + (f"&cursor={body['next_cursor']}" if cursor else ''))
+        samples.append(elapsed); cursor = body['next_cursor']
+    report(f"{args.pages} halaman berurutan (cursor)", samples)
+    report("module=Selayar-SKP&min_kinerja=90", [timed(client, '/api/history?module=Selayar-SKP&min_kinerja=90')[0] for _ in range(10)])
+    report("candidate_name=Pegawai 123 (prefix)", [timed(client, '/api/history?candidate_name=Pegawai%20123')[0] for _ in range(10)])
+    report("date_from..date_to + fields=module", [timed(client, '/api/history?date_from=2024-03-01&date_to=2024-03-07&fields=module')[0] for _ in range(10)])
+
+
+if __name__ == '__main__':
+    main()
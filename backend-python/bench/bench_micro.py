@@ -0,0 +1,69 @@
+"""Micro-benchmark tahap inti: parse_score, analyze_graph, ekstraksi teks (PDF/DOCX) dan ekspor PDF, dengan p50/p95/p99 per operasi.
+
+Jalankan dari folder backend-python:  python bench/bench_micro.py [--repeat 30] [--graph-sizes 1000 10000] [--save baseline.json | --compare baseline.json]
+Ekstraksi diukur tanpa cache (_parse_document) dan lewat cache (extract_document, hit); PDF diukur di thread (render_pdf) dan lewat process pool + cache (generate_pdf_bytes, konten unik).
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from report import add_result_arguments, finish, summarize
+from stub_providers import canned_output # Markdown kanonik templat Lentera/Selayar
+from synthetic import cv_text, make_document, skp_text, synthetic_org
+
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='navigara-bench-'), 'micro.db')}")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as navigara  # noqa: E402
+
+logging.getLogger().setLevel(logging.WARNING); navigara.app.logger.setLevel(logging.WARNING)
+logging.getLogger('xhtml2pdf').setLevel(logging.ERROR) # Peringatan glyph emoji templat
+
+
+def measure(fn, repeat, warmup=1):
+    """fn(i) dipanggil warmup + repeat kali; hanya repeat kali terakhir yang diukur (ms)."""
+    for i in range(warmup): fn(-1 - i)
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter(); fn(i); samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--graph-sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--edges-per-node', type=int, default=10)
+    parser.add_argument('--skp-rhk', type=int, nargs='+', default=[8, 60], help="Ukuran dokumen SKP (jumlah RHK) untuk ekstraksi")
+    add_result_arguments(parser)
+    args = parser.parse_args()
+    results = {}
+
+    skp_markdown = canned_output("## 📋 ANALISIS OBJEKTIF KINERJA SELAYAR\n**Dokumen:** skp.pdf"); lentera_markdown = canned_output("## 👤 PROFIL POTENSI LENTERA\nNama:Budi\nJabatan:Analis")
+    results["parse_score: skema SKP (template)"] = measure(lambda i: navigara.SELAYAR_SKP_SCORE_SCHEMA.extract(skp_markdown), args.repeat * 10)
+    results["parse_score: skema Lentera (template)"] = measure(lambda i: navigara.LENTERA_SCORE_SCHEMA.extract(lentera_markdown), args.repeat * 10)
+    results["parse_score: tunggal (Skor Sentimen)"] = measure(lambda i: navigara.parse_score(canned_output("Sentimen"), "Skor Sentimen"), args.repeat * 10)
+
+    for size in args.graph_sizes:
+        pegawai, kolaborasi = synthetic_org(size, args.edges_per_node)
+        results[f"analyze_graph ({size} pegawai)"] = measure(lambda i: navigara.analyze_graph(pegawai, kolaborasi), max(3, args.repeat // 5))
+
+    for rhk in args.skp_rhk:
+        for ext in ('pdf', 'docx'):
+            data = make_document(skp_text(0, rhk), ext)
+            results[f"ekstraksi {ext} SKP {rhk} RHK (tanpa cache)"] = measure(lambda i: navigara._parse_document(data, ext, navigara.SKP_TEXT_BUDGET), args.repeat)
+            results[f"ekstraksi {ext} SKP {rhk} RHK (cache hit)"] = measure(lambda i: navigara.extract_document(data, f"skp.{ext}", navigara.SKP_TEXT_BUDGET), args.repeat)
+    cv_pdf = make_document(cv_text(0), 'pdf')
+    results["ekstraksi pdf CV (anggaran CV)"] = measure(lambda i: navigara._parse_document(cv_pdf, 'pdf', navigara.CV_TEXT_BUDGET), args.repeat)
+
+    results["pdf: render_pdf di thread (SKP)"] = measure(lambda i: navigara.pdf_render.render_pdf(skp_markdown, "Analisis Objektif Kinerja SELAYAR"), max(3, args.repeat // 3))
+    navigara.pdf_render_pool.warm_up()
+    results["pdf: generate_pdf_bytes (pool, unik)"] = measure(lambda i: navigara.generate_pdf_bytes(f"{skp_markdown}\n\nRev {i}-{time.time_ns()}", "Analisis Objektif Kinerja SELAYAR"), max(3, args.repeat // 3))
+    results["pdf: generate_pdf_bytes (cache hit)"] = measure(lambda i: navigara.generate_pdf_bytes(skp_markdown, "Analisis Objektif Kinerja SELAYAR"), args.repeat)
+    finish(args, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Micro-benchmark: parse_score lama (4x re.findall/re.search per keyword) vs ScoreSchema (satu scan per teks).
+
+Jalankan dari folder backend-python:  python bench/bench_parse_score.py [--repeat 20]
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as navigara  # noqa: E402
+
+logging.getLogger().setLevel(logging.WARNING)
+
+SKP_KEYWORDS = [kw for kw, _ in navigara.SELAYAR_SKP_SCORE_SCHEMA.fields.values()]
+SKP_OUTPUT = """## 📋 ANALISIS OBJEKTIF KINERJA SELAYAR
+**Pegawai:** ANDREAS GHANNESON NAINGGOLAN, S.Kom
+**Periode:** 1 OKTOBER SD 31 DESEMBER TAHUN 2023
+### 🎯 ANALISIS HASIL KERJA (TARGET vs REALISASI):
+* **RHK 1 (Perekapan Data Anjab):** Target: 2000 Data. Realisasi: 4590 Data (Pencapaian: **Di Atas Ekspektasi**).
+* **Estimasi Skor Pencapaian Hasil Kerja (AI):** 88 / 100
+### ✨ ANALISIS PERILAKU KERJA (Skala 0-100):
+* **Berorientasi Pelayanan:** 90 / 100
+* **Akuntabel:** 85 / 100
+* **Kompeten:** 80 / 100
+* **Harmonis:** 78 / 100
+* **Loyal:** 92 / 100
+* **Adaptif:** 88 / 100
+* **Kolaboratif:** 84 / 100
+* **Rata-rata Skor Perilaku:** 85 / 100
+### 💯 SKOR KINERJA FINAL (Estimasi AI):
+*(Bobot: 60% Hasil Kerja + 40% Rata-rata Perilaku)*
+**87 / 100**
+"""
+
+
+def legacy_parse_score(text, keyword, default=0):
+    """Salinan parse_score sebelum ScoreSchema (tanpa logging) sebagai pembanding."""
+    try:
+        matches1 = re.findall(rf"(?:{keyword}\s*[:\-]*\s*|\*\*\s*)(\d+)(?:\s*/\s*(?:100|7))?", text, re.IGNORECASE | re.DOTALL)
+        if matches1:
+            score = int(matches1[0])
+            if "Skala 1-7" in keyword or (score <= 7 and "FINAL" not in keyword.upper() and "HASIL KERJA" not in keyword.upper()):
+                return max(1, min(7, score))
+            return max(0, min(100, score))
+        match2 = re.search(rf"{keyword}.*?(\d+)\s*/\s*100", text, re.IGNORECASE | re.DOTALL)
+        if match2: return max(0, min(100, int(match2.group(1))))
+        match3 = re.search(rf"{keyword}.*?(\d)\s*/\s*7", text, re.IGNORECASE | re.DOTALL)
+        if match3: return max(1, min(7, int(match3.group(1))))
+        match4 = re.search(rf"{keyword}.*?(\d+)", text, re.IGNORECASE | re.DOTALL)
+        if match4:
+            score = int(match4.group(1))
+            return max(0, min(100, score)) if score > 7 else max(1, min(7, score))
+        return default
+    except Exception:
+        return default
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter(); fn(); best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    cases = {
+        "template SKP (~1 KB)": SKP_OUTPUT,
+        "output panjang (~200 KB)": SKP_OUTPUT + ("Catatan naratif panjang tanpa skor. " * 6000),
+        # Patologis: keyword berulang tanpa angka -> `keyword.*?(\d+)` mencoba ulang dari setiap kemunculan (kuadratik)
+        "patologis (keyword berulang, tanpa angka)": "Loyal dan Adaptif serta Kolaboratif. " * 1500,
+    }
+    print(f"{'kasus':45} {'lama (ms)':>12} {'ScoreSchema (ms)':>18} {'speedup':>9}")
+    for label, text in cases.items():
+        legacy = timed(lambda: [legacy_parse_score(text, kw) for kw in SKP_KEYWORDS], max(1, args.repeat // 10) if 'patologis' in label else args.repeat)
+        engine = timed(lambda: navigara.SELAYAR_SKP_SCORE_SCHEMA.extract(text), args.repeat)
+        print(f"{label:45} {legacy * 1000:12.2f} {engine * 1000:18.2f} {legacy / engine:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
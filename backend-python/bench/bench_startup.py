@@ -0,0 +1,60 @@
+"""Benchmark cold start backend: durasi `import app`, waktu sampai respons pertama, dan biaya warm-up per komponen lazy.
+
+Jalankan dari folder backend-python:  python bench/bench_startup.py [--runs 5]
+Setiap percobaan memakai proses Python baru (cold import) dan database SQLite sementara (DATABASE_URL).
+Baris "import + warm-up semua" mendekati biaya startup lama, saat semua dependensi dan klien dimuat saat import.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROBE = """
+import json, logging, sys, time
+started = time.perf_counter()
+import app as navigara
+imported = time.perf_counter()
+logging.getLogger().setLevel(logging.WARNING)
+response = navigara.app.test_client().get('/api/history?limit=1'); assert response.status_code == 200, response.get_json()
+first_response = time.perf_counter()
+warm_up = navigara.warm_up(sys.argv[1]) if sys.argv[1] != 'none' else {}
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_response_ms": (first_response - started) * 1000, "warm_up": warm_up,
+                  "modules": len(sys.modules), "total_ms": (time.perf_counter() - started) * 1000}))
+"""
+
+
+def probe(components):
+    with tempfile.TemporaryDirectory(prefix='navigara-bench-') as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}", NAVIGARA_WARMUP='')
+        out = subprocess.run([sys.executable, '-c', PROBE, components], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if out.returncode: sys.exit(out.stderr[-2000:])
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def report(label, samples):
+    print(f"{label:<34} p50 {statistics.median(samples):8.1f} ms   min {min(samples):8.1f} ms   max {max(samples):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--components', default='all', help="Komponen warm-up (daftar koma) untuk baris biaya warm-up")
+    args = parser.parse_args()
+    lazy = [probe('none') for _ in range(args.runs)]
+    print(f"Modul termuat setelah request pertama: {lazy[0]['modules']}")
+    report("import app", [r['import_ms'] for r in lazy])
+    report("import + respons pertama", [r['first_response_ms'] for r in lazy])
+    warm = [probe(args.components) for _ in range(args.runs)]
+    for name in warm[0]['warm_up']:
+        timings = [r['warm_up'][name] for r in warm if isinstance(r['warm_up'][name], (int, float))]
+        if timings: report(f"warm-up {name}", timings)
+        else: print(f"{'warm-up ' + name:<34} {warm[0]['warm_up'][name]}")
+    report(f"import + warm-up {args.components}", [r['total_ms'] for r in warm])
+
+
+if __name__ == '__main__':
+    main()
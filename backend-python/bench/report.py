@@ -0,0 +1,57 @@
+"""Ringkasan latensi (p50/p95/p99, throughput) dan simpan/bandingkan hasil benchmark sebagai JSON untuk deteksi regresi."""
+import json
+import math
+import sys
+
+
+def percentile(sorted_samples, q):
+    """Nearest-rank: nilai ke-ceil(q/100 * n) dari sampel terurut."""
+    if not sorted_samples: return float('nan')
+    return sorted_samples[min(len(sorted_samples) - 1, max(0, math.ceil(q / 100 * len(sorted_samples)) - 1))]
+
+
+def summarize(samples_ms, errors=0, wall_s=None):
+    ordered = sorted(samples_ms)
+    summary = {"n": len(ordered), "errors": errors, "p50_ms": percentile(ordered, 50), "p95_ms": percentile(ordered, 95), "p99_ms": percentile(ordered, 99),
+               "max_ms": ordered[-1] if ordered else float('nan')}
+    if wall_s: summary["rps"] = (len(ordered) - errors) / wall_s
+    return summary
+
+
+def print_table(results):
+    with_rps = any("rps" in row for row in results.values())
+    print(f"{'skenario':<40} {'n':>5} {'err':>4} " + (f"{'req/s':>7} " if with_rps else "") + f"{'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    for name, row in results.items():
+        print(f"{name:<40} {row['n']:>5} {row['errors']:>4} " + (f"{row.get('rps', 0):7.2f} " if with_rps else "") +
+              f"{row['p50_ms']:9.2f} {row['p95_ms']:9.2f} {row['p99_ms']:9.2f} {row['max_ms']:9.2f}")
+
+
+def save_results(path, results):
+    with open(path, 'w') as f: json.dump(results, f, indent=2)
+    print(f"Hasil disimpan ke {path}")
+
+
+def compare_results(path, results, tolerance, metric='p95_ms'):
+    """Bandingkan dengan baseline JSON; keluar dengan kode 1 bila ada skenario yang lebih lambat dari baseline * (1 + tolerance)."""
+    with open(path) as f: baseline = json.load(f)
+    regressions = []
+    for name, row in results.items():
+        if name not in baseline: continue
+        before, after = baseline[name][metric], row[metric]
+        ratio = after / before if before else float('inf')
+        flag = "REGRESI" if ratio > 1 + tolerance else "ok"
+        print(f"{name:<40} {metric} {before:9.2f} -> {after:9.2f} ms  ({ratio:5.2f}x)  {flag}")
+        if flag == "REGRESI": regressions.append(name)
+    if regressions: sys.exit(f"{len(regressions)} skenario melewati toleransi {tolerance:.0%}: {', '.join(regressions)}")
+
+
+def add_result_arguments(parser):
+    parser.add_argument('--save', help="Simpan hasil sebagai JSON (baseline)")
+    parser.add_argument('--compare', help="Bandingkan dengan baseline JSON; exit 1 bila ada regresi")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Toleransi perlambatan p95 sebelum dianggap regresi (0.2 = 20%%)")
+
+
+def finish(args, results):
+    print_table(results)
+    if args.save: save_results(args.save, results)
+    if args.compare: compare_results(args.compare, results, args.tolerance)
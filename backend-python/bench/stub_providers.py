@@ -0,0 +1,247 @@
+"""Server stub lokal untuk BytePlus (chat completions), Gemini (REST generateContent) dan Google Custom Search: benchmark tanpa memakai kuota.
+
+Jalankan dari folder backend-python:  python bench/stub_providers.py [--port 8099] [--gemini-latency-ms 1200] [--error-rate 0.02]
+lalu jalankan app.py dengan variabel lingkungan yang dicetak (BYTEPLUS_API_ENDPOINT, GEMINI_API_ENDPOINT, GOOGLE_CSE_ENDPOINT, kunci dummy).
+bench_e2e.py menjalankan stub ini di proses yang sama. Output kanonik mengikuti templat Markdown Lentera / Selayar agar parsing skor ikut terukur.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LENTERA_CASE = """**Skenario:**
+Anda baru ditempatkan sebagai {jabatan} di sebuah instansi daerah. Dalam tiga bulan terakhir, laporan kinerja unit menunjukkan keterlambatan penyelesaian layanan hingga 40% dan keluhan masyarakat meningkat di kanal pengaduan.
+Atasan langsung meminta Anda menyusun rencana perbaikan dalam dua minggu, sementara salah satu rekan senior menyarankan agar data keterlambatan "dirapikan" sebelum dilaporkan ke pimpinan.
+
+**Pertanyaan (3 poin spesifik untuk '{jabatan}'):**
+1. Langkah analisis apa yang Anda lakukan untuk menemukan akar masalah keterlambatan?
+2. Bagaimana Anda memprioritaskan perbaikan dengan sumber daya yang terbatas?
+3. Bagaimana Anda menyikapi saran untuk merapikan data keterlambatan?
+"""
+LENTERA_PROFILE = """## 👤 PROFIL POTENSI LENTERA
+
+**Nama:** {nama}
+**Jabatan Dituju:** {jabatan}
+
+---
+### 📊 SKOR ATRIBUT (Skala 1-7):
+* **Kualifikasi & Pengetahuan:** {s1} / 7
+* **Nalar & Logika:** {s2} / 7
+* **Problem Solving:** {s3} / 7
+* **Jejak Digital:** {s4} / 7
+* **Potensi Integritas:** {s5} / 7
+
+**SKOR TOTAL POTENSI:** {total} / 7
+
+---
+### 📈 REKOMENDASI & PENGEMBANGAN:
+* **Rekomendasi Kelayakan:** {rekomendasi}
+* **Kekuatan Utama:** Analisis terstruktur dan berorientasi data.
+* **Area Pengembangan:** Komunikasi lintas unit dan delegasi.
+"""
+SELAYAR_SENTIMENT = """**Analisis Sentimen Publik (OSINT):**
+* **Sentimen Umum:** {sentimen}
+* **Skor Sentimen (Estimasi):** {skor} / 100
+* **Ringkasan Utama:** Pemberitaan didominasi capaian program dengan beberapa catatan pelaksanaan di lapangan.
+"""
+SELAYAR_SKP = """## 📋 ANALISIS OBJEKTIF KINERJA SELAYAR
+
+**Pegawai:** {nama}
+**Periode:** 1 JANUARI SD 31 DESEMBER TAHUN 2024
+**Dokumen:** {dokumen}
+
+---
+### 🎯 ANALISIS HASIL KERJA (TARGET vs REALISASI):
+* **RHK 1 (Penyusunan Laporan Kinerja):** Target: 12 Dokumen. Realisasi: 12 Dokumen (Pencapaian: **Sesuai Ekspektasi**). Umpan Balik: "Baik".
+* **RHK 2 (Pengelolaan Data Kepegawaian):** Target: 2000 Data. Realisasi: 2450 Data (Pencapaian: **Di Atas Ekspektasi**). Umpan Balik: "Pertahankan".
+* **RHK 3 (Evaluasi Kebutuhan Jabatan):** Target: 40 Jabatan. Realisasi: 31 Jabatan (Pencapaian: **Di Bawah Ekspektasi**). Umpan Balik: "Perlu percepatan".
+* **Ringkasan Umum Hasil Kerja:** Dua dari tiga RHK memenuhi atau melampaui target.
+* **Estimasi Skor Pencapaian Hasil Kerja (AI):** {hasil} / 100
+
+---
+### ✨ ANALISIS PERILAKU KERJA (Skala 0-100):
+* **Berorientasi Pelayanan:** {p[0]} / 100
+* **Akuntabel:** {p[1]} / 100
+* **Kompeten:** {p[2]} / 100
+* **Harmonis:** {p[3]} / 100
+* **Loyal:** {p[4]} / 100
+* **Adaptif:** {p[5]} / 100
+* **Kolaboratif:** {p[6]} / 100
+* **Rata-rata Skor Perilaku:** {rata} / 100
+
+---
+### 💯 SKOR KINERJA FINAL (Estimasi AI):
+*(Bobot: 60% Hasil Kerja + 40% Rata-rata Perilaku)*
+**{final} / 100**
+
+### 🏅 PREDIKAT OBJEKTIF:
+**{predikat}** (Predikat di dokumen: Baik — Sesuai)
+
+### 📝 CATATAN & SARAN:
+* **Catatan Asesor AI:** Kinerja stabil; percepat RHK evaluasi jabatan.
+* **Saran Pengembangan:** Pelatihan manajemen waktu dan analisis jabatan.
+"""
+
+
+class StubConfig:
+    """Latensi (ms, + jitter acak 0..jitter_ms) per provider, peluang error, dan jumlah potongan untuk respons streaming."""
+    def __init__(self, gemini_latency_ms=800, byteplus_latency_ms=900, cse_latency_ms=250, jitter_ms=200, error_rate=0.0, error_status=500, stream_chunks=20, seed=7):
+        self.latency_ms = {'gemini': gemini_latency_ms, 'byteplus': byteplus_latency_ms, 'cse': cse_latency_ms}
+        self.jitter_ms, self.error_rate, self.error_status, self.stream_chunks = jitter_ms, error_rate, error_status, stream_chunks
+        self.rng = random.Random(seed); self.lock = threading.Lock()
+        self.calls = {'gemini': 0, 'byteplus': 0, 'cse': 0}; self.errors = {'gemini': 0, 'byteplus': 0, 'cse': 0}
+
+    def delay(self, provider):
+        with self.lock: self.calls[provider] += 1; jitter = self.rng.uniform(0, self.jitter_ms); fail = self.rng.random() < self.error_rate
+        if fail:
+            with self.lock: self.errors[provider] += 1
+        return (self.latency_ms[provider] + jitter) / 1000, fail
+
+
+def skp_facts(prompt):
+    """Tahap map analisis SKP panjang: baris fakta dari bagian dokumen berformat synthetic.skp_text (RHK, perilaku, predikat)."""
+    section = prompt.split('--- BAGIAN DOKUMEN ---', 1)[-1].split('--- AKHIR BAGIAN ---', 1)[0]
+    facts = [f"RHK | {name} | Target: {target} | Realisasi: {realisasi} | Umpan Balik: {feedback}"
+             for name, target, realisasi, feedback in re.findall(r"RHK \d+: (.*)\n.*\n\s*Target: (.*?)\s+Realisasi: (.*)\n\s*Umpan Balik Pimpinan: (.*)", section)]
+    facts += [f"PERILAKU | {aspek} | {feedback}" for aspek, feedback in re.findall(r"^(Berorientasi Pelayanan|Akuntabel|Kompeten|Harmonis|Loyal|Adaptif|Kolaboratif): (.*)$", section, re.M)]
+    facts += [f"PREDIKAT | {predikat}" for predikat in re.findall(r"PREDIKAT KINERJA PEGAWAI: (.*)", section)]
+    return "\n".join(facts) or "-"
+
+
+def canned_output(prompt):
+    """Pilih templat dari isi prompt; angka diturunkan dari hash prompt (deterministik, bervariasi antar kandidat)."""
+    rng = random.Random(prompt); find = lambda pattern, default: (re.search(pattern, prompt) or [None, default])[1].strip()
+    if '--- BAGIAN DOKUMEN ---' in prompt: return skp_facts(prompt)
+    if 'ANALISIS OBJEKTIF KINERJA SELAYAR' in prompt:
+        perilaku = [rng.randint(70, 98) for _ in range(7)]; hasil = rng.randint(60, 100); rata = round(sum(perilaku) / 7); final = round(0.6 * hasil + 0.4 * rata)
+        predikat = 'Sangat Baik' if final > 90 else 'Baik' if final > 75 else 'Butuh Perbaikan' if final > 60 else 'Kurang'
+        return SELAYAR_SKP.format(nama=f"PEGAWAI {rng.randint(1, 99999)}", dokumen=find(r"\*\*Dokumen:\*\* (\S+)", "skp.pdf"), hasil=hasil, p=perilaku, rata=rata, final=final, predikat=predikat)
+    if 'PROFIL POTENSI LENTERA' in prompt:
+        skor = [rng.randint(3, 7) for _ in range(5)]
+        return LENTERA_PROFILE.format(nama=find(r"Nama:(.*)", "Kandidat"), jabatan=find(r"Jabatan:(.*)", "Analis"), s1=skor[0], s2=skor[1], s3=skor[2], s4=skor[3], s5=skor[4],
+                                      total=round(sum(skor) / 5), rekomendasi=rng.choice(["Direkomendasikan", "Direkomendasikan dengan Catatan", "Belum Direkomendasikan"]))
+    if 'Sentimen' in prompt:
+        return SELAYAR_SENTIMENT.format(sentimen=rng.choice(["Positif", "Netral", "Campuran", "Negatif"]), skor=rng.randint(30, 95))
+    return LENTERA_CASE.format(jabatan=find(r"fokus utama soal: \*\*(.*?)\*\*", "Analis Kebijakan"))
+
+
+def _chunks(text, count):
+    size = max(1, -(-len(text) // max(count, 1)))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive seperti API asli (pool koneksi klien ikut teruji)
+    config = None
+
+    def log_message(self, *args): pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status); self.send_header('Content-Type', 'application/json'); self.send_header('Content-Length', str(len(body))); self.end_headers(); self.wfile.write(body)
+
+    def _stream(self, content_type, parts, delay_first):
+        self.send_response(200); self.send_header('Content-Type', content_type); self.send_header('Transfer-Encoding', 'chunked'); self.end_headers()
+        for part in parts:
+            data = part.encode(); self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n"); self.wfile.flush()
+            time.sleep(delay_first / max(len(parts), 1)) # Total latensi stream ~ latensi non-stream, dibagi rata antar potongan
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        if self.path.startswith('/api/v3/chat/completions'): return self._byteplus(body)
+        match = re.match(r"^/v1beta/models/([^:/]+):(generateContent|streamGenerateContent)", self.path)
+        if match: return self._gemini(body, match.group(2) == 'streamGenerateContent')
+        self._json(404, {"error": {"message": f"Path stub tidak dikenal: {self.path}"}})
+
+    def do_GET(self):
+        if self.path.startswith('/customsearch/v1'): return self._cse()
+        self._json(404, {"error": {"message": f"Path stub tidak dikenal: {self.path}"}})
+
+    def _byteplus(self, body):
+        delay, fail = self.config.delay('byteplus')
+        prompt = "\n".join(m.get('content', '') for m in body.get('messages', []))
+        if fail: time.sleep(delay / 4); return self._json(self.config.error_status, {"error": {"code": "InternalServiceError", "message": "Stub: error tersimulasi"}})
+        text = canned_output(prompt)
+        if body.get('stream'):
+            events = [f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': part}}]})}\n\n" for part in _chunks(text, self.config.stream_chunks)]
+            return self._stream('text/event-stream', events + ["data: [DONE]\n\n"], delay)
+        time.sleep(delay)
+        self._json(200, {"id": "stub", "object": "chat.completion", "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                         "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4}})
+
+    def _gemini(self, body, stream):
+        delay, fail = self.config.delay('gemini')
+        prompt = "\n".join(part.get('text', '') for content in body.get('contents', []) for part in content.get('parts', []))
+        if fail: time.sleep(delay / 4); return self._json(self.config.error_status, {"error": {"code": self.config.error_status, "message": "Stub: error tersimulasi", "status": "INTERNAL"}})
+        text = canned_output(prompt)
+        candidate = lambda part, finish=None: {"candidates": [{"content": {"parts": [{"text": part}], "role": "model"}, **({"finishReason": finish} if finish else {}), "index": 0}]}
+        if stream: # REST streaming Gemini (tanpa alt=sse) = satu array JSON yang dikirim bertahap
+            parts = _chunks(text, self.config.stream_chunks)
+            pieces = [("[" if i == 0 else ",") + json.dumps(candidate(part, 'STOP' if i == len(parts) - 1 else None)) for i, part in enumerate(parts)]
+            return self._stream('application/json', pieces + ["]"], delay)
+        time.sleep(delay)
+        self._json(200, {**candidate(text, 'STOP'), "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4}})
+
+    def _cse(self):
+        delay, fail = self.config.delay('cse'); time.sleep(delay)
+        if fail: return self._json(429, {"error": {"code": 429, "message": "Quota exceeded (stub)", "status": "RESOURCE_EXHAUSTED"}})
+        query = re.search(r"[?&]q=([^&]*)", self.path); query = query.group(1) if query else ''
+        rng = random.Random(query)
+        self._json(200, {"kind": "customsearch#search", "items": [{"title": f"Berita {i + 1} tentang {query[:40]}", "link": f"https://berita.example/{rng.randint(1, 10 ** 6)}", "displayLink": "berita.example",
+                                                                  "snippet": rng.choice(["Program berjalan baik dan diapresiasi warga.", "Pelaksanaan program mendapat kritik karena keterlambatan.",
+                                                                                         "Pemerintah daerah menambah anggaran untuk program ini."])} for i in range(3)]})
+
+
+class StubProviderServer:
+    """Satu ThreadingHTTPServer untuk ketiga provider, berjalan di thread daemon."""
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.config = config or StubConfig()
+        handler = type('BoundStubHandler', (StubHandler,), {'config': self.config})
+        self.server = ThreadingHTTPServer((host, port), handler); self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_port}"; self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='stub-providers', daemon=True); self.thread.start()
+        return self
+
+    def stop(self): self.server.shutdown(); self.server.server_close()
+
+    def environment(self):
+        """Variabel lingkungan yang mengarahkan app.py ke stub (harus di-set sebelum `import app`)."""
+        return {"GEMINI_API_KEY": "stub-key", "GEMINI_API_ENDPOINT": self.url, "BYTEPLUS_API_KEY": "stub-key", "BYTEPLUS_API_ENDPOINT": f"{self.url}/api/v3/chat/completions",
+                "GOOGLE_API_KEY": "stub-key", "GOOGLE_CSE_ID": "stub-cse", "GOOGLE_CSE_ENDPOINT": self.url}
+
+
+def add_stub_arguments(parser):
+    parser.add_argument('--gemini-latency-ms', type=float, default=800)
+    parser.add_argument('--byteplus-latency-ms', type=float, default=900)
+    parser.add_argument('--cse-latency-ms', type=float, default=250)
+    parser.add_argument('--jitter-ms', type=float, default=200)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Peluang tiap panggilan provider gagal (0-1)")
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--stream-chunks', type=int, default=20)
+
+
+def stub_config_from_args(args):
+    return StubConfig(args.gemini_latency_ms, args.byteplus_latency_ms, args.cse_latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.stream_chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8099)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    stub = StubProviderServer(stub_config_from_args(args), port=args.port).start()
+    print(f"Stub provider aktif di {stub.url}. Jalankan backend dengan:")
+    for name, value in stub.environment().items(): print(f"  export {name}={value}")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt: stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Data sintetis untuk benchmark: teks CV/SKP, file PDF (PyMuPDF) dan DOCX (python-docx), serta graf organisasi Nakhoda.
+Modul ini tidak mengimpor app.py, sehingga bisa dipakai sebelum variabel lingkungan stub di-set."""
+import random
+from io import BytesIO
+
+import docx
+import fitz  # PyMuPDF
+
+UNIT_NAMES = ["Biro Kepegawaian", "Biro Keuangan", "Direktorat Pengadaan", "Direktorat Kinerja", "Pusat Data", "Inspektorat", "Biro Hukum", "Sekretariat"]
+RHK_NAMES = ["Penyusunan Laporan Kinerja", "Pengelolaan Data Kepegawaian", "Evaluasi Kebutuhan Jabatan", "Verifikasi Dokumen Mutasi", "Rekapitulasi Presensi",
+             "Penyusunan Analisis Jabatan", "Pengelolaan Arsip Digital", "Monitoring Pengaduan Layanan"]
+FEEDBACK = ["Sangat baik, pertahankan.", "Sesuai target.", "Perlu percepatan penyelesaian.", "Inovasi tinggi dan menjadi role model.", "Kurang konsisten, perlu perbaikan."]
+
+
+def cv_text(i, paragraphs=6):
+    rng = random.Random(f"cv-{i}")
+    lines = [f"CURRICULUM VITAE — Kandidat {i}", f"Pendidikan: S1 {rng.choice(['Administrasi Publik', 'Ilmu Komputer', 'Akuntansi', 'Hukum'])}, IPK {rng.uniform(3.0, 3.95):.2f}",
+             f"Pengalaman: {rng.randint(2, 15)} tahun di {rng.choice(UNIT_NAMES)}"]
+    for p in range(paragraphs):
+        lines.append(f"Proyek {p + 1}: Memimpin {rng.choice(RHK_NAMES).lower()} untuk {rng.randint(2, 40)} satuan kerja, menghasilkan efisiensi {rng.randint(5, 60)}% "
+                     f"dan mendapat penghargaan {rng.choice(['kepala biro', 'sekretaris jenderal', 'menteri'])}.")
+    return "\n".join(lines)
+
+
+def skp_text(i, rhk_count=6):
+    """Dokumen SKP/EKP: identitas, tabel RHK (target, realisasi, umpan balik) dan umpan balik perilaku; rhk_count mengatur panjang dokumen."""
+    rng = random.Random(f"skp-{i}")
+    lines = ["SASARAN KINERJA PEGAWAI (SKP) — EVALUASI KINERJA PERIODIK", f"NAMA: PEGAWAI {i}", f"NIP: 1990{i:010d}", f"UNIT KERJA: {rng.choice(UNIT_NAMES)}",
+             "PERIODE PENILAIAN: 1 JANUARI SD 31 DESEMBER TAHUN 2024", "", "HASIL KERJA"]
+    for r in range(rhk_count):
+        target = rng.randint(10, 2000); realisasi = int(target * rng.uniform(0.3, 2.2))
+        lines += [f"RHK {r + 1}: {RHK_NAMES[r % len(RHK_NAMES)]}", f"  Indikator: Jumlah dokumen/data {RHK_NAMES[r % len(RHK_NAMES)].lower()}",
+                  f"  Target: {target} Dokumen   Realisasi: {realisasi} Dokumen", f"  Umpan Balik Pimpinan: {rng.choice(FEEDBACK)}"]
+    lines += ["", "PERILAKU KERJA"]
+    for aspek in ["Berorientasi Pelayanan", "Akuntabel", "Kompeten", "Harmonis", "Loyal", "Adaptif", "Kolaboratif"]: lines.append(f"{aspek}: {rng.choice(FEEDBACK)}")
+    lines += ["", f"PREDIKAT KINERJA PEGAWAI: {rng.choice(['Sangat Baik', 'Baik', 'Butuh Perbaikan'])}"]
+    return "\n".join(lines)
+
+
+def make_pdf(text, lines_per_page=45):
+    """PDF teks (bisa diekstrak, bukan hasil scan); satu halaman per lines_per_page baris."""
+    lines = text.splitlines(); doc = fitz.open()
+    for start in range(0, max(len(lines), 1), lines_per_page):
+        page = doc.new_page(); page.insert_textbox(fitz.Rect(40, 40, 555, 800), "\n".join(lines[start:start + lines_per_page]), fontsize=9)
+    data = doc.tobytes(); doc.close()
+    return data
+
+
+def make_docx(text):
+    document = docx.Document()
+    for line in text.splitlines(): document.add_paragraph(line)
+    buffer = BytesIO(); document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_document(text, ext):
+    return make_pdf(text) if ext == 'pdf' else make_docx(text) if ext == 'docx' else text.encode('utf-8')
+
+
+def synthetic_org(num_pegawai, edges_per_node, seed=11):
+    """Pegawai tersebar di unit (~50 orang/unit), kolaborasi 80% di dalam unit dan 20% lintas unit."""
+    rng = random.Random(seed); num_units = max(num_pegawai // 50, 1)
+    pegawai = [{"id": f"P{i}", "nama": f"Pegawai {i}", "unit": f"Unit {i % num_units}", "jabatan": "Staf",
+                "skor_potensi": rng.randint(40, 100), "skor_kinerja": rng.randint(40, 100)} for i in range(num_pegawai)]
+    kolaborasi = []
+    for _ in range(num_pegawai * edges_per_node // 2):
+        a = rng.randrange(num_pegawai)
+        b = (a + num_units * rng.randint(1, 49)) % num_pegawai if rng.random() < 0.8 else rng.randrange(num_pegawai)
+        kolaborasi.append({"source": f"P{a}", "target": f"P{b}", "project": f"Proyek {rng.randrange(1000)}"})
+    return pegawai, kolaborasi
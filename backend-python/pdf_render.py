@@ -0,0 +1,15 @@
+"""Render Markdown -> PDF (xhtml2pdf) untuk process pool ekspor PDF NAVIGARA.
+Sengaja dipisah dari app.py dan hanya mengimpor markdown + xhtml2pdf, sehingga fungsi render bisa dikirim ke process pool tanpa ketergantungan pada Flask, DB, atau klien LLM."""
+from io import BytesIO
+import markdown
+from xhtml2pdf import pisa
+
+PDF_CSS = """ @page { size: A4; margin: 1.5cm; } body { font-family: sans-serif; font-size: 10pt; color: #333; } h1, h2, h3, h4 { color: #003366; } h1 { font-size: 18pt; text-align: center; margin-bottom: 20px; } h2 { font-size: 14pt; border-bottom: 1px solid #ccc; padding-bottom: 5px; margin-top: 15px; } strong { color: #00509E; } ul, ol { padding-left: 20px; } li { margin-bottom: 5px; } pre { background-color: #f0f0f0; padding: 10px; border-radius: 5px; font-family: monospace; white-space: pre-wrap; } a { color: #3b82f6; text-decoration: none; } """
+
+def render_pdf(markdown_text, title, css=PDF_CSS):
+    """Bytes PDF dari Markdown; ValueError bila xhtml2pdf melaporkan error."""
+    html_content = markdown.markdown(markdown_text, extensions=['extra', 'nl2br'])
+    result = BytesIO()
+    pdf = pisa.CreatePDF(BytesIO(f"<html><head><style>{css}</style></head><body><h1>{title}</h1>{html_content}</body></html>".encode('utf-8')), dest=result)
+    if pdf.err: raise ValueError(f"Error xhtml2pdf: {pdf.err}")
+    return result.getvalue()
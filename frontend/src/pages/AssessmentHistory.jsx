@@ -7,17 +7,21 @@ function AssessmentHistory() {
   const [history, setHistory] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  const fetchHistory = async () => {
-    setLoading(true);
+  // Riwayat dipaginasi di backend (keyset cursor); halaman berikutnya ditambahkan ke daftar
+  const fetchHistory = async (cursor = null) => {
+    cursor ? setLoadingMore(true) : setLoading(true);
     setError('');
     try {
-      const response = await axios.get(`${API_URL}/api/history`);
-      setHistory(response.data);
+      const response = await axios.get(`${API_URL}/api/history`, { params: cursor ? { cursor } : {} });
+      setHistory((prev) => (cursor ? [...prev, ...response.data.items] : response.data.items));
+      setNextCursor(response.data.next_cursor);
     } catch (err) {
       setError(`Gagal memuat riwayat: ${err.response?.data?.error || err.message}`);
     }
-    setLoading(false);
+    cursor ? setLoadingMore(false) : setLoading(false);
   };
 
   useEffect(() => {
@@ -111,6 +115,13 @@ function AssessmentHistory() {
               ))}
             </tbody>
           </table>
+          {nextCursor && (
+            <div className="text-center p-4">
+              <button onClick={() => fetchHistory(nextCursor)} disabled={loadingMore}>
+                {loadingMore ? 'Memuat...' : 'Muat lebih banyak'}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -20,6 +20,10 @@ const DUMMY_KOLABORASI_JSON = `[
 
 // --- Fungsi Layout ---
 const getLayoutedElements = (nodes, edges) => {
+  // Posisi dari layout server (force/unit) dipakai apa adanya; grid hanya sebagai fallback
+  if (nodes.some(node => node.position && (node.position.x !== 0 || node.position.y !== 0))) {
+    return { nodes, edges };
+  }
   nodes.forEach((node, index) => {
     node.position = { x: (index % 5) * 250, y: Math.floor(index / 5) * 150 };
   });